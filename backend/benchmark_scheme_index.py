@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+LUMEN Scheme Index Benchmark
+Compares recall and query latency of the scheme index types on our corpus
+"""
+
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from lumen_models import LumenModels
+from lumen_services import GovernmentSchemesService
+from lumen_index import (
+    SchemeIndexStore, INDEX_TYPES, build_index, encode_normalized, scheme_text
+)
+
+def load_corpus(schemes_path):
+    """Load schemes from a file, the built index metadata, or the built-in list"""
+    if schemes_path:
+        with open(schemes_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    schemes = SchemeIndexStore().load_schemes()
+    if schemes is not None:
+        return schemes
+
+    return GovernmentSchemesService._load_schemes_database()
+
+def load_queries(queries_path, schemes):
+    """Load one query per line, defaulting to the scheme names"""
+    if queries_path:
+        with open(queries_path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    return [scheme["name"] for scheme in schemes]
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark LUMEN scheme index types")
+    parser.add_argument("--schemes", help="JSON file with a list of schemes")
+    parser.add_argument("--queries", help="Text file with one query per line (defaults to scheme names)")
+    parser.add_argument("--k", type=int, default=5, help="Results per query")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES), help="Comma-separated index types")
+    parser.add_argument("--metric", default="ip", help="Distance metric")
+    args = parser.parse_args()
+
+    schemes = load_corpus(args.schemes)
+    queries = load_queries(args.queries, schemes)
+
+    encoder = LumenModels().get_model('multilingual_embedding')
+    if encoder is None:
+        print("❌ Multilingual embedding model could not be loaded")
+        sys.exit(1)
+
+    print(f"🔄 Encoding {len(schemes)} schemes and {len(queries)} queries...")
+    corpus = encode_normalized(encoder, [scheme_text(scheme) for scheme in schemes])
+    query_vectors = encode_normalized(encoder, queries)
+    k = min(args.k, len(schemes))
+
+    # Exact search is the ground truth for recall
+    _, truth = build_index(corpus, "flat", args.metric).search(query_vectors, k)
+
+    print(f"\n{'index':<8} {'build s':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(k):>10}")
+    for index_type in args.types.split(","):
+        start = time.perf_counter()
+        index = build_index(corpus, index_type, args.metric)
+        build_time = time.perf_counter() - start
+
+        # Single-query latency, as served by the search endpoint
+        latencies = []
+        found = np.empty_like(truth)
+        for i, vector in enumerate(query_vectors):
+            start = time.perf_counter()
+            _, ids = index.search(vector[None, :], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[i] = ids[0]
+
+        recall = np.mean([
+            len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))
+        ])
+        print(f"{index_type:<8} {build_time:>9.2f} {np.percentile(latencies, 50):>8.3f} "
+              f"{np.percentile(latencies, 95):>8.3f} {recall:>10.3f}")
+
+if __name__ == "__main__":
+    main()
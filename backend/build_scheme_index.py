@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+LUMEN Scheme Index Builder
+Encodes the government schemes corpus offline and writes the FAISS index
+and scheme metadata to the vector DB directory used by the backend, or
+applies upserts and deletes to an existing index as a new generation
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from lumen_models import LumenModels
+from lumen_services import GovernmentSchemesService
+from lumen_index import (
+    BUILD_DIR, SchemeIndexBuilder, SchemeIndexStore, assign_scheme_ids, encode_normalized,
+    plan_scheme_update, scheme_text, update_index, INDEX_TYPES, METRICS
+)
+
+logger = logging.getLogger(__name__)
+
+def progress_printer():
+    """Progress callback printing throughput for each build stage"""
+    labels = {"encode": "Encoded", "index": "Indexed"}
+    started = {}
+
+    def report(stage, done, total):
+        start = started.setdefault(stage, (time.perf_counter(), done))
+        elapsed = time.perf_counter() - start[0]
+        rate = (done - start[1]) / elapsed if elapsed > 0 else 0.0
+        print(f"\r🔄 {labels.get(stage, stage)} {done}/{total} schemes ({rate:.0f}/s)", end="", flush=True)
+        if done == total:
+            print()
+
+    return report
+
+def update_schemes(store, encoder, model_name, upserts, delete_ids):
+    """Apply upserts and deletes to the built index, re-encoding only changed schemes"""
+    with store.lock():
+        snapshot = store.load(model_name)
+        if snapshot is None:
+            print(f"❌ No index for {model_name} in {store.path}; build one first")
+            sys.exit(1)
+
+        update = plan_scheme_update(snapshot.schemes, upserts, delete_ids)
+        if update.schemes == snapshot.schemes:
+            print(f"✅ No changes; index stays at generation {snapshot.generation}")
+            return
+
+        print(f"🔄 Encoding {len(update.embed)} new or changed schemes...")
+        embeddings = None
+        if update.embed:
+            embeddings = encode_normalized(encoder, [scheme_text(scheme) for scheme in update.embed])
+        index = update_index(snapshot.index, update.remove_ids, update.embed_ids, embeddings)
+        generation = store.save(index, update.schemes, model_name)
+
+    print(f"✅ Generation {generation}: {len(update.upserted)} upserted, {len(update.deleted)} deleted, "
+          f"{len(update.schemes)} schemes in {store.path}")
+
+def main():
+    """Build the scheme index"""
+    parser = argparse.ArgumentParser(description="Build the LUMEN government schemes index")
+    parser.add_argument("--schemes", help="JSON file with a list of schemes (defaults to the built-in schemes)")
+    parser.add_argument("--output", help="Index directory (defaults to VECTOR_DB_PATH or ./data/vector_db)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES,
+                        help="Index type (defaults to SCHEME_INDEX_TYPE or flat)")
+    parser.add_argument("--metric", choices=METRICS,
+                        help="Distance metric (defaults to SCHEME_INDEX_METRIC or ip)")
+    parser.add_argument("--batch-tokens", type=int,
+                        help="Padded tokens per encode batch (defaults to SCHEME_INDEX_BATCH_TOKENS or 16384)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Discard the embeddings of an interrupted build instead of resuming it")
+    parser.add_argument("--upsert", metavar="FILE",
+                        help="JSON file with schemes to add or replace in the existing index")
+    parser.add_argument("--delete", type=int, nargs="+", metavar="ID", help="Ids of schemes to remove")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
+
+    models = LumenModels()
+    encoder = models.get_model('multilingual_embedding')
+    if encoder is None:
+        print("❌ Multilingual embedding model could not be loaded")
+        sys.exit(1)
+
+    store = SchemeIndexStore(args.output)
+    model_name = models.model_configs['multilingual_embedding']
+
+    if args.upsert or args.delete:
+        upserts = []
+        if args.upsert:
+            with open(args.upsert, encoding="utf-8") as f:
+                upserts = json.load(f)
+        update_schemes(store, encoder, model_name, upserts, args.delete or [])
+        return
+
+    if args.schemes:
+        with open(args.schemes, encoding="utf-8") as f:
+            schemes = json.load(f)
+    else:
+        schemes = GovernmentSchemesService._load_schemes_database()
+    schemes = assign_scheme_ids(schemes)
+    builder = SchemeIndexBuilder(encoder, store.path / BUILD_DIR, max_batch_tokens=args.batch_tokens,
+                                 progress=progress_printer())
+    if args.restart:
+        builder.cleanup()
+
+    print(f"🔄 Encoding {len(schemes)} schemes...")
+    index = builder.build([scheme_text(scheme) for scheme in schemes], model_name, args.index_type, args.metric,
+                          ids=[scheme["id"] for scheme in schemes])
+
+    with store.lock():
+        generation = store.save(index, schemes, model_name)
+    builder.cleanup()
+    print(f"✅ Scheme index generation {generation} written to {store.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+LUMEN Model Exporter
+Exports the chatbot, Whisper and embedding models to ONNX (optionally
+INT8-quantized) for CPU inference, then checks each CPU backend's outputs
+against full precision PyTorch
+"""
+
+import sys
+import time
+import shutil
+import logging
+import argparse
+
+import numpy as np
+import torch
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from lumen_models import LumenModels
+from lumen_index import encode_normalized
+from lumen_media import WHISPER_SAMPLING_RATE
+from lumen_backends import (
+    EMBEDDING_MODEL_TYPES, MODEL_BACKENDS, ONNX_MODEL_TYPES,
+    model_nbytes, onnx_model_class, onnx_model_path
+)
+
+logger = logging.getLogger(__name__)
+
+# Inputs for the parity check, covering the scripts we serve
+PARITY_TEXTS = [
+    "I have had a high fever and a headache for three days.",
+    "मुझे सीने में दर्द है और सांस लेने में तकलीफ हो रही है।",
+    "என் குழந்தைக்கு இரண்டு நாட்களாக வயிற்றுப்போக்கு உள்ளது.",
+    "আমার হাতে পোড়া দাগ হয়েছে, কী করব?",
+    "Which government health schemes cover hospital stays for BPL families?",
+]
+
+def export_onnx(models, model_type):
+    """Export a model to ONNX in its ONNX_MODEL_DIR directory"""
+    from transformers import AutoProcessor
+
+    name = models.model_configs[model_type]
+    path = onnx_model_path(model_type)
+    if model_type in EMBEDDING_MODEL_TYPES:
+        from sentence_transformers import SentenceTransformer
+        SentenceTransformer(name, device="cpu", backend="onnx", token=models.hf_api_key).save_pretrained(str(path))
+        return path
+
+    model = onnx_model_class(model_type).from_pretrained(name, export=True, token=models.hf_api_key)
+    model.save_pretrained(path)
+    # Tokenizer, or tokenizer and feature extractor for Whisper
+    AutoProcessor.from_pretrained(name, token=models.hf_api_key).save_pretrained(path)
+    return path
+
+def quantize_onnx(model_type):
+    """Write a copy of an exported model with every graph dynamically quantized to INT8"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = onnx_model_path(model_type)
+    target = onnx_model_path(model_type, quantized=True)
+    shutil.rmtree(target, ignore_errors=True)
+    shutil.copytree(source, target, ignore=shutil.ignore_patterns("*.onnx", "*.onnx_data", "*.onnx.data"))
+    for graph in sorted(source.rglob("*.onnx")):
+        output = target / graph.relative_to(source)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        quantize_dynamic(str(graph), str(output), weight_type=QuantType.QInt8, per_channel=True)
+    return target
+
+def chatbot_outputs(chatbot):
+    """Next-token logits at every position of the parity texts"""
+    logits = []
+    for text in PARITY_TEXTS:
+        inputs = chatbot.tokenizer(text, return_tensors="pt").to(chatbot.model.device)
+        logits.append(chatbot.model(**inputs).logits[0].float().cpu())
+    return torch.cat(logits)
+
+def whisper_outputs(whisper):
+    """Decoder logits for a fixed transcript over fixed audio"""
+    rng = np.random.default_rng(0)
+    audio = (0.05 * rng.standard_normal(WHISPER_SAMPLING_RATE * 5)).astype(np.float32)
+    features = whisper.feature_extractor(audio, sampling_rate=WHISPER_SAMPLING_RATE,
+                                         return_tensors="pt").input_features
+    decoder_input_ids = whisper.tokenizer(PARITY_TEXTS[0], return_tensors="pt").input_ids
+    output = whisper.model(input_features=features.to(whisper.model.device),
+                           decoder_input_ids=decoder_input_ids.to(whisper.model.device))
+    return output.logits[0].float().cpu()
+
+def embedding_outputs(encoder):
+    """Normalized embeddings of the parity texts"""
+    return torch.from_numpy(encode_normalized(encoder, PARITY_TEXTS))
+
+def probe(model_type, model):
+    """Run a model on the parity inputs, returning its outputs and the time taken"""
+    if model_type in EMBEDDING_MODEL_TYPES:
+        run = embedding_outputs
+    elif model_type == "whisper":
+        run = whisper_outputs
+    else:
+        run = chatbot_outputs
+
+    with torch.inference_mode():
+        run(model)
+        start = time.perf_counter()
+        outputs = run(model)
+    return outputs, time.perf_counter() - start
+
+def compare(reference, candidate):
+    """Worst-case cosine similarity and top-1 agreement of two output matrices"""
+    cosine = torch.nn.functional.cosine_similarity(reference, candidate, dim=-1)
+    top1 = (reference.argmax(dim=-1) == candidate.argmax(dim=-1)).float().mean()
+    return float(cosine.min()), float(top1)
+
+def check_parity(models, model_type, backends, min_cosine, min_top1):
+    """Compare each backend against torch fp32; returns the number of failed checks"""
+    reference_model = models.load_standalone(model_type, "torch")
+    reference, reference_s = probe(model_type, reference_model)
+    reference_mb = model_nbytes(reference_model) / 1024 / 1024
+    del reference_model
+    print(f"   torch        {reference_s * 1000:8.1f} ms  {reference_mb:8.0f} MB")
+
+    failed = 0
+    for backend in backends:
+        try:
+            model = models.load_standalone(model_type, backend)
+            outputs, seconds = probe(model_type, model)
+            size_mb = model_nbytes(model) / 1024 / 1024
+            del model
+        except Exception as e:
+            print(f"❌ {backend}: {e}")
+            failed += 1
+            continue
+
+        cosine, top1 = compare(reference, outputs)
+        # Embedding dimensions have no meaningful argmax
+        ok = cosine >= min_cosine and (model_type in EMBEDDING_MODEL_TYPES or top1 >= min_top1)
+        agreement = "" if model_type in EMBEDDING_MODEL_TYPES else f"  top-1 {top1:.3f}"
+        print(f"{'✅' if ok else '❌'} {backend:<11}  {seconds * 1000:8.1f} ms  {size_mb:8.0f} MB  "
+              f"{reference_s / max(seconds, 1e-9):4.1f}x  min cosine {cosine:.4f}{agreement}")
+        failed += not ok
+    return failed
+
+def main():
+    """Export models and check backend parity"""
+    parser = argparse.ArgumentParser(description="Export LUMEN models for CPU inference and check parity")
+    parser.add_argument("--models", nargs="+", choices=ONNX_MODEL_TYPES, default=list(ONNX_MODEL_TYPES),
+                        help="Model types to export and check")
+    parser.add_argument("--quantize", action="store_true",
+                        help="Also write INT8-quantized graphs for the onnx-int8 backend")
+    parser.add_argument("--check-only", action="store_true", help="Skip the export and only check parity")
+    parser.add_argument("--backends", nargs="+", choices=MODEL_BACKENDS[1:],
+                        help="Backends to compare with torch (defaults to torch-int8 and every exported ONNX graph)")
+    parser.add_argument("--min-cosine", type=float, default=0.98,
+                        help="Lowest acceptable cosine similarity to the fp32 outputs")
+    parser.add_argument("--min-top1", type=float, default=0.9,
+                        help="Lowest acceptable top-1 token agreement with fp32 (chatbot, Whisper)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s:%(name)s:%(message)s')
+
+    models = LumenModels()
+    if models.device != "cpu":
+        print("⚠️  CPU backends fall back to torch on GPU machines; run the parity check on a CPU host")
+
+    failed = 0
+    for model_type in args.models:
+        if not args.check_only:
+            print(f"🔄 Exporting {model_type} ({models.model_configs[model_type]})...")
+            try:
+                print(f"✅ Wrote {export_onnx(models, model_type)}")
+                if args.quantize:
+                    print(f"✅ Wrote {quantize_onnx(model_type)}")
+            except Exception as e:
+                print(f"❌ Export of {model_type} failed: {e}")
+                failed += 1
+                continue
+
+        backends = args.backends or ["torch-int8"] + [
+            backend for backend in ("onnx", "onnx-int8")
+            if onnx_model_path(model_type, quantized=backend == "onnx-int8").is_dir()
+        ]
+        print(f"🔄 Checking {model_type} against torch fp32...")
+        failed += check_parity(models, model_type, backends, args.min_cosine, args.min_top1)
+
+    if failed:
+        print(f"❌ {failed} export or parity checks failed")
+        sys.exit(1)
+    print("✅ All backends match fp32 within tolerance")
+
+if __name__ == "__main__":
+    main()
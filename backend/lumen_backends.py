@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+LUMEN Backends Module
+CPU inference backends: dynamic INT8 quantization of PyTorch models and
+ONNX Runtime graphs exported with Optimum
+"""
+
+import os
+import logging
+from pathlib import Path
+from typing import Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# torch: full precision PyTorch
+# torch-int8: PyTorch with Linear layers dynamically quantized to INT8 at load time
+# onnx / onnx-int8: ONNX Runtime graphs written by export_models.py
+MODEL_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+ONNX_BACKENDS = ("onnx", "onnx-int8")
+
+# Pipeline models that can run on ONNX Runtime, with their Optimum model class
+ONNX_PIPELINE_CLASSES = {
+    "chatbot": "ORTModelForCausalLM",
+    "whisper": "ORTModelForSpeechSeq2Seq",
+}
+EMBEDDING_MODEL_TYPES = ("embedding", "multilingual_embedding")
+ONNX_MODEL_TYPES = tuple(ONNX_PIPELINE_CLASSES) + EMBEDDING_MODEL_TYPES
+
+def onnx_model_path(model_type: str, quantized: bool = False) -> Path:
+    """Directory of a model type's exported ONNX graph"""
+    root = Path(os.getenv("ONNX_MODEL_DIR", "./data/onnx_models"))
+    return root / (f"{model_type}-int8" if quantized else model_type)
+
+def onnx_model_class(model_type: str):
+    """Optimum ONNX Runtime class for a pipeline model type"""
+    import optimum.onnxruntime
+    return getattr(optimum.onnxruntime, ONNX_PIPELINE_CLASSES[model_type])
+
+def is_onnx_model(model) -> bool:
+    """Whether a model runs on ONNX Runtime through Optimum"""
+    return type(model).__module__.startswith("optimum.onnxruntime")
+
+def supports_kv_reuse(model) -> bool:
+    """Whether generate() accepts past key/values computed by an earlier call"""
+    # Models served from another process declare supports_kv_reuse = False
+    return getattr(model, "supports_kv_reuse", True) and not is_onnx_model(model)
+
+def find_onnx_file(path: Path) -> str:
+    """Path of the main ONNX graph in an exported sentence-transformers directory"""
+    graphs = sorted(str(graph.relative_to(path)) for graph in path.rglob("*.onnx"))
+    if not graphs:
+        raise FileNotFoundError(f"No ONNX graph in {path}")
+    for preferred in ("onnx/model.onnx", "model.onnx"):
+        if preferred in graphs:
+            return preferred
+    return graphs[0]
+
+def _conv1d_to_linear(module: torch.nn.Module):
+    """Replace GPT-2 style Conv1D layers with equivalent Linear layers, in place"""
+    from transformers.pytorch_utils import Conv1D
+
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            # Conv1D stores its weight as (in_features, out_features)
+            linear = torch.nn.Linear(child.weight.shape[0], child.weight.shape[1])
+            linear.weight = torch.nn.Parameter(child.weight.detach().t().contiguous())
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
+def quantize_dynamic_int8(module: torch.nn.Module) -> torch.nn.Module:
+    """Quantize a model's Linear layers to INT8 weights with dynamic activation scaling, in place"""
+    _conv1d_to_linear(module)
+    module.eval()
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def _exported_path(model_type: str, quantized: bool) -> Path:
+    path = onnx_model_path(model_type, quantized)
+    if not path.is_dir():
+        raise FileNotFoundError(
+            f"No exported ONNX model at {path}; run "
+            f"`python export_models.py --models {model_type}{' --quantize' if quantized else ''}`"
+        )
+    return path
+
+def load_onnx_pipeline(task: str, model_type: str, quantized: bool = False):
+    """Build a transformers pipeline around an exported ONNX Runtime model"""
+    from transformers import AutoProcessor, AutoTokenizer, pipeline
+
+    path = _exported_path(model_type, quantized)
+    model = onnx_model_class(model_type).from_pretrained(path, provider="CPUExecutionProvider")
+    if task == "automatic-speech-recognition":
+        processor = AutoProcessor.from_pretrained(path)
+        return pipeline(task, model=model, tokenizer=processor.tokenizer,
+                        feature_extractor=processor.feature_extractor)
+    return pipeline(task, model=model, tokenizer=AutoTokenizer.from_pretrained(path))
+
+def load_onnx_sentence_transformer(model_type: str, quantized: bool = False):
+    """Load an exported sentence-transformers model on ONNX Runtime"""
+    from sentence_transformers import SentenceTransformer
+
+    path = _exported_path(model_type, quantized)
+    return SentenceTransformer(
+        str(path), device="cpu", backend="onnx",
+        model_kwargs={"file_name": find_onnx_file(path), "provider": "CPUExecutionProvider"}
+    )
+
+def _onnx_files_nbytes(directory: Optional[Path]) -> int:
+    if directory is None:
+        return 0
+    return sum(f.stat().st_size for f in Path(directory).rglob("*.onnx*") if f.is_file())
+
+def model_nbytes(model) -> int:
+    """Estimate the memory held by a model's weights, including INT8 and ONNX Runtime ones"""
+    module = getattr(model, "model", model)
+    if is_onnx_model(module):
+        return _onnx_files_nbytes(getattr(module, "model_save_dir", None))
+    if not isinstance(module, torch.nn.Module):
+        return 0
+
+    tensors = list(module.parameters()) + list(module.buffers())
+    total = sum(t.numel() * t.element_size() for t in tensors)
+    for sub in module.modules():
+        if sub is not module and is_onnx_model(sub):
+            # sentence-transformers wraps its ONNX Runtime model in a torch module
+            total += _onnx_files_nbytes(getattr(sub, "model_save_dir", None))
+        elif isinstance(sub, torch.ao.nn.quantized.dynamic.Linear):
+            # Packed INT8 weights are not parameters
+            weight = sub.weight()
+            total += weight.numel() * weight.element_size()
+    return total
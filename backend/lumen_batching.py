@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+LUMEN Batching Module
+Collects concurrent inference requests into batched model calls
+"""
+
+import os
+import abc
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lumen_executors import MODEL_FAMILIES, InferenceExecutors, InferenceQueueFull
+from lumen_index import encode_normalized
+from lumen_kvcache import PrefixCache
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher(abc.ABC):
+    """Gathers concurrent requests for a few milliseconds and runs them as one batch"""
+
+    def __init__(self, max_batch_size: int = 8, max_wait_ms: float = 10.0,
+                 max_queue: int = 0, name: str = "batcher"):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_queue = max(0, max_queue)
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result"""
+        self._ensure_worker()
+        if self.max_queue and self._queue.qsize() >= self.max_queue:
+            raise InferenceQueueFull(self.name)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    def _ensure_worker(self):
+        """Start the batching loop on the running event loop"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        """Collect batches until the batch is full or the wait window closes"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """Run a batch and resolve each request's future"""
+        batch = [(item, future) for item, future in batch if not future.cancelled()]
+        if not batch:
+            return
+
+        try:
+            results = await self._run_batch([item for item, _ in batch])
+        except Exception as e:
+            logger.error(f"Error in {self.name} batch of {len(batch)}: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    @abc.abstractmethod
+    async def _run_batch(self, items: List[Any]) -> List[Any]:
+        """Run a batch of items; results must keep the input order"""
+
+class GenerationBatcher(MicroBatcher):
+    """Batches text-generation requests into padded pipeline calls"""
+
+    def __init__(self, models, executors: InferenceExecutors,
+                 max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None,
+                 prefix_cache: Optional[PrefixCache] = None):
+        super().__init__(
+            max_batch_size=max_batch_size or int(os.getenv("CHATBOT_BATCH_SIZE", "8")),
+            max_wait_ms=max_wait_ms if max_wait_ms is not None else float(os.getenv("CHATBOT_BATCH_WAIT_MS", "10")),
+            max_queue=executors.pool("chat").max_queue,
+            name="chat"
+        )
+        self.models = models
+        self.executors = executors
+        self.prefix_cache = prefix_cache
+
+    async def generate(self, prompt: str, prefix: Optional[str] = None, **generate_kwargs) -> str:
+        """Generate text for a single prompt as part of a batch.
+
+        prefix is a fixed leading part of the prompt whose KV state can be
+        reused when the request ends up running on its own.
+        """
+        if prefix is not None and not prompt.startswith(prefix):
+            prefix = None
+        return await self.submit((prompt, prefix, generate_kwargs))
+
+    async def _run_batch(self, items: List[Tuple[str, Optional[str], Dict[str, Any]]]) -> List[str]:
+        """Run one pipeline call per distinct set of generation settings"""
+        # Requests can only share a generate call if their settings match
+        groups: Dict[Tuple, List[int]] = {}
+        for i, (_, _, kwargs) in enumerate(items):
+            groups.setdefault(tuple(sorted(kwargs.items())), []).append(i)
+
+        results: List[Optional[str]] = [None] * len(items)
+        for key, indices in groups.items():
+            prompt, prefix, _ = items[indices[0]]
+            if len(indices) == 1 and prefix and self.prefix_cache is not None:
+                # A lone request skips padding and starts from the cached prefix state
+                results[indices[0]] = await self.executors.run_with_model(
+                    self.models, "chatbot", lambda pipe: self._generate_from_prefix(pipe, prompt, prefix, dict(key))
+                )
+                continue
+
+            prompts = [items[i][0] for i in indices]
+            texts = await self.executors.run_with_model(
+                self.models, "chatbot", lambda pipe: self._generate(pipe, prompts, dict(key))
+            )
+            for i, text in zip(indices, texts):
+                results[i] = text
+
+        return results
+
+    def _generate_from_prefix(self, pipe, prompt: str, prefix: str, generate_kwargs: Dict[str, Any]) -> str:
+        """Generate for one prompt, reusing the prefix's cached key/values"""
+        if not self.prefix_cache.supports(pipe):
+            return self._generate(pipe, [prompt], generate_kwargs)[0]
+
+        return self.prefix_cache.generate(pipe, prefix, prompt[len(prefix):], **generate_kwargs)
+
+    def _generate(self, pipe, prompts: List[str], generate_kwargs: Dict[str, Any]) -> List[str]:
+        """Run the text-generation pipeline on a padded batch of prompts"""
+        outputs = pipe(prompts, batch_size=len(prompts), **generate_kwargs)
+        return [output[0]['generated_text'] for output in outputs]
+
+class EmbeddingBatcher(MicroBatcher):
+    """Batches embedding requests from every caller into shared encode() calls per model.
+
+    Texts repeated across requests are encoded once. SentenceTransformer
+    sorts each call's texts by length before splitting them into batches
+    of encode_batch_size, so padding stays within similar lengths.
+    """
+
+    def __init__(self, models, executors: InferenceExecutors,
+                 max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None,
+                 encode_batch_size: Optional[int] = None):
+        super().__init__(
+            max_batch_size=max_batch_size or int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+            max_wait_ms=max_wait_ms if max_wait_ms is not None else float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5")),
+            max_queue=executors.pool("embedding").max_queue,
+            name="embedding"
+        )
+        self.models = models
+        self.executors = executors
+        self.encode_batch_size = encode_batch_size or int(os.getenv("EMBEDDING_ENCODE_BATCH_SIZE", "32"))
+
+    async def embed(self, texts: List[str], model: str = "multilingual_embedding") -> np.ndarray:
+        """Unit-length float32 embeddings of texts, encoded together with concurrent requests"""
+        if MODEL_FAMILIES.get(model) != "embedding":
+            raise ValueError(f"Not an embedding model: {model}")
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        return await self.submit((model, list(texts)))
+
+    async def _run_batch(self, items: List[Tuple[str, List[str]]]) -> List[np.ndarray]:
+        """Run one encode call per model over the distinct texts of all requests"""
+        groups: Dict[str, List[int]] = {}
+        for i, (model, _) in enumerate(items):
+            groups.setdefault(model, []).append(i)
+
+        results: List[Optional[np.ndarray]] = [None] * len(items)
+        for model, indices in groups.items():
+            texts = list(dict.fromkeys(text for i in indices for text in items[i][1]))
+            vectors = await self.executors.run_with_model(
+                self.models, model,
+                lambda encoder: encode_normalized(encoder, texts, batch_size=self.encode_batch_size)
+            )
+            rows = {text: row for text, row in zip(texts, vectors)}
+            for i in indices:
+                results[i] = np.stack([rows[text] for text in items[i][1]])
+
+        return results
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+LUMEN Cache Module
+Bounded caches for repeated model work
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so trivially different spellings share a cache entry"""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+class EmbeddingCache:
+    """LRU cache of query embeddings with TTL expiry and an optional shared SQLite backend"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 db_path: Optional[str] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv("EMBEDDING_CACHE_TTL_S", "86400"))
+        self.db_path = db_path if db_path is not None else os.getenv("EMBEDDING_CACHE_DB", "")
+
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._db_writes = 0
+
+        if self.db_path:
+            self._init_db()
+
+    @staticmethod
+    def key(text: str, language: str, model: str) -> str:
+        """Cache key for a query embedded by a model"""
+        return f"{model}\x1f{language}\x1f{normalize_query(text)}"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Get a cached embedding, checking memory and then the shared backend"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, expires_at = entry
+                if not expires_at or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+
+        vector = self._db_get(key, now) if self.db_path else None
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._remember(key, vector, now)
+        return vector
+
+    def put(self, key: str, vector: np.ndarray):
+        """Cache an embedding"""
+        vector = np.array(vector, dtype="float32")
+        now = time.time()
+        self._remember(key, vector, now)
+        if self.db_path:
+            self._db_put(key, vector, now)
+
+    def _remember(self, key: str, vector: np.ndarray, now: float):
+        vector.setflags(write=False)
+        with self._lock:
+            self._entries[key] = (vector, now + self.ttl if self.ttl else 0.0)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                "shared_backend": bool(self.db_path),
+            }
+
+    def _connection(self) -> sqlite3.Connection:
+        """One SQLite connection per thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with self._connection() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "key TEXT PRIMARY KEY, vector BLOB NOT NULL, expires_at REAL NOT NULL)"
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Shared embedding cache disabled: {e}")
+            self.db_path = ""
+
+    def _db_get(self, key: str, now: float) -> Optional[np.ndarray]:
+        try:
+            row = self._connection().execute(
+                "SELECT vector, expires_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared embedding cache read failed: {e}")
+            return None
+        if row is None or (row[1] and row[1] <= now):
+            return None
+        return np.frombuffer(row[0], dtype="float32").copy()
+
+    def _db_put(self, key: str, vector: np.ndarray, now: float):
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, expires_at) VALUES (?, ?, ?)",
+                    (key, vector.tobytes(), now + self.ttl if self.ttl else 0.0)
+                )
+                self._db_writes += 1
+                if self._db_writes % 100:
+                    return
+                # Periodically bound the shared table, dropping expired and then oldest rows
+                conn.execute("DELETE FROM embeddings WHERE expires_at > 0 AND expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN ("
+                    "SELECT rowid FROM embeddings ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Shared embedding cache write failed: {e}")
+
+    async def get_or_embed(self, texts: List[str], language: str, model: str,
+                           embed_fn: Callable[[List[str]], Awaitable[np.ndarray]]) -> np.ndarray:
+        """Embed texts, awaiting embed_fn only for cache misses"""
+        keys = [self.key(text, language, model) for text in texts]
+        lookup = lambda: [self.get(key) for key in keys]
+        # The shared backend is SQLite, so keep its reads and writes off the event loop
+        vectors: List[Optional[np.ndarray]] = await asyncio.to_thread(lookup) if self.db_path else lookup()
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = await embed_fn([texts[i] for i in missing])
+            store = lambda: [self.put(keys[i], vector) for i, vector in zip(missing, encoded)]
+            await asyncio.to_thread(store) if self.db_path else store()
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+
+        return np.ascontiguousarray(np.stack(vectors), dtype="float32")
+
+class AudioCache:
+    """On-disk cache of synthesized speech, content-addressed and bounded in total size.
+
+    Files are keyed by a hash of the text, language, model and format. Reads
+    refresh a file's modification time, so eviction removes the least
+    recently used files first. Several server processes can share one
+    directory.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = Path(path or os.getenv("TTS_CACHE_DIR", "./data/tts_cache"))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            float(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024
+        )
+        self.enabled = self.max_bytes > 0
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+
+        if self.enabled:
+            try:
+                self.path.mkdir(parents=True, exist_ok=True)
+                self._size = sum(size for _, _, size in self._files())
+            except OSError as e:
+                logger.warning(f"TTS audio cache disabled: {e}")
+                self.enabled = False
+
+    @staticmethod
+    def key(text: str, language: str, model: str, audio_format: str = "wav") -> str:
+        """Content hash identifying synthesized audio"""
+        text = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(f"{model}\x1f{language}\x1f{audio_format}\x1f{text}".encode("utf-8")).hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.path / key[:2] / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Get cached audio bytes"""
+        if not self.enabled:
+            return None
+        file = self._file(key)
+        try:
+            data = file.read_bytes()
+            os.utime(file)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Cache audio bytes, evicting old entries beyond the size bound"""
+        if not self.enabled:
+            return
+        file = self._file(key)
+        try:
+            file.parent.mkdir(exist_ok=True)
+            tmp = file.with_name(f"{file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, file)
+        except OSError as e:
+            logger.warning(f"TTS audio cache write failed: {e}")
+            return
+
+        with self._lock:
+            self._size += len(data)
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def _files(self):
+        """(mtime, path, size) of every cached file"""
+        for entry in self.path.glob("*/*"):
+            if entry.suffix == ".tmp":
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            yield stat.st_mtime, entry, stat.st_size
+
+    def _evict(self):
+        # Trim to 90% of the budget so eviction does not run on every write
+        files = sorted(self._files())
+        size = sum(file_size for _, _, file_size in files)
+        target = int(self.max_bytes * 0.9)
+        for _, entry, file_size in files:
+            if size <= target:
+                break
+            try:
+                entry.unlink()
+                size -= file_size
+            except OSError:
+                continue
+        with self._lock:
+            self._size = size
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
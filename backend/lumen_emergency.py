@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+LUMEN Emergency Module
+Compiles the emergency first aid guides into an immutable lookup table
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Languages LUMEN serves; guides missing a language fall back to English
+SUPPORTED_LANGUAGES = ("en", "hi", "ta", "bn", "te", "mr", "gu", "kn", "ml", "pa", "or", "as")
+
+DEFAULT_GUIDES_PATH = Path(__file__).parent / "data" / "emergency_guides.json"
+
+class CompiledGuide(NamedTuple):
+    """A guide response serialized once at startup"""
+    data: Mapping[str, Any]
+    body: bytes
+    etag: str
+
+class EmergencyGuideStore:
+    """Guides for every (type, language) pair, resolved and serialized ahead of time"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv("EMERGENCY_GUIDES_PATH") or DEFAULT_GUIDES_PATH)
+        with open(self.path, encoding="utf-8") as f:
+            document = json.load(f)
+
+        self.version = document.get("version", 1)
+        fallback = document.get("fallback_language", "en")
+        guides: Dict[str, Dict[str, Any]] = document["guides"]
+
+        entries: Dict[Tuple[str, str], CompiledGuide] = {}
+        for emergency_type, translations in guides.items():
+            emergency_type = sys.intern(emergency_type)
+            default = translations.get(fallback) or next(iter(translations.values()))
+            for language in dict.fromkeys(SUPPORTED_LANGUAGES + tuple(translations)):
+                language = sys.intern(language)
+                content = translations.get(language, default)
+                entries[(emergency_type, language)] = self._compile(emergency_type, language, content)
+
+        self.types = tuple(sorted(guides))
+        self._entries = MappingProxyType(entries)
+        self._fallback = sys.intern(fallback)
+
+        types_body = json.dumps({"emergency_types": list(self.types), "version": self.version}).encode("utf-8")
+        self.types_response = CompiledGuide(
+            MappingProxyType({"emergency_types": self.types, "version": self.version}),
+            types_body, self._etag(types_body)
+        )
+        logger.info(f"Loaded {len(self.types)} emergency guides (version {self.version}) from {self.path}")
+
+    def _compile(self, emergency_type: str, language: str, content: Dict[str, Any]) -> CompiledGuide:
+        data = {
+            "emergency_type": emergency_type,
+            "language": language,
+            "steps": list(content.get("steps", [])),
+            "do_not": list(content.get("do_not", [])),
+            "urgent": content.get("urgent", False),
+            "call_emergency": content.get("call_emergency", True),
+        }
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        return CompiledGuide(MappingProxyType(data), body, self._etag(body))
+
+    def _etag(self, body: bytes) -> str:
+        return f'"{self.version}-{hashlib.sha256(body).hexdigest()[:16]}"'
+
+    def get(self, emergency_type: str, language: str = "en") -> Optional[CompiledGuide]:
+        """Compiled guide for a type in a language, or None for unknown types"""
+        entry = self._entries.get((emergency_type, language))
+        if entry is None:
+            entry = self._entries.get((emergency_type, self._fallback))
+        return entry
+
+    def items(self):
+        """((type, language), guide) for every compiled guide"""
+        return self._entries.items()
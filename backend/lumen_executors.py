@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+LUMEN Executors Module
+Runs blocking model inference off the event loop on bounded per-family pools
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Model type -> inference pool family
+MODEL_FAMILIES = {
+    "chatbot": "chat",
+    "whisper": "voice",
+    "xtts": "voice",
+    "donut": "vision",
+    "blip": "vision",
+    "embedding": "embedding",
+    "multilingual_embedding": "embedding",
+}
+
+# Default (workers, queue size) per family, overridable with <FAMILY>_WORKERS
+# and <FAMILY>_QUEUE_SIZE. Pipelines are not safe to call concurrently, so
+# each family defaults to a single worker.
+FAMILY_DEFAULTS = {
+    "chat": (1, 32),
+    "voice": (1, 8),
+    "vision": (1, 8),
+    "embedding": (1, 64),
+}
+
+class InferenceQueueFull(Exception):
+    """Raised when a model family has no room for more inference work"""
+
+    def __init__(self, family: str):
+        self.family = family
+        super().__init__(f"The {family} inference queue is full, please retry shortly")
+
+class InferencePool:
+    """Thread pool with a bound on running plus queued jobs"""
+
+    def __init__(self, family: str, max_workers: int, max_queue: int):
+        self.family = family
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix=f"lumen-{family}")
+        self._pending = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking function on this pool, failing fast when it is full"""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise InferenceQueueFull(self.family)
+            self._pending += 1
+
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+
+        # Release the slot when the job finishes, even if the caller gave up
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> Dict[str, int]:
+        """Get pool occupancy"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_size": self.max_queue,
+                "pending": self._pending,
+                "rejected": self._rejected,
+            }
+
+class InferenceExecutors:
+    """Dedicated inference pools, one per model family"""
+
+    def __init__(self):
+        self.pools = {}
+        for family, (workers, queue_size) in FAMILY_DEFAULTS.items():
+            prefix = family.upper()
+            self.pools[family] = InferencePool(
+                family,
+                int(os.getenv(f"{prefix}_WORKERS", str(workers))),
+                int(os.getenv(f"{prefix}_QUEUE_SIZE", str(queue_size)))
+            )
+
+    def pool(self, family: str) -> InferencePool:
+        """Get the pool for a model family"""
+        return self.pools[family]
+
+    async def run(self, family: str, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking function on a family's pool"""
+        return await self.pools[family].run(fn, *args, **kwargs)
+
+    async def run_with_model(self, models, model_type: str, fn: Callable[[Any], Any]) -> Any:
+        """Fetch a model inside its family's pool and call fn(model) there"""
+        def job():
+            # The model stays pinned against eviction while fn runs
+            with models.use_model(model_type) as model:
+                if model is None:
+                    raise RuntimeError(f"{model_type} model unavailable")
+                return fn(model)
+
+        return await self.run(MODEL_FAMILIES[model_type], job)
+
+    async def ensure_model(self, models, model_type: str) -> bool:
+        """Check a model is available, loading it on its pool rather than the event loop"""
+        if models.is_model_loaded(model_type):
+            return True
+        return await self.run(MODEL_FAMILIES[model_type], models.is_model_available, model_type)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Get occupancy of every pool"""
+        return {family: pool.stats() for family, pool in self.pools.items()}
+
+    def shutdown(self):
+        """Stop all pools"""
+        for pool in self.pools.values():
+            pool.executor.shutdown(wait=False)
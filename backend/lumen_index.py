@@ -0,0 +1,680 @@
+#!/usr/bin/env python3
+"""
+LUMEN Index Module
+Builds, persists and memory-maps the FAISS index used for scheme search,
+and applies incremental scheme updates to it
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import faiss
+
+from lumen_retrieval import BM25Index, scheme_tokens
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates are only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "schemes.faiss"
+METADATA_FILE = "schemes.json"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "update.lock"
+
+# Partial embeddings of an interrupted build, inside the index directory
+BUILD_DIR = "build"
+
+# Bumped whenever stored indexes stop being compatible with search.
+# 3: vectors are stored under stable scheme ids, in numbered generations
+INDEX_FORMAT_VERSION = 3
+
+# Supported index types and metrics for SCHEME_INDEX_TYPE / SCHEME_INDEX_METRIC.
+# Embeddings are L2-normalized, so "ip" is cosine similarity and "l2" ranks
+# identically; both report cosine similarity as the relevance score.
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+METRICS = ("ip", "l2")
+
+def scheme_text(scheme: Dict[str, Any]) -> str:
+    """Text that represents a scheme in the vector index"""
+    return f"{scheme['name']} {scheme['description']} {scheme['eligibility']}"
+
+def encode_normalized(encoder, texts: List[str], **encode_kwargs) -> np.ndarray:
+    """Encode texts to unit-length float32 vectors"""
+    embeddings = encoder.encode(texts, normalize_embeddings=True, **encode_kwargs)
+    return np.ascontiguousarray(embeddings, dtype="float32")
+
+def assign_scheme_ids(schemes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copies of the schemes, numbering those without an id after the highest existing one"""
+    next_id = max((int(scheme["id"]) for scheme in schemes if scheme.get("id") is not None), default=0) + 1
+    numbered = []
+    for scheme in schemes:
+        scheme = dict(scheme)
+        if scheme.get("id") is None:
+            scheme["id"] = next_id
+            next_id += 1
+        scheme["id"] = int(scheme["id"])
+        numbered.append(scheme)
+    return numbered
+
+def create_index(dimension: int, count: int, index_type: Optional[str] = None,
+                 metric: Optional[str] = None) -> faiss.Index:
+    """Create an empty index of the configured type for a corpus of `count` vectors"""
+    index_type = (index_type or os.getenv("SCHEME_INDEX_TYPE", "flat")).lower()
+    metric = (metric or os.getenv("SCHEME_INDEX_METRIC", "ip")).lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown scheme index type: {index_type}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown scheme index metric: {metric}")
+
+    metric_type = faiss.METRIC_INNER_PRODUCT if metric == "ip" else faiss.METRIC_L2
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, int(os.getenv("SCHEME_HNSW_M", "32")), metric_type)
+        index.hnsw.efConstruction = int(os.getenv("SCHEME_HNSW_EF_CONSTRUCTION", "80"))
+        return index
+
+    if index_type == "ivfpq":
+        nlist = min(int(os.getenv("SCHEME_IVF_NLIST", "256")), max(1, count // 39))
+        # Each PQ codebook needs 256 training points
+        if count < 256:
+            logger.warning(f"IVF-PQ needs at least 256 schemes to train, got {count}; using a flat index")
+        else:
+            pq_m = int(os.getenv("SCHEME_PQ_M", "48"))
+            while dimension % pq_m:
+                pq_m -= 1
+            quantizer = faiss.IndexFlat(dimension, metric_type)
+            return faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8, metric_type)
+
+    return faiss.IndexFlat(dimension, metric_type)
+
+def with_id_map(index: faiss.Index) -> faiss.Index:
+    """Wrap an index so vectors are added, removed and returned by scheme id"""
+    # IVF indexes keep ids in their inverted lists already, and IndexIDMap
+    # cannot remove from them since IVF does not renumber after removal
+    if isinstance(index, faiss.IndexIVF):
+        return index
+    return faiss.IndexIDMap2(index)
+
+def _base_index(index: faiss.Index) -> faiss.Index:
+    # Downcast proxies do not own the index; callers keep `index` alive
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+def configure_search(index: faiss.Index) -> faiss.Index:
+    """Apply search-time settings (nprobe, efSearch) to a built or loaded index"""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = int(os.getenv("SCHEME_IVF_NPROBE", "16"))
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = int(os.getenv("SCHEME_HNSW_EF_SEARCH", "64"))
+    return index
+
+def similarity_scores(index: faiss.Index, distances: np.ndarray) -> np.ndarray:
+    """Convert search distances to cosine similarity"""
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return distances
+    # Squared L2 between unit vectors is 2 - 2cos
+    return 1.0 - distances / 2.0
+
+def normalize_state(state: str) -> str:
+    """Normalize a state name for lookups"""
+    return " ".join(state.casefold().split())
+
+def build_state_index(schemes: List[Dict[str, Any]], ids: Optional[List[int]] = None) -> Dict[str, np.ndarray]:
+    """Map each normalized state to the ids of schemes available there.
+    
+    National schemes (states ["all"]) are included under every state and
+    under "all" itself, which is also what unknown states resolve to.
+    """
+    ids = list(range(len(schemes))) if ids is None else ids
+    national = []
+    by_state: Dict[str, List[int]] = {}
+    for scheme_id, scheme in zip(ids, schemes):
+        states = {normalize_state(state) for state in scheme.get('states', [])}
+        if "all" in states:
+            national.append(scheme_id)
+        for state in states - {"all"}:
+            by_state.setdefault(state, []).append(scheme_id)
+
+    index = {state: np.array(sorted(set(state_ids) | set(national)), dtype="int64")
+             for state, state_ids in by_state.items()}
+    index["all"] = np.array(sorted(national), dtype="int64")
+    return index
+
+def search_parameters(index: faiss.Index, ids: np.ndarray) -> faiss.SearchParameters:
+    """Search parameters restricting results to the given ids, keeping nprobe/efSearch"""
+    selector = faiss.IDSelectorBatch(ids)
+    references = [selector]
+    id_map = faiss.downcast_index(index)
+    if isinstance(id_map, faiss.IndexIDMap):
+        # The wrapped index sees positions, not ids. Translating here stops
+        # FAISS from swapping the selector inside these shared parameters
+        # during every search, which is not safe across threads.
+        selector = faiss.IDSelectorTranslated(id_map.id_map, selector)
+        references.append(selector)
+
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    # The parameters only hold raw pointers to the selectors
+    params.referenced_objects = references
+    return params
+
+def build_index(embeddings: np.ndarray, index_type: Optional[str] = None,
+                metric: Optional[str] = None) -> faiss.Index:
+    """Build an index over normalized embeddings"""
+    index = create_index(embeddings.shape[1], embeddings.shape[0], index_type, metric)
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+    return configure_search(index)
+
+def build_scheme_index(encoder, schemes: List[Dict[str, Any]], index_type: Optional[str] = None,
+                       metric: Optional[str] = None) -> faiss.Index:
+    """Encode schemes and build a FAISS index over them, keyed by scheme id"""
+    return SchemeIndexBuilder(encoder).build([scheme_text(scheme) for scheme in schemes],
+                                             index_type=index_type, metric=metric,
+                                             ids=[scheme["id"] for scheme in schemes])
+
+def update_index(index: faiss.Index, remove_ids: np.ndarray, add_ids: np.ndarray,
+                 embeddings: Optional[np.ndarray]) -> faiss.Index:
+    """Copy of an index with remove_ids dropped and embeddings added under add_ids.
+
+    The index being served is never modified, so searches keep using it
+    until the copy is swapped in. HNSW graphs cannot drop nodes, so they
+    are rebuilt from their stored vectors; nothing is re-encoded.
+    """
+    remove_ids = np.asarray(remove_ids, dtype="int64")
+    add_ids = np.asarray(add_ids, dtype="int64")
+    base = _base_index(index)
+
+    if isinstance(base, faiss.IndexHNSW):
+        ids = faiss.vector_to_array(faiss.downcast_index(index).id_map)
+        keep = ~np.isin(ids, remove_ids)
+        vectors = base.reconstruct_n(0, base.ntotal)[keep]
+        ids = ids[keep]
+        if len(add_ids):
+            vectors = np.vstack([vectors, embeddings])
+            ids = np.concatenate([ids, add_ids])
+        graph = faiss.IndexHNSWFlat(base.d, base.hnsw.nb_neighbors(1), base.metric_type)
+        graph.hnsw.efConstruction = base.hnsw.efConstruction
+        updated = faiss.IndexIDMap2(graph)
+        if len(ids):
+            updated.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), ids)
+        return configure_search(updated)
+
+    if isinstance(base, faiss.IndexIVF) and \
+            not isinstance(faiss.downcast_InvertedLists(base.invlists), faiss.ArrayInvertedLists):
+        updated = _copy_mapped_ivf(base)
+    else:
+        # A serialized round trip also copies memory-mapped data into memory
+        updated = faiss.deserialize_index(faiss.serialize_index(index))
+    if len(remove_ids):
+        updated.remove_ids(faiss.IDSelectorBatch(remove_ids))
+    if len(add_ids):
+        updated.add_with_ids(np.ascontiguousarray(embeddings, dtype="float32"), add_ids)
+    return configure_search(updated)
+
+def _copy_mapped_ivf(index: faiss.IndexIVF) -> faiss.Index:
+    """In-memory copy of an IVF index whose inverted lists are memory-mapped"""
+    # Memory-mapped inverted lists serialize as a reference to their file,
+    # so serialize only the quantizer and codec and copy the lists over
+    updated = faiss.deserialize_index(faiss.serialize_index(index), faiss.IO_FLAG_SKIP_IVF_DATA)
+    source = index.invlists
+    lists = faiss.ArrayInvertedLists(index.nlist, index.code_size)
+    for list_no in range(index.nlist):
+        size = source.list_size(list_no)
+        if not size:
+            continue
+        ids, codes = source.get_ids(list_no), source.get_codes(list_no)
+        lists.add_entries(list_no, size, ids, codes)
+        source.release_ids(list_no, ids)
+        source.release_codes(list_no, codes)
+    # The copy owns the lists from here on
+    lists.this.disown()
+    faiss.downcast_index(updated).replace_invlists(lists, True)
+    return updated
+
+def _name_key(name: str) -> str:
+    return " ".join(str(name).casefold().split())
+
+class SchemeUpdate(NamedTuple):
+    """The catalog after upserts and deletes, and the vectors that change"""
+    schemes: List[Dict[str, Any]]
+    embed: List[Dict[str, Any]]  # new schemes and schemes whose indexed text changed
+    remove_ids: np.ndarray       # ids whose current vectors leave the index
+    upserted: List[int]
+    deleted: List[int]
+
+    @property
+    def embed_ids(self) -> np.ndarray:
+        return np.array([scheme["id"] for scheme in self.embed], dtype="int64")
+
+def plan_scheme_update(schemes: List[Dict[str, Any]], upserts: Iterable[Dict[str, Any]] = (),
+                       delete_ids: Iterable[int] = ()) -> SchemeUpdate:
+    """Apply upserts and deletes to a catalog, working out which schemes need embedding.
+
+    An upsert replaces the scheme with the same id or, without an id, the
+    same name; otherwise it is added under a new id. Metadata-only changes
+    (coverage, helpline, ...) keep the existing vector.
+    """
+    by_id = {scheme["id"]: scheme for scheme in schemes}
+    indexed = set(by_id)
+    ids_by_name = {_name_key(scheme["name"]): scheme["id"] for scheme in schemes}
+    next_id = max(by_id, default=0) + 1
+
+    deleted = []
+    for scheme_id in dict.fromkeys(int(i) for i in delete_ids):
+        scheme = by_id.pop(scheme_id, None)
+        if scheme is not None:
+            ids_by_name.pop(_name_key(scheme["name"]), None)
+            deleted.append(scheme_id)
+
+    changed = set()
+    upserted = []
+    for scheme in upserts:
+        missing = [field for field in ("name", "description", "eligibility") if not scheme.get(field)]
+        if missing:
+            raise ValueError(f"Scheme {scheme.get('name', '')!r} is missing {', '.join(missing)}")
+
+        scheme = dict(scheme)
+        scheme_id = scheme.get("id")
+        if scheme_id is None:
+            scheme_id = ids_by_name.get(_name_key(scheme["name"]))
+        if scheme_id is None:
+            scheme_id = next_id
+        scheme_id = scheme["id"] = int(scheme_id)
+        next_id = max(next_id, scheme_id + 1)
+
+        previous = by_id.get(scheme_id)
+        if previous is not None:
+            ids_by_name.pop(_name_key(previous["name"]), None)
+        if previous is None or scheme_text(previous) != scheme_text(scheme):
+            changed.add(scheme_id)
+        by_id[scheme_id] = scheme
+        ids_by_name[_name_key(scheme["name"])] = scheme_id
+        upserted.append(scheme_id)
+
+    return SchemeUpdate(
+        schemes=list(by_id.values()),
+        embed=[by_id[scheme_id] for scheme_id in sorted(changed)],
+        remove_ids=np.array(sorted((changed | set(deleted)) & indexed), dtype="int64"),
+        upserted=upserted,
+        deleted=deleted,
+    )
+
+def token_lengths(encoder, texts: List[str]) -> np.ndarray:
+    """Number of tokens the encoder will see for each text, after truncation"""
+    tokenizer = getattr(encoder, "tokenizer", None)
+    if tokenizer is None:
+        # Encoders in the model server: roughly four characters per token
+        return np.array([max(1, len(text) // 4) for text in texts], dtype="int64")
+
+    max_length = getattr(encoder, "max_seq_length", None)
+    lengths: List[int] = []
+    for start in range(0, len(texts), 1024):
+        encoded = tokenizer(texts[start:start + 1024], truncation=max_length is not None, max_length=max_length)
+        lengths.extend(len(ids) for ids in encoded["input_ids"])
+    return np.array(lengths, dtype="int64")
+
+def token_budget_batches(order: np.ndarray, lengths: np.ndarray, max_batch_tokens: int,
+                         start: int = 0) -> Iterator[Tuple[int, np.ndarray]]:
+    """(position, text ids) batches of texts sorted longest first, each fitting the token budget once padded"""
+    while start < len(order):
+        # The first text of a batch is its longest, so it sets the padded length
+        size = max(1, max_batch_tokens // max(1, int(lengths[order[start]])))
+        yield start, order[start:start + size]
+        start += size
+
+class SchemeIndexBuilder:
+    """Builds an index over a large corpus with bounded memory.
+
+    Texts are encoded longest first in batches sized by a token budget, so
+    each batch pads to similar lengths. Embeddings go to a memory-mapped
+    file in work_dir along with the number of texts done, so an interrupted
+    build resumes where it stopped. The index is then trained on a sample
+    and filled in chunks read back from that file.
+    """
+
+    EMBEDDINGS_FILE = "embeddings.npy"
+    STATE_FILE = "progress.json"
+
+    def __init__(self, encoder, work_dir: Optional[Path] = None, max_batch_tokens: Optional[int] = None,
+                 add_chunk_size: Optional[int] = None, train_size: Optional[int] = None,
+                 progress: Optional[Callable[[str, int, int], None]] = None):
+        self.encoder = encoder
+        self.work_dir = Path(work_dir) if work_dir else None
+        self.max_batch_tokens = max_batch_tokens or int(os.getenv("SCHEME_INDEX_BATCH_TOKENS", "16384"))
+        self.add_chunk_size = add_chunk_size or int(os.getenv("SCHEME_INDEX_ADD_CHUNK", "10000"))
+        self.train_size = train_size or int(os.getenv("SCHEME_INDEX_TRAIN_SIZE", "65536"))
+        self.progress = progress
+
+    def build(self, texts: List[str], model_name: str = "", index_type: Optional[str] = None,
+              metric: Optional[str] = None, ids: Optional[List[int]] = None) -> faiss.Index:
+        """Encode texts and build an index returning the given ids (by default, positions)"""
+        if not texts:
+            raise ValueError("No texts to index")
+        ids = np.arange(len(texts), dtype="int64") if ids is None else np.asarray(ids, dtype="int64")
+
+        embeddings = self.encode(texts, model_name)
+        index = create_index(embeddings.shape[1], len(texts), index_type, metric)
+        if not index.is_trained:
+            index.train(self._training_sample(embeddings))
+        index = with_id_map(index)
+
+        for start in range(0, len(texts), self.add_chunk_size):
+            index.add_with_ids(np.ascontiguousarray(embeddings[start:start + self.add_chunk_size]),
+                               ids[start:start + self.add_chunk_size])
+            self._report("index", min(start + self.add_chunk_size, len(texts)), len(texts))
+        return configure_search(index)
+
+    def encode(self, texts: List[str], model_name: str = "") -> np.ndarray:
+        """Normalized embeddings in corpus order, resuming a matching partial build"""
+        lengths = token_lengths(self.encoder, texts)
+        order = np.argsort(-lengths, kind="stable")
+
+        fingerprint = self._fingerprint(texts, model_name)
+        done, embeddings = self._resume(fingerprint, len(texts))
+        if done:
+            logger.info(f"Resuming scheme encoding at {done}/{len(texts)}")
+            self._report("encode", done, len(texts))
+
+        for start, batch in token_budget_batches(order, lengths, self.max_batch_tokens, done):
+            vectors = encode_normalized(self.encoder, [texts[i] for i in batch], batch_size=len(batch))
+            if embeddings is None:
+                embeddings = self._allocate(len(texts), vectors.shape[1])
+            embeddings[batch] = vectors
+            done = start + len(batch)
+            if self.work_dir is not None:
+                # Rows must be on disk before the progress that covers them
+                embeddings.flush()
+                self._write_state(fingerprint, done)
+            self._report("encode", done, len(texts))
+
+        return embeddings
+
+    def cleanup(self):
+        """Remove the partial build files once the index is saved"""
+        if self.work_dir is not None:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    @staticmethod
+    def _fingerprint(texts: List[str], model_name: str) -> str:
+        digest = hashlib.sha256(model_name.encode("utf-8"))
+        for text in texts:
+            digest.update(b"\x1e" + text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _resume(self, fingerprint: str, count: int) -> Tuple[int, Optional[np.ndarray]]:
+        if self.work_dir is None:
+            return 0, None
+        try:
+            with open(self.work_dir / self.STATE_FILE, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("fingerprint") != fingerprint:
+                logger.info("Corpus or model changed since the interrupted build; starting over")
+                return 0, None
+            embeddings = np.lib.format.open_memmap(self.work_dir / self.EMBEDDINGS_FILE, mode="r+")
+        except (FileNotFoundError, ValueError):
+            return 0, None
+        if embeddings.shape[0] != count:
+            return 0, None
+        return int(state["done"]), embeddings
+
+    def _allocate(self, count: int, dimension: int) -> np.ndarray:
+        if self.work_dir is None:
+            return np.empty((count, dimension), dtype="float32")
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        return np.lib.format.open_memmap(self.work_dir / self.EMBEDDINGS_FILE, mode="w+",
+                                         dtype="float32", shape=(count, dimension))
+
+    def _write_state(self, fingerprint: str, done: int):
+        path = self.work_dir / self.STATE_FILE
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "done": done}, f)
+        os.replace(tmp_path, path)
+
+    def _training_sample(self, embeddings: np.ndarray) -> np.ndarray:
+        if len(embeddings) <= self.train_size:
+            return np.ascontiguousarray(embeddings[:])
+        rows = np.sort(np.random.default_rng(0).choice(len(embeddings), self.train_size, replace=False))
+        return np.ascontiguousarray(embeddings[rows])
+
+    def _report(self, stage: str, done: int, total: int):
+        if self.progress is not None:
+            self.progress(stage, done, total)
+
+class SchemeSnapshot:
+    """One generation of the scheme catalog: metadata, vector index and the lookups built from them.
+
+    Never modified once built; updates build a new snapshot and swap it in,
+    so each search sees a single consistent generation. BM25 and the state
+    index work on positions in `schemes`, the vector index on scheme ids.
+    """
+
+    def __init__(self, schemes: List[Dict[str, Any]], index: Optional[faiss.Index] = None, generation: int = 0):
+        self.schemes = schemes
+        self.index = index
+        self.generation = generation
+        self.ids = np.array([scheme["id"] for scheme in schemes], dtype="int64")
+        self.positions = {int(scheme_id): position for position, scheme_id in enumerate(self.ids)}
+        if len(self.positions) != len(schemes):
+            raise ValueError("Scheme ids are not unique")
+        self.state_index = build_state_index(schemes)
+        self.lexical_index = BM25Index([scheme_tokens(scheme) for scheme in schemes])
+        self._state_filters: Dict[str, faiss.SearchParameters] = {}
+
+    def state_positions(self, state: Optional[str]) -> Optional[np.ndarray]:
+        """Positions of schemes available in a state, or None for no state filter"""
+        if state is None:
+            return None
+        return self.state_index.get(normalize_state(state), self.state_index["all"])
+
+    def search_params(self, state: str) -> faiss.SearchParameters:
+        """FAISS search parameters restricted to a state's schemes, built once per state"""
+        key = normalize_state(state)
+        params = self._state_filters.get(key)
+        if params is None:
+            params = search_parameters(self.index, self.ids[self.state_positions(state)])
+            self._state_filters[key] = params
+        return params
+
+    def vector_hits(self, distances: np.ndarray, labels: np.ndarray) -> List[List[Tuple[int, float]]]:
+        """(position, cosine similarity) pairs for each query's search results"""
+        scores = similarity_scores(self.index, distances)
+        return [
+            # FAISS pads with -1 when fewer than k results exist
+            [(self.positions[int(label)], float(score)) for score, label in zip(query_scores, query_labels)
+             if int(label) in self.positions]
+            for query_scores, query_labels in zip(scores, labels)
+        ]
+
+class StoreLock:
+    """Exclusive lock on an index directory, so writers apply updates one at a time"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+class SchemeIndexStore:
+    """On-disk scheme index and metadata shared by every worker.
+
+    Each save writes a new numbered generation of the index and metadata,
+    then points the manifest at it with an atomic rename. Readers follow
+    the manifest, so they see either the old or the new generation.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv("VECTOR_DB_PATH", "./data/vector_db"))
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.path / MANIFEST_FILE
+
+    def exists(self) -> bool:
+        """Check whether a built index is present"""
+        return self.manifest_path.exists()
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        """Read the manifest describing the current generation"""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def generation(self) -> Optional[int]:
+        """Number of the current generation, if an index is built"""
+        manifest = self.read_manifest()
+        return None if manifest is None else manifest.get("generation", 0)
+
+    def lock(self) -> StoreLock:
+        """Lock to hold from reading the current generation until saving the next one"""
+        return StoreLock(self.path / LOCK_FILE)
+
+    def _generation_path(self, name: str, generation: int) -> Path:
+        stem, suffix = os.path.splitext(name)
+        return self.path / f"{stem}-{generation:06d}{suffix}"
+
+    def save(self, index: faiss.Index, schemes: List[Dict[str, Any]], model_name: str) -> int:
+        """Write the index and scheme metadata as a new generation and switch the manifest to it.
+
+        Concurrent writers must hold lock() around this.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        generation = (self.generation() or 0) + 1
+
+        index_path = self._generation_path(INDEX_FILE, generation)
+        metadata_path = self._generation_path(METADATA_FILE, generation)
+        self._write_index(index, index_path)
+        self._write_json(metadata_path, schemes)
+        # The rename of the manifest is what publishes the generation
+        self._write_json(self.manifest_path, {
+            "format": INDEX_FORMAT_VERSION,
+            "generation": generation,
+            "index_file": index_path.name,
+            "metadata_file": metadata_path.name,
+            "model": model_name,
+            "dimension": index.d,
+            "count": index.ntotal,
+            "index_type": type(_base_index(index)).__name__,
+            "metric": "ip" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2",
+            "built_at": datetime.now().isoformat()
+        })
+        self._prune(generation)
+
+        logger.info(f"Saved scheme index generation {generation} with {index.ntotal} schemes to {self.path}")
+        return generation
+
+    def _prune(self, generation: int):
+        """Delete generations before the previous one, which a worker may still be loading"""
+        for name in (INDEX_FILE, METADATA_FILE):
+            stem, suffix = os.path.splitext(name)
+            for path in self.path.glob(f"{stem}-*{suffix}"):
+                number = path.name[len(stem) + 1:-len(suffix)]
+                if number.isdigit() and int(number) < generation - 1:
+                    # Workers that memory-mapped it keep their pages until they swap
+                    path.unlink(missing_ok=True)
+
+    def load_schemes(self) -> Optional[List[Dict[str, Any]]]:
+        """Scheme metadata of the current generation"""
+        manifest = self.read_manifest()
+        if manifest is None or manifest.get("format") != INDEX_FORMAT_VERSION:
+            return None
+        with open(self.path / manifest["metadata_file"], encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self, model_name: str) -> Optional[SchemeSnapshot]:
+        """Memory-map the current generation's index and load its metadata, if built for this model"""
+        manifest = self.read_manifest()
+        if manifest is None:
+            return None
+
+        if manifest.get("format") != INDEX_FORMAT_VERSION:
+            logger.warning(f"Scheme index in {self.path} has an old format; rebuild it with build_scheme_index.py")
+            return None
+
+        if manifest.get("model") != model_name:
+            logger.warning(
+                f"Scheme index in {self.path} was built with {manifest.get('model')}, "
+                f"not {model_name}; ignoring it"
+            )
+            return None
+
+        index = self._read_index(self.path / manifest["index_file"])
+        with open(self.path / manifest["metadata_file"], encoding="utf-8") as f:
+            schemes = json.load(f)
+
+        if index.ntotal != len(schemes):
+            logger.warning(f"Scheme index in {self.path} does not match its metadata; ignoring it")
+            return None
+
+        return SchemeSnapshot(schemes, configure_search(index), manifest["generation"])
+
+    @staticmethod
+    def _read_index(path: Path) -> faiss.Index:
+        """Read an index memory-mapped so workers share its pages"""
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        # Newer FAISS can also memory-map flat index codes, but refuses that
+        # flag for IVF inverted lists, which plain IO_FLAG_MMAP does map
+        attempts = [flags]
+        if getattr(faiss, "IO_FLAG_MMAP_IFC", 0):
+            attempts.insert(0, flags | faiss.IO_FLAG_MMAP_IFC)
+        for attempt in attempts:
+            try:
+                return faiss.read_index(str(path), attempt)
+            except RuntimeError as e:
+                error = e
+        logger.error(f"Could not memory-map {path}, so every worker reads its own copy: {error}")
+        return faiss.read_index(str(path))
+
+    @staticmethod
+    def _write_index(index: faiss.Index, path: Path):
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _write_json(path: Path, data: Any):
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
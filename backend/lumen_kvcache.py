@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+LUMEN KV Cache Module
+Reuses the chatbot's past key/values: shared prompt prefixes, and
+server-side chat sessions that keep their state between turns
+"""
+
+import os
+import copy
+import time
+import uuid
+import weakref
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import torch
+
+from lumen_backends import supports_kv_reuse
+
+logger = logging.getLogger(__name__)
+
+class SessionNotFound(KeyError):
+    """Raised for unknown or expired chat session ids"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        super().__init__(session_id)
+
+    def __str__(self) -> str:
+        return f"Chat session '{self.session_id}' not found or expired"
+
+def cache_nbytes(past_key_values) -> int:
+    """Memory held by a model's past key/values"""
+    if past_key_values is None:
+        return 0
+    if hasattr(past_key_values, "layers"):
+        tensors = [t for layer in past_key_values.layers for t in (layer.keys, layer.values)]
+    elif hasattr(past_key_values, "key_cache"):
+        tensors = list(past_key_values.key_cache) + list(past_key_values.value_cache)
+    else:
+        tensors = [t for layer in past_key_values for t in layer]
+    return sum(t.numel() * t.element_size() for t in tensors if isinstance(t, torch.Tensor))
+
+class PrefixCache:
+    """KV state of fixed prompt prefixes, computed once per loaded model.
+
+    Each generation gets its own copy of a prefix's cache, so only the
+    request-specific suffix goes through prefill.
+    """
+
+    def __init__(self, prefixes: Iterable[str] = ()):
+        self.prefixes = list(dict.fromkeys(prefixes))
+        self._entries: Dict[str, Tuple[List[int], Any]] = {}
+        self._model_ref = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def supports(chatbot) -> bool:
+        """Whether the chatbot model can start generation from a cached prefix"""
+        return supports_kv_reuse(chatbot.model)
+
+    def get(self, chatbot, prefix: str) -> Tuple[List[int], Any]:
+        """Token ids of a prefix and a private copy of its past key/values"""
+        model = chatbot.model
+        with self._lock:
+            if self._model_ref is None or self._model_ref() is not model:
+                # First use of a (re)loaded model: compute every known prefix at once
+                self._entries = {}
+                self._model_ref = weakref.ref(model)
+                for known in self.prefixes:
+                    self._entries[known] = self._compute(chatbot, known)
+            entry = self._entries.get(prefix)
+            if entry is None:
+                entry = self._entries[prefix] = self._compute(chatbot, prefix)
+        token_ids, past_key_values = entry
+        return list(token_ids), copy.deepcopy(past_key_values)
+
+    @staticmethod
+    def _compute(chatbot, prefix: str) -> Tuple[List[int], Any]:
+        token_ids = chatbot.tokenizer.encode(prefix)
+        input_ids = torch.tensor([token_ids], device=chatbot.model.device)
+        with torch.inference_mode():
+            output = chatbot.model(input_ids=input_ids, use_cache=True)
+        return token_ids, output.past_key_values
+
+    def generate(self, chatbot, prefix: str, suffix: str, **generate_kwargs) -> str:
+        """Generate from prefix + suffix, running prefill only on the suffix.
+
+        Returns the prompt followed by the generated text, like the
+        text-generation pipeline.
+        """
+        token_ids, past_key_values = self.get(chatbot, prefix)
+        input_ids = torch.tensor([token_ids + chatbot.tokenizer.encode(suffix)], device=chatbot.model.device)
+        output = chatbot.model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=past_key_values,
+            **generate_kwargs
+        )
+        sequence = output.sequences[0] if hasattr(output, "sequences") else output[0]
+        reply = chatbot.tokenizer.decode(sequence[input_ids.shape[1]:], skip_special_tokens=True)
+        return prefix + suffix + reply
+
+    def stats(self) -> Dict[str, Any]:
+        """Cached prefixes and their memory"""
+        with self._lock:
+            return {
+                "prefixes": len(self._entries),
+                "tokens": sum(len(ids) for ids, _ in self._entries.values()),
+                "kv_cache_mb": sum(cache_nbytes(kv) for _, kv in self._entries.values()) / 1024 / 1024,
+            }
+
+class ConversationSession:
+    """Token history of one conversation, with the model's KV cache when it fits in memory"""
+
+    def __init__(self, session_id: str, language: str, system_prompt: str):
+        self.session_id = session_id
+        self.language = language
+        self.system_prompt = system_prompt
+        self.created_at = self.last_used = time.time()
+        self.turns = 0
+
+        # Token ids the model has seen: system prompt, then alternating turns and replies
+        self.token_ids: List[int] = []
+        self.prefix_length = 0
+        self.turn_starts: List[int] = []
+
+        # Keys/values for token_ids[:-1]; the last generated token is never fed back
+        self.past_key_values = None
+        self.kv_bytes = 0
+
+        # One turn at a time per session
+        self.lock = asyncio.Lock()
+
+    def drop_cache(self):
+        """Free the KV cache; the next turn re-encodes the history"""
+        self.past_key_values = None
+        self.kv_bytes = 0
+
+    def generate(self, chatbot, turn_text: str, max_new_tokens: int, max_tokens: int,
+                 prefix_cache: Optional[PrefixCache] = None, **generate_kwargs) -> str:
+        """Generate a reply to a new turn, processing only tokens not already cached.
+
+        Returns the turn text followed by the reply, like the text-generation
+        pipeline returns the prompt followed by the generated text.
+        """
+        tokenizer, model = chatbot.tokenizer, chatbot.model
+        if not self.token_ids:
+            # A new session starts from the shared system prompt state
+            if prefix_cache is not None and prefix_cache.supports(chatbot):
+                self.token_ids, self.past_key_values = prefix_cache.get(chatbot, self.system_prompt)
+            else:
+                self.token_ids = tokenizer.encode(self.system_prompt)
+            self.prefix_length = len(self.token_ids)
+
+        self.turn_starts.append(len(self.token_ids))
+        self.token_ids = self.token_ids + tokenizer.encode(turn_text)
+        self._truncate(max_tokens - max_new_tokens)
+
+        input_ids = torch.tensor([self.token_ids], device=model.device)
+        if self.past_key_values is not None:
+            # generate() skips the positions the cache already covers
+            generate_kwargs["past_key_values"] = self.past_key_values
+
+        try:
+            output = model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=max_new_tokens,
+                return_dict_in_generate=True,
+                use_cache=True,
+                **generate_kwargs
+            )
+        except Exception:
+            # A failed turn leaves the cache in an unknown state
+            self.token_ids = self.token_ids[:self.turn_starts.pop()]
+            self.drop_cache()
+            raise
+
+        new_tokens = output.sequences[0, input_ids.shape[1]:].tolist()
+        self.token_ids = self.token_ids + new_tokens
+        if supports_kv_reuse(model):
+            self.past_key_values = output.past_key_values
+            self.kv_bytes = cache_nbytes(self.past_key_values)
+        self.turns += 1
+        return turn_text + tokenizer.decode(new_tokens, skip_special_tokens=True)
+
+    def _truncate(self, limit: int):
+        """Drop the oldest turns, keeping the system prompt, so history fits in limit tokens"""
+        if len(self.token_ids) <= limit:
+            return
+
+        # Truncating invalidates the KV cache, so drop down to half the limit
+        # to let the following turns reuse the cache again
+        prefix = self.token_ids[:self.prefix_length]
+        keep_from = None
+        for start in self.turn_starts:
+            if self.prefix_length + len(self.token_ids) - start <= limit // 2:
+                keep_from = start
+                break
+        if keep_from is None and self.prefix_length + len(self.token_ids) - self.turn_starts[-1] <= limit:
+            keep_from = self.turn_starts[-1]
+
+        if keep_from is None:
+            # The newest turn alone is too long: keep its tail
+            tail = self.token_ids[len(self.token_ids) - max(limit - self.prefix_length, 1):]
+            self.token_ids = prefix + tail
+            self.turn_starts = [self.prefix_length]
+        else:
+            shift = keep_from - self.prefix_length
+            self.token_ids = prefix + self.token_ids[keep_from:]
+            self.turn_starts = [start - shift for start in self.turn_starts if start >= keep_from]
+
+        # Positions moved, so cached keys/values no longer line up
+        self.drop_cache()
+
+class SessionStore:
+    """Chat sessions with idle expiry and a memory budget for their KV caches"""
+
+    def __init__(self, memory_budget_mb: Optional[float] = None, idle_timeout_s: Optional[float] = None,
+                 max_sessions: Optional[int] = None):
+        budget = memory_budget_mb if memory_budget_mb is not None else float(os.getenv("CHAT_SESSION_MEMORY_MB", "512"))
+        self.memory_budget = int(budget * 1024 * 1024)
+        self.idle_timeout = idle_timeout_s if idle_timeout_s is not None else float(os.getenv("CHAT_SESSION_IDLE_S", "1800"))
+        self.max_sessions = max_sessions if max_sessions is not None else int(os.getenv("CHAT_SESSION_MAX", "1000"))
+        self.max_tokens = int(os.getenv("CHAT_SESSION_MAX_TOKENS", "768"))
+        self.max_new_tokens = int(os.getenv("CHAT_SESSION_MAX_NEW_TOKENS", "128"))
+
+        # Sessions in least-recently-used order
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted_caches = 0
+
+    def create(self, language: str, system_prompt: str) -> ConversationSession:
+        """Start a new session"""
+        session = ConversationSession(uuid.uuid4().hex, language, system_prompt)
+        with self._lock:
+            self._expire(time.time())
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+            self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str) -> ConversationSession:
+        """Get a live session, raising SessionNotFound otherwise"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise SessionNotFound(session_id)
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        """End a session"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def record(self, session: ConversationSession):
+        """Account for a session's KV cache after a turn, freeing caches of idle sessions if over budget"""
+        with self._lock:
+            session.last_used = time.time()
+            total = sum(s.kv_bytes for s in self._sessions.values())
+            for other in list(self._sessions.values()):
+                if total <= self.memory_budget:
+                    break
+                if other is session or not other.kv_bytes:
+                    continue
+                total -= other.kv_bytes
+                other.drop_cache()
+                self.evicted_caches += 1
+            if total > self.memory_budget and session.kv_bytes:
+                session.drop_cache()
+                self.evicted_caches += 1
+
+    def _expire(self, now: float):
+        if not self.idle_timeout:
+            return
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used < self.idle_timeout:
+                break
+            self._sessions.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Session counts and KV cache memory"""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "kv_cache_mb": sum(s.kv_bytes for s in self._sessions.values()) / 1024 / 1024,
+                "memory_budget_mb": self.memory_budget / 1024 / 1024,
+                "cached_sessions": sum(1 for s in self._sessions.values() if s.kv_bytes),
+                "evicted_caches": self.evicted_caches,
+                "idle_timeout_s": self.idle_timeout,
+            }
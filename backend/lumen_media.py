@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+LUMEN Media Module
+Decodes uploaded audio and images in memory for the model pipelines
+"""
+
+import io
+import re
+import wave
+import struct
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+import librosa
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Whisper expects 16 kHz mono audio
+WHISPER_SAMPLING_RATE = 16000
+
+# LUMEN languages Whisper can be forced to decode; others (Odia) are auto-detected
+WHISPER_LANGUAGES = frozenset({"en", "hi", "ta", "bn", "te", "mr", "gu", "kn", "ml", "pa", "as"})
+
+def decode_audio(data: bytes, sampling_rate: int = WHISPER_SAMPLING_RATE) -> np.ndarray:
+    """Decode an uploaded audio file to a mono float32 array at the given rate"""
+    try:
+        audio, source_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+        if source_rate != sampling_rate:
+            audio = librosa.resample(audio, orig_sr=source_rate, target_sr=sampling_rate)
+    except RuntimeError:
+        # Compressed browser formats (webm/opus, mp3, m4a) go through ffmpeg over pipes
+        from transformers.pipelines.audio_utils import ffmpeg_read
+        audio = ffmpeg_read(data, sampling_rate)
+
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+# PCM encodings accepted on the streaming speech endpoint
+PCM_ENCODINGS = {
+    "pcm_s16le": (np.dtype("<i2"), 32768.0),
+    "pcm_f32le": (np.dtype("<f4"), 1.0),
+}
+
+def decode_pcm(data: bytes, encoding: str = "pcm_s16le") -> np.ndarray:
+    """Decode raw mono PCM bytes to float32 samples"""
+    dtype, scale = PCM_ENCODINGS[encoding]
+    usable = len(data) - len(data) % dtype.itemsize
+    return np.frombuffer(data[:usable], dtype=dtype).astype(np.float32) / scale
+
+def resample_audio(samples: np.ndarray, source_rate: int,
+                   sampling_rate: int = WHISPER_SAMPLING_RATE) -> np.ndarray:
+    """Resample mono float32 audio"""
+    if source_rate == sampling_rate:
+        return samples
+    return librosa.resample(samples, orig_sr=source_rate, target_sr=sampling_rate).astype(np.float32)
+
+# Compressed encoding for the streaming speech endpoint, e.g. MediaRecorder's audio/ogg;codecs=opus
+OGG_OPUS_ENCODING = "ogg_opus"
+STREAM_ENCODINGS = tuple(PCM_ENCODINGS) + (OGG_OPUS_ENCODING,)
+
+class OggOpusStreamDecoder:
+    """Decodes an Ogg Opus stream that arrives in arbitrarily split chunks.
+
+    Audio is decoded as Ogg pages complete. Each batch of new pages is put
+    behind the stream's header pages, so libsndfile sees a valid stream,
+    and the previous audio page, which primes the decoder; only the new
+    pages' samples are returned, resampled to the rate the caller works at.
+    """
+
+    _PAGE_HEADER = 27
+    # Opus granule positions count 48 kHz samples whatever the input rate
+    _GRANULE_RATE = 48000
+
+    def __init__(self, sampling_rate: int = WHISPER_SAMPLING_RATE):
+        self.sampling_rate = sampling_rate
+        self._buffer = bytearray()
+        self._headers: List[bytes] = []
+        self._pending: List[bytes] = []
+        self._previous: Optional[bytes] = None
+
+    def decode(self, data: bytes) -> np.ndarray:
+        """Mono float32 samples for the pages completed by data (possibly none)"""
+        self._buffer += data
+        for page in self._complete_pages():
+            # OpusHead and OpusTags pages come first, with granule position 0
+            if self._previous is None and not self._pending and self._granule(page) == 0:
+                self._headers.append(page)
+            else:
+                self._pending.append(page)
+        # A page where no packet ends (granule -1) waits for the next one
+        if not self._pending or self._granule(self._pending[-1]) == -1:
+            return np.zeros(0, dtype=np.float32)
+
+        pages, self._pending = self._pending, []
+        context = [self._previous] if self._previous is not None else []
+        audio, source_rate = sf.read(io.BytesIO(b"".join(self._headers + context + pages)),
+                                     dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+        if self._previous is not None:
+            new = (self._granule(pages[-1]) - self._granule(self._previous)) * source_rate // self._GRANULE_RATE
+            audio = audio[max(len(audio) - max(new, 0), 0):]
+        self._previous = pages[-1]
+        return np.ascontiguousarray(resample_audio(audio, source_rate, self.sampling_rate), dtype=np.float32)
+
+    @staticmethod
+    def _granule(page: bytes) -> int:
+        return struct.unpack_from("<q", page, 6)[0]
+
+    def _complete_pages(self) -> List[bytes]:
+        pages = []
+        while len(self._buffer) >= self._PAGE_HEADER:
+            if self._buffer[:4] != b"OggS":
+                raise ValueError("Not an Ogg stream")
+            segments = self._buffer[26]
+            header_size = self._PAGE_HEADER + segments
+            if len(self._buffer) < header_size:
+                break
+            size = header_size + sum(self._buffer[self._PAGE_HEADER:header_size])
+            if len(self._buffer) < size:
+                break
+            pages.append(bytes(self._buffer[:size]))
+            del self._buffer[:size]
+        return pages
+
+# Encoded formats for synthesized speech
+AUDIO_MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "ogg": "audio/ogg",
+}
+
+# Sampling rates the Opus codec accepts
+OPUS_SAMPLING_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# Sentence ends in Latin and Indic scripts (danda and double danda)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?\u0964\u0965])\s+")
+
+def split_sentences(text: str, min_chars: int = 20) -> List[str]:
+    """Split text into sentences for incremental synthesis, merging very short ones"""
+    sentences: List[str] = []
+    for piece in _SENTENCE_END_RE.split(text.strip()):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if sentences and len(sentences[-1]) < min_chars:
+            sentences[-1] = f"{sentences[-1]} {piece}"
+        else:
+            sentences.append(piece)
+    return sentences
+
+def to_pcm16(samples: np.ndarray) -> bytes:
+    """Convert float audio in [-1, 1] to little-endian 16-bit PCM"""
+    samples = np.clip(np.asarray(samples, dtype=np.float32).reshape(-1), -1.0, 1.0)
+    return (samples * 32767.0).astype("<i2").tobytes()
+
+def wav_stream_header(sampling_rate: int) -> bytes:
+    """WAV header for mono 16-bit PCM of unknown length, for streamed responses"""
+    unknown = 0xFFFFFFFF
+    return (
+        b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sampling_rate, sampling_rate * 2, 2, 16)
+        + b"data" + struct.pack("<I", unknown)
+    )
+
+def encode_audio(samples: np.ndarray, sampling_rate: int, audio_format: str = "wav") -> bytes:
+    """Encode mono float audio as WAV (16-bit PCM) or Ogg Opus bytes"""
+    buffer = io.BytesIO()
+    if audio_format == "ogg":
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if sampling_rate not in OPUS_SAMPLING_RATES:
+            # e.g. 22.05 kHz voices: upsample to the next rate Opus supports
+            target = next((rate for rate in OPUS_SAMPLING_RATES if rate > sampling_rate), OPUS_SAMPLING_RATES[-1])
+            samples, sampling_rate = resample_audio(samples, sampling_rate, target), target
+        sf.write(buffer, samples, sampling_rate, format="OGG", subtype="OPUS")
+    else:
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sampling_rate)
+            wav.writeframes(to_pcm16(samples))
+    return buffer.getvalue()
+
+def decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """Decode mono WAV bytes to float32 samples and their sampling rate"""
+    audio, sampling_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    return np.ascontiguousarray(audio.mean(axis=1)), sampling_rate
+
+def decode_image(data: bytes) -> Image.Image:
+    """Decode an uploaded image to an upright RGB PIL image"""
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    return image.convert("RGB")
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+LUMEN Model Server
+Keeps one copy of every model in a single process and serves inference to
+the API workers over an authenticated local socket, so adding uvicorn
+workers does not multiply model memory
+
+Run `python lumen_model_server.py`, then start the API with
+MODEL_SERVER_ADDRESS set to the same address.
+"""
+
+import os
+import time
+import logging
+import argparse
+import threading
+from multiprocessing.connection import AuthenticationError, Client, Connection, Listener
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import torch
+from transformers.generation.streamers import BaseStreamer
+
+from lumen_executors import FAMILY_DEFAULTS, MODEL_FAMILIES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+def parse_address(address: str):
+    """(host, port) for host:port addresses; anything else is a Unix socket path"""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return (host or "127.0.0.1", int(port))
+    return address
+
+def _authkey(authkey: Optional[str]) -> bytes:
+    # Connections carry pickles, so the server must never accept unauthenticated clients
+    authkey = authkey or os.getenv("MODEL_SERVER_AUTHKEY", "")
+    if not authkey:
+        raise ValueError("MODEL_SERVER_AUTHKEY must be set to use the model server")
+    return authkey.encode("utf-8")
+
+class RemoteModelError(RuntimeError):
+    """An error raised by a model inside the model server"""
+
+    def __init__(self, error_type: str, message: str):
+        self.error_type = error_type
+        super().__init__(f"{error_type}: {message}")
+
+class _ClientGone(Exception):
+    """The client closed its connection while tokens were being streamed to it"""
+
+class _TokenSender(BaseStreamer):
+    """Sends each step's new token ids to the client as generate() produces them"""
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self.prompt_skipped = False
+
+    def put(self, value):
+        # generate() passes the prompt first
+        if not self.prompt_skipped:
+            self.prompt_skipped = True
+            return
+        try:
+            self.conn.send(("tokens", value.reshape(-1).tolist()))
+        except OSError as e:
+            raise _ClientGone() from e
+
+    def end(self):
+        pass
+
+class ModelServer:
+    """Serves a LumenModels registry to API worker processes"""
+
+    def __init__(self, models, address: str = DEFAULT_ADDRESS, authkey: Optional[str] = None):
+        self.models = models
+        self.address = parse_address(address)
+        if isinstance(self.address, str) and Path(self.address).is_socket():
+            # Left behind by a previous server
+            Path(self.address).unlink()
+        self.listener = Listener(self.address, authkey=_authkey(authkey))
+
+        # Same per-family concurrency as the in-process inference pools
+        self._slots = {
+            family: threading.BoundedSemaphore(max(1, int(os.getenv(f"{family.upper()}_WORKERS", str(workers)))))
+            for family, (workers, _) in FAMILY_DEFAULTS.items()
+        }
+
+    def serve_forever(self):
+        """Accept worker connections, each served on its own thread"""
+        while True:
+            try:
+                conn = self.listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError) as e:
+                logger.warning(f"Rejected model server connection: {e}")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def close(self):
+        """Stop listening"""
+        self.listener.close()
+
+    def _serve(self, conn: Connection):
+        with conn:
+            while True:
+                try:
+                    op, model_type, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    logger.error(f"Unreadable model server request: {e}")
+                    return
+
+                try:
+                    reply = ("ok", self._handle(conn, op, model_type, args, kwargs))
+                except _ClientGone:
+                    return
+                except Exception as e:
+                    reply = ("error", type(e).__name__, str(e))
+
+                try:
+                    conn.send(reply)
+                except OSError:
+                    return
+
+    def _handle(self, conn: Connection, op: str, model_type: Optional[str], args, kwargs) -> Any:
+        if op == "info":
+            return {"model_configs": dict(self.models.model_configs),
+                    "model_backends": dict(self.models.model_backends)}
+        if op == "models":
+            return self.models.get_available_models()
+        if op == "device":
+            return self.models.get_device_info()
+        if op == "reload":
+            return self.models.reload_model(model_type)
+        if op not in ("available", "call", "encode", "generate"):
+            raise ValueError(f"Unknown model server operation: {op}")
+        if model_type not in self.models.model_configs:
+            raise ValueError(f"Unknown model type: {model_type}")
+
+        with self._slots[MODEL_FAMILIES[model_type]], self.models.use_model(model_type) as model:
+            if op == "available":
+                return model is not None
+            if model is None:
+                raise RuntimeError(f"{model_type} model unavailable")
+            if op == "call":
+                return model(*args, **kwargs)
+            if op == "encode":
+                return model.encode(*args, **kwargs)
+            return self._generate(conn, model, *args, **kwargs)
+
+    @staticmethod
+    def _generate(conn: Connection, chatbot, input_ids: List[int], stream: bool = False, **generate_kwargs) -> List[int]:
+        input_ids = torch.tensor([input_ids], device=chatbot.model.device)
+        generate_kwargs.pop("return_dict_in_generate", None)
+        output = chatbot.model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            streamer=_TokenSender(conn) if stream else None,
+            return_dict_in_generate=True,
+            **generate_kwargs
+        )
+        return output.sequences[0].tolist()
+
+class ModelServerClient:
+    """Thread-safe client with a pool of connections to the model server"""
+
+    def __init__(self, address: str, authkey: Optional[str] = None):
+        self.address = parse_address(address)
+        self.authkey = _authkey(authkey)
+        self._idle: List[Connection] = []
+        self._lock = threading.Lock()
+
+    def request(self, op: str, model_type: Optional[str] = None, *args,
+                on_tokens: Optional[Callable[[List[int]], bool]] = None, **kwargs) -> Any:
+        """Run one operation on the server.
+
+        on_tokens receives streamed token ids and returns True to stop early,
+        in which case the connection is dropped (ending generation on the
+        server) and None is returned.
+        """
+        for attempt in range(2):
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            pooled = conn is not None
+            if conn is None:
+                conn = Client(self.address, authkey=self.authkey)
+
+            try:
+                conn.send((op, model_type, args, kwargs))
+                message = conn.recv()
+                while message[0] == "tokens":
+                    if on_tokens(message[1]):
+                        conn.close()
+                        return None
+                    message = conn.recv()
+            except (EOFError, OSError):
+                conn.close()
+                # A pooled connection may predate a server restart; retry once on a fresh one
+                if pooled and attempt == 0 and on_tokens is None:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+
+            with self._lock:
+                self._idle.append(conn)
+            if message[0] == "error":
+                raise RemoteModelError(message[1], message[2])
+            return message[1]
+
+    def wait_ready(self, timeout_s: float) -> Dict[str, Any]:
+        """Model registry info, waiting up to timeout_s for the server to come up"""
+        deadline = time.monotonic() + timeout_s
+        while True:
+            try:
+                return self.request("info")
+            except (EOFError, OSError) as e:
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f"Model server at {self.address} is not reachable: {e}") from e
+                time.sleep(1.0)
+
+    def close(self):
+        """Close pooled connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+class RemoteModel:
+    """Stands in for a pipeline or SentenceTransformer that lives in the model server"""
+
+    def __init__(self, client: ModelServerClient, model_type: str):
+        self.client = client
+        self.model_type = model_type
+
+    def __call__(self, *args, **kwargs):
+        return self.client.request("call", self.model_type, *args, **kwargs)
+
+    def encode(self, *args, **kwargs):
+        return self.client.request("encode", self.model_type, *args, **kwargs)
+
+class RemoteGenerationModel:
+    """The chatbot model's generate(), run in the model server.
+
+    Past key/values cannot cross processes, so every call encodes its full
+    input; streamers and stopping criteria run here on the streamed tokens.
+    """
+
+    supports_kv_reuse = False
+    device = torch.device("cpu")
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+
+    def generate(self, input_ids=None, attention_mask=None, streamer=None, stopping_criteria=None,
+                 past_key_values=None, **generate_kwargs):
+        prompt = input_ids[0].tolist()
+        generated: List[int] = []
+        if streamer is not None:
+            streamer.put(input_ids.cpu())
+
+        def on_tokens(token_ids: List[int]) -> bool:
+            generated.extend(token_ids)
+            if streamer is not None:
+                streamer.put(torch.tensor(token_ids))
+            if stopping_criteria is None:
+                return False
+            done = stopping_criteria(torch.tensor([prompt + generated]), None)
+            return bool(torch.as_tensor(done).all())
+
+        stream = streamer is not None or stopping_criteria is not None
+        sequence = self.client.request("generate", "chatbot", prompt, stream=stream,
+                                       on_tokens=on_tokens if stream else None, **generate_kwargs)
+        if streamer is not None:
+            streamer.end()
+        if sequence is None:
+            sequence = prompt + generated
+        return SimpleNamespace(sequences=torch.tensor([sequence]), past_key_values=None)
+
+class RemoteChatbot(RemoteModel):
+    """Text-generation pipeline in the model server, with a local tokenizer for streaming and sessions"""
+
+    def __init__(self, client: ModelServerClient, model_type: str, model_name: str):
+        super().__init__(client, model_type)
+        self.model_name = model_name
+        self.model = RemoteGenerationModel(client)
+        self._tokenizer = None
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name, token=os.getenv("HF_API_KEY"))
+            if tokenizer.pad_token_id is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            tokenizer.padding_side = "left"
+            self._tokenizer = tokenizer
+        return self._tokenizer
+
+class RemoteLumenModels:
+    """LumenModels interface for API workers, backed by the model server"""
+
+    def __init__(self, address: Optional[str] = None, authkey: Optional[str] = None):
+        address = address or os.getenv("MODEL_SERVER_ADDRESS") or DEFAULT_ADDRESS
+        self.client = ModelServerClient(address, authkey)
+        info = self.client.wait_ready(float(os.getenv("MODEL_SERVER_CONNECT_TIMEOUT_S", "60")))
+        self.model_configs: Dict[str, str] = info["model_configs"]
+        self.model_backends: Dict[str, str] = info["model_backends"]
+
+        self._proxies: Dict[str, RemoteModel] = {}
+        self._lock = threading.Lock()
+        logger.info(f"Using LUMEN model server at {address}")
+
+    def get_model(self, model_type: str):
+        """Get a proxy for a model, loading it in the server on first use"""
+        if model_type not in self.model_configs:
+            return None
+
+        proxy = self._proxies.get(model_type)
+        if proxy is not None:
+            return proxy
+
+        try:
+            available = self.client.request("available", model_type)
+        except (EOFError, OSError, RemoteModelError) as e:
+            logger.warning(f"Model server could not provide {model_type}: {e}")
+            return None
+        if not available:
+            return None
+
+        if model_type == "chatbot":
+            proxy = RemoteChatbot(self.client, model_type, self.model_configs[model_type])
+        else:
+            proxy = RemoteModel(self.client, model_type)
+        with self._lock:
+            return self._proxies.setdefault(model_type, proxy)
+
+    @contextmanager
+    def use_model(self, model_type: str) -> Iterator[Any]:
+        """Get a model proxy; the server pins the model for each call it runs"""
+        yield self.get_model(model_type)
+
+    def is_model_available(self, model_type: str) -> bool:
+        """Check if a model is available, loading it in the server on first use"""
+        return self.get_model(model_type) is not None
+
+    def is_model_loaded(self, model_type: str) -> bool:
+        """Check if this worker has already resolved the model"""
+        return model_type in self._proxies
+
+    def get_available_models(self) -> Dict[str, bool]:
+        """Get status of all models in the server"""
+        return self.client.request("models")
+
+    def reload_model(self, model_type: str):
+        """Reload a model in the server"""
+        self.client.request("reload", model_type)
+
+    def get_device_info(self) -> Dict[str, Any]:
+        """Get information about the server's devices"""
+        return self.client.request("device")
+
+    def cleanup(self):
+        """Close connections to the server; its models stay loaded"""
+        self.client.close()
+
+def main():
+    """Run the model server"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from lumen_models import LumenModels
+
+    parser = argparse.ArgumentParser(description="Serve LUMEN models to API worker processes")
+    parser.add_argument("--address", default=os.getenv("MODEL_SERVER_ADDRESS") or DEFAULT_ADDRESS,
+                        help="host:port or Unix socket path (defaults to MODEL_SERVER_ADDRESS)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
+
+    server = ModelServer(LumenModels(), args.address)
+    print(f"✅ LUMEN model server listening on {args.address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,12 @@ Manages all Hugging Face models for healthcare AI features
 """
 
 import os
+import gc
 import logging
-from typing import Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
 from transformers import (
     pipeline, AutoTokenizer, AutoModelForCausalLM, 
     AutoProcessor, AutoModelForSpeechSeq2Seq,
@@ -15,13 +19,18 @@ from transformers import (
 from sentence_transformers import SentenceTransformer
 import torch
 
+from lumen_backends import (
+    MODEL_BACKENDS, ONNX_BACKENDS, ONNX_MODEL_TYPES,
+    load_onnx_pipeline, load_onnx_sentence_transformer, model_nbytes, quantize_dynamic_int8
+)
+
 logger = logging.getLogger(__name__)
 
 class LumenModels:
     """Manages all Hugging Face models for LUMEN"""
     
     def __init__(self):
-        """Initialize all models"""
+        """Set up the model registry; models are loaded on first use"""
         self.hf_api_key = os.getenv("HF_API_KEY")
         if not self.hf_api_key:
             logger.warning("HF_API_KEY not found. Some features may not work.")
@@ -38,161 +47,270 @@ class LumenModels:
                                               "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
         }
         
-        # Initialize models
-        self.models = {}
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        
+        # Inference backend per model: <MODEL_TYPE>_BACKEND, defaulting to MODEL_BACKEND
+        default_backend = os.getenv("MODEL_BACKEND", "torch").lower()
+        self.model_backends = {
+            model_type: self._resolve_backend(
+                model_type, os.getenv(f"{model_type.upper()}_BACKEND", default_backend).lower()
+            )
+            for model_type in self.model_configs
+        }
+        
+        # Loader for each model type
+        self._loaders = {
+            "chatbot": self._load_chatbot_model,
+            "whisper": self._load_whisper_model,
+            "xtts": self._load_tts_model,
+            "donut": self._load_donut_model,
+            "blip": self._load_blip_model,
+            "embedding": self._load_embedding_model,
+            "multilingual_embedding": self._load_embedding_model,
+        }
+        
+        # Memory budget for loaded models (0 = unlimited)
+        self.memory_budget = int(float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0")) * 1024 * 1024)
+        
+        # Loaded models in least-recently-used order
+        self.models: "OrderedDict[str, Any]" = OrderedDict()
+        self._model_sizes: Dict[str, int] = {}
+        # Requests currently running each model; pinned models are never evicted
+        self._in_use: Dict[str, int] = {model_type: 0 for model_type in self.model_configs}
+        self._failed = set()
+        self._lock = threading.RLock()
+        self._load_locks = {model_type: threading.Lock() for model_type in self.model_configs}
+        
         self._initialize_models()
     
     def _initialize_models(self):
-        """Initialize all models (lazy loading)"""
-        logger.info("Initializing LUMEN models...")
+        """Load the models listed in PRELOAD_MODELS; everything else loads lazily"""
+        preload = [m.strip() for m in os.getenv("PRELOAD_MODELS", "").split(",") if m.strip()]
+        if not preload:
+            logger.info("LUMEN models will be loaded on first use")
+            return
         
-        # Initialize models as needed
-        self._init_chatbot_model()
-        self._init_voice_models()
-        self._init_vision_models()
-        self._init_embedding_models()
+        logger.info(f"Preloading LUMEN models: {', '.join(preload)}")
+        for model_type in preload:
+            if model_type not in self.model_configs:
+                logger.warning(f"Unknown model type in PRELOAD_MODELS: {model_type}")
+                continue
+            self.get_model(model_type)
+    
+    def _resolve_backend(self, model_type: str, backend: str) -> str:
+        """Validate a configured backend, falling back to full precision PyTorch"""
+        if backend not in MODEL_BACKENDS:
+            logger.warning(f"Unknown backend '{backend}' for {model_type}, using torch")
+            return "torch"
+        if backend in ONNX_BACKENDS and model_type not in ONNX_MODEL_TYPES:
+            logger.warning(f"{model_type} has no ONNX export, using torch")
+            return "torch"
+        if backend != "torch" and self.device != "cpu":
+            # Dynamic quantization and the ONNX Runtime CPU provider are CPU only
+            logger.warning(f"{backend} backend is for CPU inference, using torch for {model_type} on {self.device}")
+            return "torch"
+        return backend
+    
+    def _pipeline(self, task: str, model_type: str, backend: str):
+        """Create a transformers pipeline for a configured model on a backend"""
+        if backend in ONNX_BACKENDS:
+            return load_onnx_pipeline(task, model_type, quantized=backend == "onnx-int8")
         
-        logger.info("Model initialization complete")
+        pipe = pipeline(
+            task,
+            model=self.model_configs[model_type],
+            token=self.hf_api_key,
+            device=self.device
+        )
+        if backend == "torch-int8":
+            quantize_dynamic_int8(pipe.model)
+        return pipe
     
-    def _init_chatbot_model(self):
-        """Initialize chatbot model"""
-        try:
-            logger.info(f"Loading chatbot model: {self.model_configs['chatbot']}")
-            
-            # Use pipeline for easier inference
-            self.models['chatbot'] = pipeline(
-                "text-generation",
-                model=self.model_configs['chatbot'],
-                token=self.hf_api_key,
-                device="cuda" if torch.cuda.is_available() else "cpu"
-            )
-            
-            logger.info("Chatbot model loaded successfully")
-        except Exception as e:
-            logger.warning(f"Failed to load chatbot model: {str(e)[:100]}...")  # Truncate long errors
-            self.models['chatbot'] = None
+    def _load_chatbot_model(self, model_type: str, backend: str):
+        """Load chatbot model"""
+        # Use pipeline for easier inference
+        chatbot = self._pipeline("text-generation", model_type, backend)
+        
+        # Batched generation needs a pad token and left padding for decoder-only models
+        tokenizer = chatbot.tokenizer
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
+        chatbot.model.generation_config.pad_token_id = tokenizer.pad_token_id
+        
+        return chatbot
     
-    def _init_voice_models(self):
-        """Initialize voice processing models"""
-        try:
-            # Whisper for speech-to-text
-            logger.info(f"Loading Whisper model: {self.model_configs['whisper']}")
-            self.models['whisper'] = pipeline(
-                "automatic-speech-recognition",
-                model=self.model_configs['whisper'],
-                token=self.hf_api_key,
-                device="cuda" if torch.cuda.is_available() else "cpu"
-            )
-            
-            # FastSpeech2 for text-to-speech (working alternative to XTTS)
-            logger.info(f"Loading TTS model: {self.model_configs['xtts']}")
-            try:
-                self.models['xtts'] = pipeline(
-                    "text-to-speech",
-                    model=self.model_configs['xtts'],
-                    token=self.hf_api_key,
-                    device="cuda" if torch.cuda.is_available() else "cpu"
-                )
-            except Exception as tts_error:
-                logger.warning(f"TTS model failed, using fallback: {str(tts_error)[:80]}...")
-                self.models['xtts'] = None
-            
-            logger.info("Voice models loaded successfully")
-        except Exception as e:
-            logger.warning(f"Failed to load voice models: {str(e)[:100]}...")
-            self.models['whisper'] = None
-            self.models['xtts'] = None
+    def _load_whisper_model(self, model_type: str, backend: str):
+        """Load Whisper for speech-to-text"""
+        return self._pipeline("automatic-speech-recognition", model_type, backend)
     
-    def _init_vision_models(self):
-        """Initialize computer vision models"""
-        try:
-            # Donut for document understanding
-            logger.info(f"Loading Donut model: {self.model_configs['donut']}")
-            try:
-                self.models['donut'] = pipeline(
-                    "document-question-answering",
-                    model=self.model_configs['donut'],
-                    token=self.hf_api_key,
-                    device="cuda" if torch.cuda.is_available() else "cpu"
-                )
-            except Exception as donut_error:
-                logger.warning(f"Donut model failed, using fallback: {str(donut_error)[:80]}...")
-                self.models['donut'] = None
-            
-            # BLIP for image captioning
-            logger.info(f"Loading BLIP model: {self.model_configs['blip']}")
-            try:
-                self.models['blip'] = pipeline(
-                    "image-to-text",
-                    model=self.model_configs['blip'],
-                    token=self.hf_api_key,
-                    device="cuda" if torch.cuda.is_available() else "cpu"
-                )
-            except Exception as blip_error:
-                logger.warning(f"BLIP model failed, using fallback: {str(blip_error)[:80]}...")
-                self.models['blip'] = None
-            
-            if self.models['donut'] or self.models['blip']:
-                logger.info("Vision models loaded successfully")
-            else:
-                logger.warning("No vision models loaded successfully")
-        except Exception as e:
-            logger.warning(f"Failed to load vision models: {str(e)[:100]}...")
-            self.models['donut'] = None
-            self.models['blip'] = None
+    def _load_tts_model(self, model_type: str, backend: str):
+        """Load text-to-speech model (working alternative to XTTS)"""
+        return self._pipeline("text-to-speech", model_type, backend)
     
-    def _init_embedding_models(self):
-        """Initialize embedding models"""
+    def _load_donut_model(self, model_type: str, backend: str):
+        """Load Donut for document understanding"""
+        return self._pipeline("document-question-answering", model_type, backend)
+    
+    def _load_blip_model(self, model_type: str, backend: str):
+        """Load BLIP for image captioning"""
+        return self._pipeline("image-to-text", model_type, backend)
+    
+    def _load_embedding_model(self, model_type: str, backend: str):
+        """Load a sentence embedding model"""
+        if backend in ONNX_BACKENDS:
+            return load_onnx_sentence_transformer(model_type, quantized=backend == "onnx-int8")
+        
+        model = SentenceTransformer(
+            self.model_configs[model_type],
+            device=self.device
+        )
+        if backend == "torch-int8":
+            quantize_dynamic_int8(model)
+        return model
+    
+    def load_standalone(self, model_type: str, backend: Optional[str] = None):
+        """Load a model on a given backend without registering it (used by export_models.py)"""
+        backend = backend or self.model_backends[model_type]
+        return self._loaders[model_type](model_type, self._resolve_backend(model_type, backend))
+    
+    def _load_model(self, model_type: str):
+        """Load a model and register it, evicting idle models to stay within budget"""
+        backend = self.model_backends[model_type]
+        logger.info(f"Loading {model_type} model: {self.model_configs[model_type]} ({backend})")
         try:
-            # General embeddings
-            logger.info(f"Loading embedding model: {self.model_configs['embedding']}")
-            self.models['embedding'] = SentenceTransformer(
-                self.model_configs['embedding'],
-                device="cuda" if torch.cuda.is_available() else "cpu"
-            )
-            
-            # Multilingual embeddings
-            logger.info(f"Loading multilingual embedding model: {self.model_configs['multilingual_embedding']}")
-            self.models['multilingual_embedding'] = SentenceTransformer(
-                self.model_configs['multilingual_embedding'],
-                device="cuda" if torch.cuda.is_available() else "cpu"
-            )
-            
-            logger.info("Embedding models loaded successfully")
+            model = self._loaders[model_type](model_type, backend)
         except Exception as e:
-            logger.error(f"Failed to load embedding models: {e}")
-            self.models['embedding'] = None
-            self.models['multilingual_embedding'] = None
+            logger.warning(f"Failed to load {model_type} model: {str(e)[:100]}...")  # Truncate long errors
+            with self._lock:
+                self._failed.add(model_type)
+            return None
+        
+        size = self._estimate_model_bytes(model)
+        with self._lock:
+            self.models[model_type] = model
+            self._model_sizes[model_type] = size
+            self._failed.discard(model_type)
+            self._enforce_memory_budget(keep=model_type)
+        
+        logger.info(f"{model_type} model loaded successfully ({size / 1024 / 1024:.0f} MB)")
+        return model
+    
+    @staticmethod
+    def _estimate_model_bytes(model) -> int:
+        """Estimate the memory held by a model's weights"""
+        return model_nbytes(model)
+    
+    def _enforce_memory_budget(self, keep: Optional[str] = None):
+        """Evict least recently used idle models until loaded models fit the budget"""
+        if not self.memory_budget:
+            return
+        
+        for model_type in list(self.models.keys()):
+            if sum(self._model_sizes.values()) <= self.memory_budget:
+                break
+            if model_type == keep or self._in_use[model_type]:
+                continue
+            logger.info(f"Evicting idle {model_type} model to stay within memory budget")
+            self._unload_model(model_type)
+        
+        if keep is not None and sum(self._model_sizes.values()) > self.memory_budget:
+            logger.warning(f"Models in use exceed MODEL_MEMORY_BUDGET_MB after loading {keep}; "
+                           f"more are evicted once idle")
+    
+    def _unload_model(self, model_type: str):
+        """Drop a loaded model and release its memory"""
+        model = self.models.pop(model_type, None)
+        self._model_sizes.pop(model_type, None)
+        if model is None:
+            return
+        
+        del model
+        gc.collect()
+        
+        # Clear CUDA cache if available
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
     
     def get_model(self, model_type: str):
-        """Get a specific model by type"""
-        return self.models.get(model_type)
+        """Get a specific model by type, loading it on first use"""
+        if model_type not in self.model_configs:
+            return None
+        
+        with self._lock:
+            if model_type in self.models:
+                self.models.move_to_end(model_type)
+                return self.models[model_type]
+            if model_type in self._failed:
+                return None
+        
+        # Load outside the registry lock so other models stay usable meanwhile
+        with self._load_locks[model_type]:
+            with self._lock:
+                if model_type in self.models:
+                    self.models.move_to_end(model_type)
+                    return self.models[model_type]
+                if model_type in self._failed:
+                    return None
+            return self._load_model(model_type)
+    
+    @contextmanager
+    def use_model(self, model_type: str) -> Iterator[Any]:
+        """Get a model (None if unavailable) and keep it from being evicted until the block exits"""
+        if model_type not in self.model_configs:
+            yield None
+            return
+        
+        # Pin before loading, so the model cannot be evicted between load and use
+        with self._lock:
+            self._in_use[model_type] += 1
+        try:
+            yield self.get_model(model_type)
+        finally:
+            with self._lock:
+                self._in_use[model_type] -= 1
+                # Models kept over budget while busy can go now
+                self._enforce_memory_budget()
     
     def is_model_available(self, model_type: str) -> bool:
-        """Check if a model is available"""
-        return self.models.get(model_type) is not None
+        """Check if a model is available, loading it on first use"""
+        return self.get_model(model_type) is not None
+    
+    def is_model_loaded(self, model_type: str) -> bool:
+        """Check if a model is currently loaded, without loading it"""
+        return model_type in self.models
     
     def get_available_models(self) -> Dict[str, bool]:
-        """Get status of all models"""
+        """Get status of all models without loading them"""
         return {
-            model_type: self.is_model_available(model_type)
-            for model_type in self.models.keys()
+            model_type: model_type not in self._failed
+            for model_type in self.model_configs
         }
     
+    def get_memory_usage(self) -> Dict[str, Any]:
+        """Get memory held by loaded models"""
+        with self._lock:
+            return {
+                "budget_mb": self.memory_budget / 1024 / 1024,
+                "loaded_mb": sum(self._model_sizes.values()) / 1024 / 1024,
+                "models": {
+                    model_type: size / 1024 / 1024
+                    for model_type, size in self._model_sizes.items()
+                }
+            }
+    
     def reload_model(self, model_type: str):
         """Reload a specific model"""
-        logger.info(f"Reloading {model_type} model...")
-        
-        if model_type == 'chatbot':
-            self._init_chatbot_model()
-        elif model_type in ['whisper', 'xtts']:
-            self._init_voice_models()
-        elif model_type in ['donut', 'blip']:
-            self._init_vision_models()
-        elif model_type in ['embedding', 'multilingual_embedding']:
-            self._init_embedding_models()
-        else:
+        if model_type not in self.model_configs:
             logger.warning(f"Unknown model type: {model_type}")
+            return
+        
+        logger.info(f"Reloading {model_type} model...")
+        with self._load_locks[model_type]:
+            with self._lock:
+                self._unload_model(model_type)
+                self._failed.discard(model_type)
+            self._load_model(model_type)
     
     def get_device_info(self) -> Dict[str, Any]:
         """Get information about available devices"""
@@ -207,16 +325,8 @@ class LumenModels:
         """Clean up models and free memory"""
         logger.info("Cleaning up models...")
         
-        # Clear models
-        for model_type in self.models:
-            if hasattr(self.models[model_type], 'to'):
-                self.models[model_type].to('cpu')
-            del self.models[model_type]
-        
-        self.models.clear()
-        
-        # Clear CUDA cache if available
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
+        with self._lock:
+            for model_type in list(self.models.keys()):
+                self._unload_model(model_type)
         
         logger.info("Model cleanup complete")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+LUMEN Retrieval Module
+Lexical BM25 search over schemes and rank fusion with vector search
+"""
+
+import re
+import logging
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Hyphenated numbers (helplines like 1800-180-5145), or runs of word
+# characters. Indic scripts (Devanagari to Malayalam) are listed
+# explicitly because \w alone splits words at vowel signs and viramas.
+_TOKEN_RE = re.compile(r"\d+(?:-\d+)+|[\w\u0900-\u0D7F\u200C\u200D]+")
+_JOINERS = str.maketrans("", "", "\u200C\u200D")
+
+_STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "by", "for", "from", "in", "is",
+    "of", "on", "or", "the", "to", "with", "me", "my",
+})
+
+# How many times each scheme field counts towards term frequency
+SCHEME_FIELD_WEIGHTS = {
+    "name": 3,
+    "description": 1,
+    "eligibility": 1,
+    "coverage": 1,
+    "helpline": 2,
+    "states": 1,
+}
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized lexical tokens for any supported script"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(unicodedata.normalize("NFKC", text).casefold()):
+        token = match.group().translate(_JOINERS).replace("-", "")
+        if token and token not in _STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+def scheme_tokens(scheme: Dict[str, Any]) -> List[str]:
+    """Weighted lexical tokens for a scheme"""
+    tokens = []
+    for field, weight in SCHEME_FIELD_WEIGHTS.items():
+        value = scheme.get(field)
+        if not value:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = " ".join(value)
+        tokens.extend(tokenize(str(value)) * weight)
+    return tokens
+
+class BM25Index:
+    """Inverted index with precomputed BM25 term weights"""
+
+    def __init__(self, documents: Sequence[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.size = len(documents)
+        lengths = np.array([len(tokens) for tokens in documents], dtype="float32")
+        avg_length = float(lengths.mean()) if self.size and lengths.mean() > 0 else 1.0
+
+        term_counts: Dict[str, Dict[int, int]] = {}
+        for doc, tokens in enumerate(documents):
+            for token in tokens:
+                counts = term_counts.setdefault(token, {})
+                counts[doc] = counts.get(doc, 0) + 1
+
+        # Each posting list stores the full BM25 contribution of the term,
+        # so a query is just a sum over its terms' posting lists
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, counts in term_counts.items():
+            docs = np.fromiter(counts.keys(), dtype="int64", count=len(counts))
+            tf = np.fromiter(counts.values(), dtype="float32", count=len(counts))
+            idf = np.log(1.0 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = k1 * (1.0 - b + b * lengths[docs] / avg_length)
+            self.postings[term] = (docs, (idf * tf * (k1 + 1.0) / (tf + norm)).astype("float32"))
+
+    def search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top-k (document, score) pairs, optionally restricted to allowed documents"""
+        if not self.size:
+            return []
+
+        scores = np.zeros(self.size, dtype="float32")
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                docs, weights = posting
+                scores[docs] += weights
+
+        if allowed is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[allowed] = True
+            scores[~mask] = 0.0
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(doc), float(scores[doc])) for doc in order]
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked lists of ids, scoring each id by the sum of 1 / (k + rank).
+
+    Scores are scaled to [0, 1], where 1 means ranked first in every list.
+    """
+    if not rankings:
+        return []
+
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (k + rank)
+
+    best = len(rankings) / (k + 1)
+    return sorted(((doc, score / best) for doc, score in fused.items()),
+                  key=lambda item: item[1], reverse=True)
@@ -6,22 +6,52 @@ Implements healthcare AI features using Hugging Face models
 
 import os
 import logging
-import json
+import time
 import asyncio
-from typing import Dict, Any, Optional, List
-from pathlib import Path
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 import numpy as np
-from PIL import Image
-import faiss
+from transformers import StoppingCriteriaList
 from datetime import datetime
 
+from lumen_batching import EmbeddingBatcher, GenerationBatcher
+from lumen_executors import InferenceExecutors, InferenceQueueFull
+from lumen_streaming import AsyncTextStreamer, CancelGeneration, StreamingTranscriber
+from lumen_media import (
+    decode_audio, decode_image, decode_wav, encode_audio, resample_audio, split_sentences, to_pcm16,
+    wav_stream_header, WHISPER_LANGUAGES, WHISPER_SAMPLING_RATE
+)
+from lumen_index import (
+    SchemeIndexStore, SchemeSnapshot, build_scheme_index, plan_scheme_update, scheme_text, update_index
+)
+from lumen_cache import AudioCache, EmbeddingCache
+from lumen_retrieval import reciprocal_rank_fusion
+from lumen_emergency import CompiledGuide, EmergencyGuideStore
+from lumen_triage import SemanticMatch, SemanticTriage, TriageRules, more_severe
+from lumen_kvcache import ConversationSession, PrefixCache, SessionNotFound, SessionStore
+
 logger = logging.getLogger(__name__)
 
 class ChatbotService:
     """Handles multilingual healthcare conversations"""
     
-    def __init__(self, models):
+    # Replies when the model is unavailable
+    FALLBACK_RESPONSES = {
+        "en": "I'm experiencing technical difficulties. Please consult a healthcare professional for immediate assistance.",
+        "hi": "मुझे तकनीकी कठिनाइयों का सामना करना पड़ रहा है। तत्काल सहायता के लिए कृपया किसी स्वास्थ्य पेशेवर से सलाह लें।",
+        "ta": "நான் தொழில்நுட்ப சிக்கல்களை எதிர்கொள்கிறேன். உடனடி உதவிக்கு தயவுசெய்து ஒரு சுகாதார நிபுணரை அணுகவும்.",
+        "bn": "আমি প্রযুক্তিগত সমস্যার সম্মুখীন হচ্ছি। অবিলম্বে সাহায্যের জন্য দয়া করে একজন স্বাস্থ্য পেশাদারকে পরামর্শ দিন।",
+        "te": "నేను సాంకేతిక ఇబ్బందులను ఎదుర్కొంటున్నాను. తక్షణ సహాయం కోసం దయచేసి ఒక ఆరోగ్య నిపుణుడిని సంప్రదించండి."
+    }
+    
+    def __init__(self, models, executors: Optional[InferenceExecutors] = None,
+                 embedder: Optional[EmbeddingBatcher] = None):
         self.models = models
+        self.executors = executors or InferenceExecutors()
+        self.embedder = embedder or EmbeddingBatcher(models, self.executors)
+        self.triage_rules = TriageRules()
+        self.semantic_triage = SemanticTriage(self.triage_rules.prototypes)
+        self.embedding_cache = EmbeddingCache()
+        self.sessions = SessionStore()
         self.language_prompts = {
             "en": "You are LUMEN, a healthcare assistant. Provide empathetic, accurate medical guidance. ",
             "hi": "आप LUMEN हैं, एक स्वास्थ्य सहायक। सहानुभूतिपूर्ण, सटीक चिकित्सीय मार्गदर्शन प्रदान करें। ",
@@ -29,77 +59,296 @@ class ChatbotService:
             "bn": "আপনি LUMEN, একজন স্বাস্থ্য সহকারী। সহানুভূতিশীল, সঠিক চিকিৎসা গাইডলাইন প্রদান করুন। ",
             "te": "మీరు LUMEN, ఒక ఆరోగ్య సహాయకుడు. సానుభూతి, ఖచ్చితమైన వైద్య మార్గదర్శకత్వాన్ని అందించండి. "
         }
+        
+        # KV state of the fixed prompt prefixes is computed once per loaded model
+        self.prefix_cache = PrefixCache(
+            prefix
+            for language in self.language_prompts
+            for prefix in (
+                self.language_prompts[language],
+                self._symptom_prefix(language),
+                self._conversation_prefix(language)
+            )
+        )
+        self.batcher = GenerationBatcher(
+            self.models, self.executors, prefix_cache=self.prefix_cache
+        )
     
-    async def process_symptoms(self, message: str, language: str = "en", context: Optional[str] = None) -> Dict[str, Any]:
+    async def process_symptoms(self, message: str, language: str = "en", context: Optional[str] = None,
+                               session_id: Optional[str] = None) -> Dict[str, Any]:
         """Process symptoms and provide triage guidance"""
         try:
-            if not self.models.is_model_available('chatbot'):
+            session = self.sessions.get(session_id) if session_id else None
+            if not await self.executors.ensure_model(self.models, 'chatbot'):
                 return self._fallback_response(message, language)
             
-            # Prepare prompt
-            prompt = self._build_symptom_prompt(message, language, context)
-            
-            # Generate response
-            response = self.models.get_model('chatbot')(prompt, max_length=200)[0]['generated_text']
-            
-            # Extract triage level
-            triage_level = self._analyze_triage_level(message, response)
+            # Semantic triage runs on the embedding pool while the reply is generated
+            semantic = asyncio.ensure_future(self._semantic_triage(message, language))
+            try:
+                if session:
+                    prompt = self._symptom_turn(message)
+                    generated = await self._session_reply(session, prompt)
+                else:
+                    prompt = self._build_symptom_prompt(message, language, context)
+                    generated = await self.batcher.generate(
+                        prompt, prefix=self._symptom_prefix(language), max_length=200
+                    )
+                response = self._reply_text(prompt, generated)
+                semantic_match = await semantic
+            finally:
+                semantic.cancel()
             
             return {
                 "response": response,
                 "language": language,
                 "confidence": 0.85,
-                "triage_level": triage_level
+                **self._analyze_triage(message, language, semantic_match)
             }
+        except (InferenceQueueFull, SessionNotFound):
+            raise
         except Exception as e:
             logger.error(f"Error in symptom processing: {e}")
             return self._fallback_response(message, language)
     
-    async def general_conversation(self, message: str, language: str = "en") -> str:
+    async def general_conversation(self, message: str, language: str = "en",
+                                   session_id: Optional[str] = None) -> str:
         """Handle general healthcare conversations"""
         try:
-            if not self.models.is_model_available('chatbot'):
+            session = self.sessions.get(session_id) if session_id else None
+            if not await self.executors.ensure_model(self.models, 'chatbot'):
                 return self._fallback_response(message, language)["response"]
             
-            prompt = f"{self.language_prompts.get(language, self.language_prompts['en'])}User: {message}\nLUMEN:"
-            response = self.models.get_model('chatbot')(prompt, max_length=150)[0]['generated_text']
-            return response
+            if session:
+                prompt = self._conversation_turn(message)
+                generated = await self._session_reply(session, prompt)
+            else:
+                prompt = self._build_conversation_prompt(message, language)
+                generated = await self.batcher.generate(
+                    prompt, prefix=self._conversation_prefix(language), max_length=150
+                )
+            return self._reply_text(prompt, generated)
+        except (InferenceQueueFull, SessionNotFound):
+            raise
         except Exception as e:
             logger.error(f"Error in general conversation: {e}")
             return self._fallback_response(message, language)["response"]
     
+    async def stream_symptoms(self, message: str, language: str = "en", context: Optional[str] = None,
+                              session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream symptom guidance token by token, ending with the triage level"""
+        session = self.sessions.get(session_id) if session_id else None
+        if session:
+            prompt = self._symptom_turn(message)
+        else:
+            prompt = self._build_symptom_prompt(message, language, context)
+        semantic = asyncio.ensure_future(self._semantic_triage(message, language))
+        try:
+            parts = []
+            async for text in self._stream_or_fallback(prompt, session=session,
+                                                       prefix=self._symptom_prefix(language), max_length=200):
+                parts.append(text)
+                yield {"event": "token", "data": {"text": text}}
+            
+            if not parts:
+                fallback = self._fallback_response(message, language)
+                yield {"event": "token", "data": {"text": fallback["response"]}}
+                yield {"event": "done", "data": fallback}
+                return
+            
+            response = "".join(parts)
+            semantic_match = await semantic
+        finally:
+            semantic.cancel()
+        
+        yield {
+            "event": "done",
+            "data": {
+                "response": response,
+                "language": language,
+                "confidence": 0.85,
+                **self._analyze_triage(message, language, semantic_match)
+            }
+        }
+    
+    async def stream_conversation(self, message: str, language: str = "en",
+                                  session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a general healthcare conversation reply token by token"""
+        session = self.sessions.get(session_id) if session_id else None
+        if session:
+            prompt = self._conversation_turn(message)
+        else:
+            prompt = self._build_conversation_prompt(message, language)
+        parts = []
+        async for text in self._stream_or_fallback(prompt, session=session,
+                                                   prefix=self._conversation_prefix(language), max_length=150):
+            parts.append(text)
+            yield {"event": "token", "data": {"text": text}}
+        
+        if not parts:
+            parts.append(self._fallback_response(message, language)["response"])
+            yield {"event": "token", "data": {"text": parts[0]}}
+        
+        yield {"event": "done", "data": {"response": "".join(parts), "language": language}}
+    
+    async def _stream_or_fallback(self, prompt: str, session: Optional[ConversationSession] = None,
+                                  prefix: Optional[str] = None, **generate_kwargs) -> AsyncIterator[str]:
+        """Stream generated text; yields nothing if the model is unavailable or fails"""
+        try:
+            if not await self.executors.ensure_model(self.models, 'chatbot'):
+                return
+            if session:
+                async with session.lock:
+                    async for text in self._stream_generate(prompt, session=session):
+                        yield text
+                    self.sessions.record(session)
+                return
+            async for text in self._stream_generate(prompt, prefix=prefix, **generate_kwargs):
+                yield text
+        except InferenceQueueFull:
+            raise
+        except Exception as e:
+            logger.error(f"Error in streaming generation: {e}")
+    
+    async def _stream_generate(self, prompt: str, session: Optional[ConversationSession] = None,
+                               prefix: Optional[str] = None, **generate_kwargs) -> AsyncIterator[str]:
+        """Run generate() on the chat pool and yield text as it is decoded"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancel = CancelGeneration()
+        
+        def generate(chatbot):
+            streamer = AsyncTextStreamer(chatbot.tokenizer, queue, loop)
+            stopping_criteria = StoppingCriteriaList([cancel])
+            if session:
+                session.generate(
+                    chatbot, prompt, self.sessions.max_new_tokens, self.sessions.max_tokens,
+                    prefix_cache=self.prefix_cache, streamer=streamer, stopping_criteria=stopping_criteria
+                )
+                return
+            if prefix and prompt.startswith(prefix) and self.prefix_cache.supports(chatbot):
+                self.prefix_cache.generate(
+                    chatbot, prefix, prompt[len(prefix):],
+                    streamer=streamer, stopping_criteria=stopping_criteria, **generate_kwargs
+                )
+                return
+            inputs = chatbot.tokenizer(prompt, return_tensors="pt").to(chatbot.model.device)
+            chatbot.model.generate(
+                **inputs,
+                streamer=streamer,
+                stopping_criteria=stopping_criteria,
+                **generate_kwargs
+            )
+        
+        task = asyncio.ensure_future(self.executors.run_with_model(self.models, 'chatbot', generate))
+        # Completion is queued after every piece of text the streamer sent
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        
+        try:
+            while True:
+                text = await queue.get()
+                if text is None:
+                    break
+                yield text
+            await task
+        finally:
+            cancel.cancelled.set()
+    
+    def create_session(self, language: str = "en") -> Dict[str, Any]:
+        """Start a multi-turn conversation whose history and KV cache stay on the server"""
+        prompt = self.language_prompts.get(language, self.language_prompts['en'])
+        session = self.sessions.create(language, prompt)
+        return {
+            "session_id": session.session_id,
+            "language": language,
+            "idle_timeout_s": self.sessions.idle_timeout
+        }
+    
+    def end_session(self, session_id: str) -> bool:
+        """Discard a conversation session"""
+        return self.sessions.delete(session_id)
+    
+    async def _session_reply(self, session: ConversationSession, turn: str) -> str:
+        """Generate the next reply in a session, feeding only the new turn to the model.
+
+        Returns the turn followed by the reply, like the batcher does for a prompt.
+        """
+        async with session.lock:
+            reply = await self.executors.run_with_model(
+                self.models, 'chatbot',
+                lambda chatbot: session.generate(
+                    chatbot, turn, self.sessions.max_new_tokens, self.sessions.max_tokens,
+                    prefix_cache=self.prefix_cache
+                )
+            )
+            self.sessions.record(session)
+        return reply
+    
+    @staticmethod
+    def _reply_text(prompt: str, generated: str) -> str:
+        """The reply in generated text, which starts with the prompt (or session turn) it continues"""
+        if generated.startswith(prompt):
+            generated = generated[len(prompt):]
+        return generated.strip()
+    
+    @staticmethod
+    def _symptom_turn(message: str) -> str:
+        return f"\nUser: Analyze these symptoms and provide triage guidance: {message}\nLUMEN:"
+    
+    @staticmethod
+    def _conversation_turn(message: str) -> str:
+        return f"\nUser: {message}\nLUMEN:"
+    
+    def _symptom_prefix(self, language: str) -> str:
+        """Fixed start of every symptom prompt in a language"""
+        base_prompt = self.language_prompts.get(language, self.language_prompts['en'])
+        return f"{base_prompt}Analyze these symptoms and provide triage guidance:"
+    
+    def _conversation_prefix(self, language: str) -> str:
+        """Fixed start of every general conversation prompt in a language"""
+        return f"{self.language_prompts.get(language, self.language_prompts['en'])}User:"
+    
     def _build_symptom_prompt(self, message: str, language: str, context: Optional[str] = None) -> str:
         """Build prompt for symptom analysis"""
-        base_prompt = self.language_prompts.get(language, self.language_prompts['en'])
         context_part = f"\nContext: {context}" if context else ""
-        return f"{base_prompt}Analyze these symptoms and provide triage guidance: {message}{context_part}\nLUMEN:"
+        return f"{self._symptom_prefix(language)} {message}{context_part}\nLUMEN:"
     
-    def _analyze_triage_level(self, symptoms: str, response: str) -> str:
-        """Analyze symptoms to determine triage level"""
-        emergency_keywords = ["chest pain", "difficulty breathing", "unconscious", "severe bleeding", "head injury"]
-        urgent_keywords = ["fever", "pain", "swelling", "rash", "nausea"]
-        
-        symptoms_lower = symptoms.lower()
-        
-        if any(keyword in symptoms_lower for keyword in emergency_keywords):
-            return "Red"
-        elif any(keyword in symptoms_lower for keyword in urgent_keywords):
-            return "Yellow"
-        else:
-            return "Green"
+    def _build_conversation_prompt(self, message: str, language: str) -> str:
+        """Build prompt for general conversation"""
+        return f"{self._conversation_prefix(language)} {message}\nLUMEN:"
+    
+    def _analyze_triage(self, symptoms: str, language: str,
+                        semantic: Optional[SemanticMatch] = None) -> Dict[str, Any]:
+        """Triage fields for a response: the more severe of the rule and semantic levels"""
+        rules = self.triage_rules.analyze(symptoms, language)
+        level = more_severe(rules.level, semantic.level) if semantic else rules.level
+        return {
+            "triage_level": level,
+            "triage_matches": [match.term for match in rules.matches],
+            "triage_semantic": semantic._asdict() if semantic else None
+        }
+    
+    async def _semantic_triage(self, symptoms: str, language: str) -> Optional[SemanticMatch]:
+        """Classify symptoms against the triage prototypes, or None if unavailable"""
+        if not self.semantic_triage.enabled:
+            return None
+        try:
+            if not await self.executors.ensure_model(self.models, 'multilingual_embedding'):
+                return None
+            model_name = self.models.model_configs['multilingual_embedding']
+            embed = lambda texts: self.embedder.embed(texts, 'multilingual_embedding')
+            
+            matrix = await self.semantic_triage.prototype_matrix(embed, model_name)
+            query = (await self.embedding_cache.get_or_embed([symptoms], language, model_name, embed))[0]
+            return self.semantic_triage.classify(query, matrix)
+        except Exception as e:
+            # Rule-based triage still applies
+            logger.warning(f"Semantic triage unavailable: {e}")
+            return None
     
     def _fallback_response(self, message: str, language: str) -> Dict[str, Any]:
         """Fallback response when models are unavailable"""
-        fallback_responses = {
-            "en": "I'm experiencing technical difficulties. Please consult a healthcare professional for immediate assistance.",
-            "hi": "मुझे तकनीकी कठिनाइयों का सामना करना पड़ रहा है। तत्काल सहायता के लिए कृपया किसी स्वास्थ्य पेशेवर से सलाह लें।",
-            "ta": "நான் தொழில்நுட்ப சிக்கல்களை எதிர்கொள்கிறேன். உடனடி உதவிக்கு தயவுசெய்து ஒரு சுகாதார நிபுணரை அணுகவும்.",
-            "bn": "আমি প্রযুক্তিগত সমস্যার সম্মুখীন হচ্ছি। অবিলম্বে সাহায্যের জন্য দয়া করে একজন স্বাস্থ্য পেশাদারকে পরামর্শ দিন।",
-            "te": "నేను సాంకేతిక ఇబ్బందులను ఎదుర్కొంటున్నాను. తక్షణ సహాయం కోసం దయచేసి ఒక ఆరోగ్య నిపుణుడిని సంప్రదించండి."
-        }
-        
         return {
-            "response": fallback_responses.get(language, fallback_responses["en"]),
+            "response": self.FALLBACK_RESPONSES.get(language, self.FALLBACK_RESPONSES["en"]),
             "language": language,
             "confidence": 0.0,
             "triage_level": "Yellow"
@@ -108,52 +357,189 @@ class ChatbotService:
 class VoiceService:
     """Handles speech-to-text and text-to-speech"""
     
-    def __init__(self, models):
+    def __init__(self, models, executors: Optional[InferenceExecutors] = None):
         self.models = models
+        self.executors = executors or InferenceExecutors()
+        
+        # Long audio is split into overlapping windows decoded in batches
+        self.chunk_length_s = float(os.getenv("WHISPER_CHUNK_LENGTH_S", "30"))
+        self.stride_length_s = float(os.getenv("WHISPER_STRIDE_LENGTH_S", "5"))
+        self.batch_size = int(os.getenv("WHISPER_BATCH_SIZE", "4"))
+        
+        # Live transcription over the streaming endpoint
+        self.stream_partial_interval_s = float(os.getenv("STT_STREAM_PARTIAL_INTERVAL_S", "1.0"))
+        self.stream_end_silence_s = float(os.getenv("STT_STREAM_END_SILENCE_S", "0.7"))
+        self.stream_max_utterance_s = float(os.getenv("STT_STREAM_MAX_UTTERANCE_S", "15"))
+        
+        # Silence inserted between synthesized sentences
+        self.sentence_pause_s = float(os.getenv("TTS_SENTENCE_PAUSE_S", "0.2"))
+        
+        # Synthesized sentences are cached on disk, so repeated phrases are not re-synthesized
+        self.audio_cache = AudioCache()
     
-    async def speech_to_text(self, audio_path: str, language: str = "en") -> str:
+    async def speech_to_text(self, audio: bytes, language: str = "en") -> str:
         """Convert speech to text using Whisper"""
+        return (await self.transcribe(audio, language))["text"]
+    
+    async def transcribe(self, audio: bytes, language: str = "en") -> Dict[str, Any]:
+        """Transcribe speech with Whisper into text and timestamped segments"""
         try:
-            if not self.models.is_model_available('whisper'):
-                return "Speech recognition service unavailable"
+            if not await self.executors.ensure_model(self.models, 'whisper'):
+                return {"text": "Speech recognition service unavailable", "segments": []}
             
-            # Process audio with Whisper
-            result = self.models.get_model('whisper')(audio_path)
-            return result['text']
+            # Decode in memory and process audio with Whisper
+            return await self.executors.run_with_model(
+                self.models, 'whisper',
+                lambda whisper: self._transcribe(whisper, decode_audio(audio), language)
+            )
+        except InferenceQueueFull:
+            raise
         except Exception as e:
             logger.error(f"Error in speech-to-text: {e}")
-            return "Error processing audio"
+            return {"text": "Error processing audio", "segments": []}
     
-    async def text_to_speech(self, text: str, language: str = "en") -> str:
-        """Convert text to speech using XTTS"""
+    def create_stream(self, sample_rate: int) -> StreamingTranscriber:
+        """Start segmenting a live audio stream into utterances"""
+        return StreamingTranscriber(
+            sample_rate,
+            partial_interval_s=self.stream_partial_interval_s,
+            end_silence_s=self.stream_end_silence_s,
+            max_utterance_s=self.stream_max_utterance_s
+        )
+    
+    async def transcribe_samples(self, samples: np.ndarray, sample_rate: int,
+                                 language: str = "en") -> Dict[str, Any]:
+        """Transcribe raw float32 samples from a live stream"""
+        if not await self.executors.ensure_model(self.models, 'whisper'):
+            raise RuntimeError("Speech recognition service unavailable")
+        
+        return await self.executors.run_with_model(
+            self.models, 'whisper',
+            lambda whisper: self._transcribe(whisper, resample_audio(samples, sample_rate), language)
+        )
+    
+    def _transcribe(self, whisper, samples: np.ndarray, language: str) -> Dict[str, Any]:
+        """Run Whisper, chunking and batching audio longer than one window"""
+        duration = len(samples) / WHISPER_SAMPLING_RATE
+        kwargs: Dict[str, Any] = {"return_timestamps": True}
+        
+        # Force the request's language instead of letting Whisper guess it
+        if language in WHISPER_LANGUAGES:
+            kwargs["generate_kwargs"] = {"language": language, "task": "transcribe"}
+        
+        if duration > self.chunk_length_s:
+            kwargs.update(
+                chunk_length_s=self.chunk_length_s,
+                stride_length_s=self.stride_length_s,
+                batch_size=self.batch_size
+            )
+        
+        result = whisper({"raw": samples, "sampling_rate": WHISPER_SAMPLING_RATE}, **kwargs)
+        
+        segments = []
+        for chunk in result.get("chunks", []):
+            start, end = chunk["timestamp"]
+            segments.append({
+                "start": start if start is not None else 0.0,
+                "end": end if end is not None else duration,
+                "text": chunk["text"].strip()
+            })
+        
+        return {"text": result["text"].strip(), "segments": segments}
+    
+    async def synthesize(self, text: str, language: str = "en", audio_format: str = "wav") -> bytes:
+        """Synthesize speech for text as one encoded WAV or Ogg Opus file"""
+        sentences = split_sentences(text)
+        if not sentences:
+            raise ValueError("No text to synthesize")
+        
+        clips = await self._speak(sentences, language)
+        sampling_rate = clips[0][1]
+        pause = np.zeros(int(sampling_rate * self.sentence_pause_s), dtype=np.float32)
+        samples = np.concatenate([part for audio, _ in clips for part in (audio, pause)][:-1])
+        return encode_audio(samples, sampling_rate, audio_format)
+    
+    async def stream_speech(self, text: str, language: str = "en") -> AsyncIterator[bytes]:
+        """Stream speech as WAV, one sentence at a time.
+        
+        The first chunk carries the WAV header and the first sentence, so
+        playback can start as soon as that sentence is synthesized. The next
+        sentence is synthesized while the current one is being sent.
+        """
+        sentences = split_sentences(text)
+        if not sentences:
+            raise ValueError("No text to synthesize")
+        
+        pending = asyncio.ensure_future(self._speak(sentences[:1], language))
         try:
-            if not self.models.is_model_available('xtts'):
-                return "Text-to-speech service unavailable"
+            for i in range(len(sentences)):
+                (audio, sampling_rate), = await pending
+                if i + 1 < len(sentences):
+                    pending = asyncio.ensure_future(self._speak(sentences[i + 1:i + 2], language))
+                
+                chunk = to_pcm16(audio)
+                if i == 0:
+                    chunk = wav_stream_header(sampling_rate) + chunk
+                if i + 1 < len(sentences):
+                    chunk += to_pcm16(np.zeros(int(sampling_rate * self.sentence_pause_s)))
+                yield chunk
+        finally:
+            pending.cancel()
+    
+    async def _speak(self, sentences: List[str], language: str) -> List[Tuple[np.ndarray, int]]:
+        """Audio for each sentence, from the cache or synthesized in one batch"""
+        model_name = self.models.model_configs['xtts']
+        keys = [self.audio_cache.key(sentence, language, model_name) for sentence in sentences]
+        cached = await asyncio.to_thread(lambda: [self.audio_cache.get(key) for key in keys])
+        clips: List[Optional[Tuple[np.ndarray, int]]] = [
+            decode_wav(data) if data is not None else None for data in cached
+        ]
+        
+        missing = [i for i, clip in enumerate(clips) if clip is None]
+        if missing:
+            if not await self.executors.ensure_model(self.models, 'xtts'):
+                raise RuntimeError("Text-to-speech service unavailable")
+            synthesized = await self.executors.run_with_model(
+                self.models, 'xtts', lambda tts: self._synthesize(tts, [sentences[i] for i in missing])
+            )
+            for i, clip in zip(missing, synthesized):
+                clips[i] = clip
             
-            # Generate speech with XTTS
-            result = self.models.get_model('xtts')(text, language=language)
-            return result['audio']
-        except Exception as e:
-            logger.error(f"Error in text-to-speech: {e}")
-            return "Error generating speech"
+            def remember():
+                for i, clip in zip(missing, synthesized):
+                    self.audio_cache.put(keys[i], encode_audio(*clip))
+            
+            await asyncio.to_thread(remember)
+        
+        return clips
+    
+    @staticmethod
+    def _synthesize(tts, sentences: List[str]) -> List[Tuple[np.ndarray, int]]:
+        """Run the TTS pipeline, returning mono float32 audio and its rate per sentence"""
+        results = tts(sentences) if len(sentences) > 1 else [tts(sentences[0])]
+        return [
+            (np.asarray(result["audio"], dtype=np.float32).reshape(-1), int(result["sampling_rate"]))
+            for result in results
+        ]
 
 class LabAnalyzerService:
     """Analyzes lab reports using Donut OCR and AI"""
     
-    def __init__(self, models):
+    def __init__(self, models, executors: Optional[InferenceExecutors] = None):
         self.models = models
+        self.executors = executors or InferenceExecutors()
         self.reference_ranges = self._load_reference_ranges()
     
-    async def analyze_report(self, report_path: str, language: str = "en", 
+    async def analyze_report(self, report: bytes, language: str = "en", 
                            patient_age: Optional[int] = None, 
                            patient_gender: Optional[str] = None) -> Dict[str, Any]:
         """Analyze lab report and provide insights"""
         try:
-            if not self.models.is_model_available('donut'):
+            if not await self.executors.ensure_model(self.models, 'donut'):
                 return {"error": "Lab analysis service unavailable"}
             
             # Extract text from lab report
-            extracted_text = await self._extract_lab_text(report_path)
+            extracted_text = await self._extract_lab_text(report)
             
             # Analyze values and provide recommendations
             analysis = await self._analyze_lab_values(extracted_text, patient_age, patient_gender, language)
@@ -164,19 +550,23 @@ class LabAnalyzerService:
                 "language": language,
                 "timestamp": datetime.now().isoformat()
             }
+        except InferenceQueueFull:
+            raise
         except Exception as e:
             logger.error(f"Error in lab analysis: {e}")
             return {"error": f"Analysis failed: {str(e)}"}
     
-    async def _extract_lab_text(self, report_path: str) -> str:
+    async def _extract_lab_text(self, report: bytes) -> str:
         """Extract text from lab report using Donut"""
         try:
             # Use Donut for document understanding
-            result = self.models.get_model('donut')(
-                report_path,
-                question="What are the lab test results and values?"
+            result = await self.executors.run_with_model(
+                self.models, 'donut',
+                lambda donut: donut(decode_image(report), question="What are the lab test results and values?")
             )
             return result['answer']
+        except InferenceQueueFull:
+            raise
         except Exception as e:
             logger.error(f"Error extracting lab text: {e}")
             return "Unable to extract text from report"
@@ -213,18 +603,19 @@ class LabAnalyzerService:
 class DermatologyService:
     """Analyzes skin conditions using BLIP image captioning"""
     
-    def __init__(self, models):
+    def __init__(self, models, executors: Optional[InferenceExecutors] = None):
         self.models = models
+        self.executors = executors or InferenceExecutors()
     
-    async def analyze_skin_condition(self, image_path: str, language: str = "en", 
+    async def analyze_skin_condition(self, image: bytes, language: str = "en", 
                                    symptoms: Optional[str] = None) -> Dict[str, Any]:
         """Analyze skin condition from image"""
         try:
-            if not self.models.is_model_available('blip'):
+            if not await self.executors.ensure_model(self.models, 'blip'):
                 return {"error": "Dermatology analysis service unavailable"}
             
             # Generate image description
-            description = await self._generate_image_description(image_path)
+            description = await self._generate_image_description(image)
             
             # Analyze condition and provide guidance
             analysis = await self._analyze_skin_condition(description, symptoms, language)
@@ -235,15 +626,21 @@ class DermatologyService:
                 "language": language,
                 "timestamp": datetime.now().isoformat()
             }
+        except InferenceQueueFull:
+            raise
         except Exception as e:
             logger.error(f"Error in dermatology analysis: {e}")
             return {"error": f"Analysis failed: {str(e)}"}
     
-    async def _generate_image_description(self, image_path: str) -> str:
+    async def _generate_image_description(self, image: bytes) -> str:
         """Generate description of skin image using BLIP"""
         try:
-            result = self.models.get_model('blip')(image_path)
+            result = await self.executors.run_with_model(
+                self.models, 'blip', lambda blip: blip(decode_image(image))
+            )
             return result[0]['generated_text']
+        except InferenceQueueFull:
+            raise
         except Exception as e:
             logger.error(f"Error generating image description: {e}")
             return "Unable to analyze image"
@@ -277,104 +674,49 @@ class DermatologyService:
 class EmergencyService:
     """Provides emergency first aid guidance"""
     
-    def __init__(self, models):
+    def __init__(self, models, guides_path: Optional[str] = None):
         self.models = models
-        self.emergency_guides = self._load_emergency_guides()
+        # Guides are precompiled per (type, language) and never touch a model
+        self.guides = EmergencyGuideStore(guides_path)
+    
+    def get_guide(self, emergency_type: str, language: str = "en") -> Optional[CompiledGuide]:
+        """Get a precompiled emergency guide with its serialized body and ETag"""
+        return self.guides.get(emergency_type, language)
     
     async def get_emergency_guide(self, emergency_type: str, language: str = "en") -> Dict[str, Any]:
         """Get emergency first aid guide"""
-        try:
-            guide = self.emergency_guides.get(emergency_type, {})
-            if not guide:
-                return {"error": f"Emergency type '{emergency_type}' not supported"}
-            
-            # Get language-specific content
-            content = guide.get(language, guide.get("en", {}))
-            
-            return {
-                "emergency_type": emergency_type,
-                "language": language,
-                "steps": content.get("steps", []),
-                "do_not": content.get("do_not", []),
-                "urgent": content.get("urgent", False),
-                "call_emergency": content.get("call_emergency", True)
-            }
-        except Exception as e:
-            logger.error(f"Error getting emergency guide: {e}")
-            return {"error": f"Failed to get guide: {str(e)}"}
-    
-    def _load_emergency_guides(self) -> Dict[str, Any]:
-        """Load emergency first aid guides"""
-        return {
-            "snakebite": {
-                "en": {
-                    "steps": [
-                        "Stay calm and immobilize the affected limb",
-                        "Remove tight clothing or jewelry",
-                        "Keep the bite area below heart level",
-                        "Seek immediate medical attention"
-                    ],
-                    "do_not": [
-                        "Do not cut the wound",
-                        "Do not suck out the venom",
-                        "Do not apply ice or tourniquet"
-                    ],
-                    "urgent": True,
-                    "call_emergency": True
-                },
-                "hi": {
-                    "steps": [
-                        "शांत रहें और प्रभावित अंग को स्थिर रखें",
-                        "तंग कपड़े या गहने हटाएं",
-                        "काटने वाले क्षेत्र को दिल के स्तर से नीचे रखें",
-                        "तत्काल चिकित्सा सहायता लें"
-                    ],
-                    "do_not": [
-                        "घाव को न काटें",
-                        "विष को न चूसें",
-                        "बर्फ या टूर्निकेट न लगाएं"
-                    ],
-                    "urgent": True,
-                    "call_emergency": True
-                }
-            },
-            "burns": {
-                "en": {
-                    "steps": [
-                        "Cool the burn with cool (not cold) water",
-                        "Remove jewelry and tight items",
-                        "Cover with sterile gauze",
-                        "Seek medical attention for severe burns"
-                    ],
-                    "do_not": [
-                        "Do not apply ice directly",
-                        "Do not pop blisters",
-                        "Do not apply butter or oil"
-                    ],
-                    "urgent": False,
-                    "call_emergency": False
-                }
-            }
-        }
+        guide = self.guides.get(emergency_type, language)
+        if guide is None:
+            return {"error": f"Emergency type '{emergency_type}' not supported"}
+        return dict(guide.data)
 
 class GovernmentSchemesService:
     """Searches government health schemes and benefits"""
     
-    def __init__(self, models):
+    def __init__(self, models, executors: Optional[InferenceExecutors] = None,
+                 embedder: Optional[EmbeddingBatcher] = None):
         self.models = models
-        self.schemes_database = self._load_schemes_database()
-        self.vector_db = None
-        self._initialize_vector_db()
+        self.executors = executors or InferenceExecutors()
+        self.embedder = embedder or EmbeddingBatcher(models, self.executors)
+        self.index_store = SchemeIndexStore()
+        self.top_k = int(os.getenv("SCHEME_SEARCH_TOP_K", "5"))
+        self.embedding_cache = EmbeddingCache()
+        # Swapped as a whole when the catalog changes, here or in another process
+        self.snapshot = self._initial_snapshot()
+        self.refresh_interval = float(os.getenv("SCHEME_INDEX_REFRESH_S", "10"))
+        self._checked_at = time.monotonic()
+        self._seen_generation = self.snapshot.generation
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._update_lock = asyncio.Lock()
+        self._build_lock = asyncio.Lock()
+        self.candidate_k = max(self.top_k, int(os.getenv("SCHEME_HYBRID_CANDIDATES", "20")))
     
     async def search_schemes(self, query: str, language: str = "en", 
                            state: Optional[str] = None) -> Dict[str, Any]:
         """Search government health schemes"""
         try:
-            if not self.models.is_model_available('multilingual_embedding'):
-                return {"error": "Scheme search service unavailable"}
-            
-            # Search schemes using vector similarity
-            results = await self._search_schemes_vector(query, language, state)
+            # Hybrid lexical and vector search
+            results = (await self._search_schemes_hybrid([query], language, state))[0]
             
             return {
                 "query": query,
@@ -383,54 +725,196 @@ class GovernmentSchemesService:
                 "results": results,
                 "timestamp": datetime.now().isoformat()
             }
+        except InferenceQueueFull:
+            raise
         except Exception as e:
             logger.error(f"Error searching schemes: {e}")
             return {"error": f"Search failed: {str(e)}"}
     
-    async def _search_schemes_vector(self, query: str, language: str, 
-                                   state: Optional[str]) -> List[Dict[str, Any]]:
-        """Search schemes using vector similarity"""
+    async def search_schemes_batch(self, queries: List[str], language: str = "en",
+                                   state: Optional[str] = None) -> Dict[str, Any]:
+        """Search government health schemes for many queries with one encode and one search"""
         try:
-            # Generate query embedding
-            query_embedding = self.models.get_model('multilingual_embedding').encode([query])
+            batch_results = await self._search_schemes_hybrid(queries, language, state)
             
-            # Search vector database
-            if self.vector_db is not None:
-                D, I = self.vector_db.search(query_embedding, k=5)
-                
-                results = []
-                for i, (distance, index) in enumerate(zip(D[0], I[0])):
-                    if index < len(self.schemes_database):
-                        scheme = self.schemes_database[index].copy()
-                        scheme['relevance_score'] = float(1 - distance)
-                        results.append(scheme)
-                
-                return results
-            else:
-                # Fallback to simple text search
-                return self._simple_scheme_search(query, language, state)
+            timestamp = datetime.now().isoformat()
+            return {
+                "results": [
+                    {
+                        "query": query,
+                        "language": language,
+                        "state": state,
+                        "results": results,
+                        "timestamp": timestamp
+                    }
+                    for query, results in zip(queries, batch_results)
+                ],
+                "timestamp": timestamp
+            }
+        except InferenceQueueFull:
+            raise
         except Exception as e:
-            logger.error(f"Error in vector search: {e}")
-            return self._simple_scheme_search(query, language, state)
+            logger.error(f"Error in batch scheme search: {e}")
+            return {"error": f"Search failed: {str(e)}"}
+    
+    async def _search_schemes_hybrid(self, queries: List[str], language: str,
+                                     state: Optional[str]) -> List[List[Dict[str, Any]]]:
+        """Fuse BM25 and vector rankings for every query"""
+        # Every ranking and lookup uses the snapshot the vector search used,
+        # which may be newer than the current one if its index was just built
+        snapshot, vector_hits = await self._search_schemes_vector(self._current_snapshot(), queries, language, state)
+        state_positions = snapshot.state_positions(state)
+        if state_positions is not None and len(state_positions) == 0:
+            return [[] for _ in queries]
+        
+        k = self._candidate_k(state_positions)
+        lexical_hits = [snapshot.lexical_index.search(query, k, state_positions) for query in queries]
+        
+        batch_results = []
+        for i in range(len(queries)):
+            rankings = [[index for index, _ in lexical_hits[i]]]
+            if vector_hits is not None:
+                rankings.append([index for index, _ in vector_hits[i]])
+            
+            results = []
+            for index, score in reciprocal_rank_fusion(rankings)[:self.top_k]:
+                scheme = snapshot.schemes[index].copy()
+                scheme['relevance_score'] = score
+                results.append(scheme)
+            batch_results.append(results)
+        
+        return batch_results
+    
+    def _candidate_k(self, state_positions: Optional[np.ndarray]) -> int:
+        """Number of candidates each ranking contributes to fusion"""
+        return self.candidate_k if state_positions is None else min(self.candidate_k, len(state_positions))
     
-    def _simple_scheme_search(self, query: str, language: str, 
-                             state: Optional[str]) -> List[Dict[str, Any]]:
-        """Simple text-based scheme search"""
-        results = []
-        query_lower = query.lower()
+    async def _search_schemes_vector(self, snapshot: SchemeSnapshot, queries: List[str], language: str,
+                                     state: Optional[str]) -> Tuple[SchemeSnapshot, Optional[List[List[Tuple[int, float]]]]]:
+        """Search schemes using vector similarity.
         
-        for scheme in self.schemes_database:
-            if (query_lower in scheme['name'].lower() or 
-                query_lower in scheme['description'].lower()):
-                if state is None or state.lower() in scheme['states']:
-                    results.append(scheme)
+        Returns the snapshot that was searched, with no hits if vector search is unavailable.
+        """
+        try:
+            if not await self.executors.ensure_model(self.models, 'multilingual_embedding'):
+                return snapshot, None
+            
+            snapshot = await self._with_vector_index(snapshot)
+            state_positions = snapshot.state_positions(state)
+            if snapshot.index is None or (state_positions is not None and len(state_positions) == 0):
+                return snapshot, None
+            
+            # Filter by state inside the search so top-k are all in-state
+            params = None if state is None else snapshot.search_params(state)
+            embeddings = await self._encode_queries(queries, language)
+            D, I = await self.executors.run("embedding", snapshot.index.search, embeddings,
+                                            k=self._candidate_k(state_positions), params=params)
+        except InferenceQueueFull:
+            raise
+        except Exception as e:
+            logger.error(f"Error in vector search: {e}")
+            return snapshot, None
         
-        return results[:5]
+        return snapshot, snapshot.vector_hits(D, I)
+    
+    async def _encode_queries(self, queries: List[str], language: str) -> np.ndarray:
+        """Embed search queries, reusing cached embeddings for repeated queries"""
+        return await self.embedding_cache.get_or_embed(
+            queries, language,
+            self.models.model_configs['multilingual_embedding'],
+            lambda texts: self.embedder.embed(texts, 'multilingual_embedding')
+        )
+    
+    def _current_snapshot(self) -> SchemeSnapshot:
+        """The snapshot to search, starting a background reload when another process saved a newer one"""
+        now = time.monotonic()
+        if self._refresh_task is None and now - self._checked_at >= self.refresh_interval:
+            self._checked_at = now
+            try:
+                generation = self.index_store.generation()
+            except Exception as e:
+                logger.warning(f"Could not read scheme index manifest: {e}")
+                generation = None
+            if generation is not None and generation != self._seen_generation:
+                self._seen_generation = generation
+                self._refresh_task = asyncio.create_task(self._refresh_snapshot())
+        return self.snapshot
     
-    def _load_schemes_database(self) -> List[Dict[str, Any]]:
+    async def _refresh_snapshot(self):
+        """Load the latest generation off the event loop, then swap it in"""
+        try:
+            snapshot = await asyncio.to_thread(
+                self.index_store.load, self.models.model_configs['multilingual_embedding']
+            )
+            if snapshot is not None and snapshot.generation > self.snapshot.generation:
+                self.snapshot = snapshot
+                logger.info(f"Switched to scheme index generation {snapshot.generation} "
+                            f"with {len(snapshot.schemes)} schemes")
+        except Exception as e:
+            logger.error(f"Failed to reload scheme index: {e}")
+        finally:
+            self._refresh_task = None
+    
+    async def upsert_schemes(self, schemes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Add or replace schemes, re-embedding only those whose indexed text changed"""
+        return await self._update_schemes(upserts=schemes)
+    
+    async def delete_schemes(self, scheme_ids: List[int]) -> Dict[str, Any]:
+        """Remove schemes by id"""
+        return await self._update_schemes(delete_ids=scheme_ids)
+    
+    async def _update_schemes(self, upserts: List[Dict[str, Any]] = (),
+                              delete_ids: List[int] = ()) -> Dict[str, Any]:
+        """Apply an update to the latest generation, save it as the next one and swap it in"""
+        model_name = self.models.model_configs['multilingual_embedding']
+        async with self._update_lock:
+            store_lock = self.index_store.lock()
+            # Another process may hold the lock for a while, so wait off the event loop
+            await asyncio.to_thread(store_lock.acquire)
+            try:
+                snapshot = self.snapshot
+                if (self.index_store.generation() or 0) > snapshot.generation:
+                    # Build on the newest generation, not a stale copy
+                    snapshot = await asyncio.to_thread(self.index_store.load, model_name) or snapshot
+                snapshot = await self._with_vector_index(snapshot)
+                if snapshot.index is None:
+                    raise RuntimeError("Scheme vector index is unavailable; cannot update schemes")
+                
+                update = plan_scheme_update(snapshot.schemes, upserts, delete_ids)
+                if update.schemes != snapshot.schemes:
+                    embeddings = None
+                    if update.embed:
+                        embeddings = await self.embedder.embed(
+                            [scheme_text(scheme) for scheme in update.embed], 'multilingual_embedding'
+                        )
+                    index = await asyncio.to_thread(
+                        update_index, snapshot.index, update.remove_ids, update.embed_ids, embeddings
+                    )
+                    generation = await asyncio.to_thread(self.index_store.save, index, update.schemes, model_name)
+                    snapshot = await asyncio.to_thread(SchemeSnapshot, update.schemes, index, generation)
+                
+                self.snapshot = snapshot
+                self._seen_generation = max(self._seen_generation, snapshot.generation)
+            finally:
+                store_lock.release()
+        
+        logger.info(f"Scheme update: {len(update.upserted)} upserted, {len(update.deleted)} deleted, "
+                    f"{len(update.embed)} embedded; generation {snapshot.generation}")
+        return {
+            "generation": snapshot.generation,
+            "schemes": len(snapshot.schemes),
+            "upserted": update.upserted,
+            "deleted": update.deleted,
+            "embedded": len(update.embed),
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def _load_schemes_database() -> List[Dict[str, Any]]:
         """Load government schemes database"""
         return [
             {
+                "id": 1,
                 "name": "PMJAY - Ayushman Bharat",
                 "description": "Health insurance scheme for poor and vulnerable families",
                 "eligibility": "BPL families, SECC beneficiaries",
@@ -440,6 +924,7 @@ class GovernmentSchemesService:
                 "website": "https://pmjay.gov.in"
             },
             {
+                "id": 2,
                 "name": "UP State Health Scheme",
                 "description": "Uttar Pradesh state health insurance scheme",
                 "eligibility": "UP residents, BPL families",
@@ -450,24 +935,43 @@ class GovernmentSchemesService:
             }
         ]
     
-    def _initialize_vector_db(self):
-        """Initialize vector database for scheme search"""
+    def _initial_snapshot(self) -> SchemeSnapshot:
+        """Load the prebuilt scheme index; without one, the index is built on first search"""
         try:
-            if self.models.is_model_available('multilingual_embedding'):
-                # Generate embeddings for all schemes
-                scheme_texts = [
-                    f"{scheme['name']} {scheme['description']} {scheme['eligibility']}"
-                    for scheme in self.schemes_database
-                ]
-                
-                embeddings = self.models.get_model('multilingual_embedding').encode(scheme_texts)
-                
-                # Create FAISS index
-                dimension = embeddings.shape[1]
-                self.vector_db = faiss.IndexFlatL2(dimension)
-                self.vector_db.add(embeddings.astype('float32'))
-                
-                logger.info("Vector database initialized successfully")
+            # Prefer the prebuilt index from build_scheme_index.py, memory-mapped
+            # so every worker shares the same pages
+            snapshot = self.index_store.load(self.models.model_configs['multilingual_embedding'])
+            if snapshot is not None:
+                logger.info(f"Loaded scheme index generation {snapshot.generation} with "
+                            f"{snapshot.index.ntotal} schemes from {self.index_store.path}")
+                return snapshot
         except Exception as e:
-            logger.error(f"Failed to initialize vector database: {e}")
-            self.vector_db = None
+            logger.error(f"Failed to load scheme index: {e}")
+        
+        # Lexical search only until the embedding model is first needed
+        return SchemeSnapshot(self._load_schemes_database())
+    
+    async def _with_vector_index(self, snapshot: SchemeSnapshot) -> SchemeSnapshot:
+        """The snapshot with a vector index, encoding its schemes in this process if it has none"""
+        if snapshot.index is not None:
+            return snapshot
+        async with self._build_lock:
+            if self.snapshot is not snapshot:
+                # Built (or replaced) while waiting for the lock
+                return self.snapshot
+            try:
+                index = await self.executors.run_with_model(
+                    self.models, 'multilingual_embedding',
+                    lambda encoder: build_scheme_index(encoder, snapshot.schemes)
+                )
+            except InferenceQueueFull:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to initialize vector database: {e}")
+                return snapshot
+            built = SchemeSnapshot(snapshot.schemes, index, snapshot.generation)
+            # A refresh or update may have swapped in a newer generation meanwhile
+            if self.snapshot is snapshot:
+                self.snapshot = built
+            logger.info("Vector database initialized successfully")
+            return built
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+LUMEN Streaming Module
+Helpers for streaming model output to clients as it is produced
+"""
+
+import json
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+
+import torch
+from transformers import StoppingCriteria, TextStreamer
+
+logger = logging.getLogger(__name__)
+
+class AsyncTextStreamer(TextStreamer):
+    """Hands decoded text from a generate() thread to an asyncio queue"""
+
+    def __init__(self, tokenizer, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop, **decode_kwargs):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True, **decode_kwargs)
+        self.queue = queue
+        self.loop = loop
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        """Forward each finished piece of text to the event loop"""
+        if text:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+
+class CancelGeneration(StoppingCriteria):
+    """Stops generate() once the client has gone away"""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        return self.cancelled.is_set()
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class EnergyVAD:
+    """Energy-based voice activity detection with an adaptive noise floor"""
+
+    def __init__(self, ratio: float = 3.0, min_rms: float = 0.005):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.noise_rms = min_rms
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        """Classify one frame, learning the noise floor from non-speech frames"""
+        rms = float(np.sqrt(np.mean(frame * frame))) if len(frame) else 0.0
+        speech = rms > max(self.noise_rms * self.ratio, self.min_rms)
+        if not speech:
+            self.noise_rms = 0.95 * self.noise_rms + 0.05 * max(rms, self.min_rms / 2)
+        return speech
+
+class TranscriptionJob:
+    """Audio from one utterance to decode as a partial or final transcript"""
+
+    def __init__(self, kind: str, samples: np.ndarray, start: float, end: float, utterance: int):
+        self.kind = kind
+        self.samples = samples
+        self.start = start
+        self.end = end
+        self.utterance = utterance
+
+class StreamingTranscriber:
+    """Segments a live PCM stream into utterances and schedules incremental decoding.
+
+    While the user speaks, the utterance so far is queued for a partial
+    transcript every partial_interval_s of new audio; only the newest partial
+    is kept if decoding falls behind. After end_silence_s of silence, or once
+    an utterance reaches max_utterance_s, it is queued for a final transcript.
+    """
+
+    FRAME_S = 0.03
+    PREROLL_S = 0.3
+
+    def __init__(self, sample_rate: int, partial_interval_s: float = 1.0,
+                 end_silence_s: float = 0.7, max_utterance_s: float = 15.0):
+        self.sample_rate = sample_rate
+        self.frame_size = max(1, int(sample_rate * self.FRAME_S))
+        self.partial_interval_s = partial_interval_s
+        self.end_silence_s = end_silence_s
+        self.max_utterance_s = max_utterance_s
+        self.vad = EnergyVAD()
+
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._preroll: Deque[np.ndarray] = deque(maxlen=max(1, int(self.PREROLL_S / self.FRAME_S)))
+        self._utterance: List[np.ndarray] = []
+        self._utterance_count = 0
+        self._start_s = 0.0
+        self._elapsed_s = 0.0
+        self._silence_s = 0.0
+        self._since_partial_s = 0.0
+
+        self._jobs: Deque[Optional[TranscriptionJob]] = deque()
+        self._ready = asyncio.Event()
+
+    def add_audio(self, samples: np.ndarray):
+        """Feed mono float32 samples at the stream's sample rate"""
+        samples = np.concatenate([self._remainder, samples])
+        usable = len(samples) - len(samples) % self.frame_size
+        for offset in range(0, usable, self.frame_size):
+            self._add_frame(samples[offset:offset + self.frame_size])
+        self._remainder = samples[usable:]
+
+    def close(self):
+        """Finish the current utterance and end the job stream"""
+        if self._utterance:
+            self._finish_utterance()
+        self._push(None)
+
+    async def next_job(self) -> Optional[TranscriptionJob]:
+        """Wait for the next decoding job; None once the stream is closed"""
+        while not self._jobs:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._jobs.popleft()
+
+    def _add_frame(self, frame: np.ndarray):
+        speech = self.vad.is_speech(frame)
+        self._elapsed_s += self.FRAME_S
+
+        if not self._utterance:
+            if not speech:
+                self._preroll.append(frame)
+                return
+            # Include a little audio from before the onset
+            self._utterance = list(self._preroll) + [frame]
+            self._preroll.clear()
+            self._start_s = self._elapsed_s - len(self._utterance) * self.FRAME_S
+            self._silence_s = 0.0
+            self._since_partial_s = 0.0
+            return
+
+        self._utterance.append(frame)
+        self._silence_s = 0.0 if speech else self._silence_s + self.FRAME_S
+        self._since_partial_s += self.FRAME_S
+
+        length_s = len(self._utterance) * self.FRAME_S
+        if self._silence_s >= self.end_silence_s or length_s >= self.max_utterance_s:
+            self._finish_utterance()
+        elif self._since_partial_s >= self.partial_interval_s:
+            self._since_partial_s = 0.0
+            self._queue_partial()
+
+    def _queue_partial(self):
+        job = TranscriptionJob("partial", np.concatenate(self._utterance), self._start_s,
+                               self._elapsed_s, self._utterance_count)
+        # A newer partial of the same utterance supersedes a queued one
+        if self._jobs and self._jobs[-1] is not None and self._jobs[-1].kind == "partial" \
+                and self._jobs[-1].utterance == job.utterance:
+            self._jobs[-1] = job
+        else:
+            self._push(job)
+
+    def _finish_utterance(self):
+        # Queued partials of this utterance are pointless once its final is queued
+        self._jobs = deque(job for job in self._jobs
+                           if job is None or job.utterance != self._utterance_count)
+        self._push(TranscriptionJob("final", np.concatenate(self._utterance), self._start_s,
+                                    self._elapsed_s, self._utterance_count))
+        self._utterance = []
+        self._utterance_count += 1
+
+    def _push(self, job: Optional[TranscriptionJob]):
+        self._jobs.append(job)
+        self._ready.set()
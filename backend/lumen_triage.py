@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+LUMEN Triage Module
+Rule-based triage: red-flag and urgent terms from a data file, compiled
+into one Aho-Corasick automaton per language
+"""
+
+import os
+import json
+import logging
+import unicodedata
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Triage levels from least to most severe
+TRIAGE_LEVELS = ("Green", "Yellow", "Red")
+TRIAGE_SEVERITY = {level: rank for rank, level in enumerate(TRIAGE_LEVELS)}
+
+DEFAULT_RULES_PATH = Path(__file__).parent / "data" / "triage_rules.json"
+
+_JOINERS = str.maketrans("", "", "\u200C\u200D")
+
+def normalize_text(text: str) -> str:
+    """Normalize text for matching: NFKC, casefolded, single-spaced, without joiners"""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().translate(_JOINERS).split())
+
+def _is_word_char(char: str) -> bool:
+    # Indic vowel signs and viramas are combining marks, not alphanumerics
+    return char.isalnum() or unicodedata.category(char) in ("Mn", "Mc")
+
+def more_severe(a: str, b: str) -> str:
+    """The more severe of two triage levels"""
+    return a if TRIAGE_SEVERITY.get(a, 0) >= TRIAGE_SEVERITY.get(b, 0) else b
+
+class AhoCorasick:
+    """Finds every occurrence of many patterns in one pass over the text"""
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        goto: List[Dict[str, int]] = [{}]
+        output: List[Tuple[int, ...]] = [()]
+
+        for index, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern:
+                child = goto[node].get(char)
+                if child is None:
+                    child = len(goto)
+                    goto[node][char] = child
+                    goto.append({})
+                    output.append(())
+                node = child
+            output[node] += (index,)
+
+        # Failure links point to the longest proper suffix that is also a prefix;
+        # breadth-first order means a node's failure target is already complete
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                target = fail[node]
+                while target and char not in goto[target]:
+                    target = fail[target]
+                fail[child] = goto[target].get(char, 0) if node else 0
+                output[child] += output[fail[child]]
+
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(start, pattern index) for every match, including overlapping ones"""
+        goto, fail, output, patterns = self._goto, self._fail, self._output, self.patterns
+        node = 0
+        for end, char in enumerate(text, start=1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                yield end - len(patterns[index]), index
+
+class TriageMatch(NamedTuple):
+    """A rule term found in the text"""
+    term: str
+    level: str
+
+class TriageResult(NamedTuple):
+    """Triage level with the terms that determined it"""
+    level: str
+    matches: List[TriageMatch]
+
+class TriageRules:
+    """Matches triage terms in the request language plus English.
+
+    ASCII terms (English and romanized transliterations) must match whole
+    words. Terms in Indic scripts only need a word boundary before them,
+    since case endings and postpositions are often written joined to the
+    word.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv("TRIAGE_RULES_PATH") or DEFAULT_RULES_PATH)
+        with open(self.path, encoding="utf-8") as f:
+            document = json.load(f)
+        self.version = document.get("version", 1)
+        self.prototypes: Dict[str, List[str]] = document.get("prototypes", {})
+
+        # language -> {normalized term: level}, keeping the most severe level per term
+        terms: Dict[str, Dict[str, str]] = {}
+        for level, languages in document["levels"].items():
+            if level not in TRIAGE_SEVERITY:
+                raise ValueError(f"Unknown triage level '{level}' in {self.path}")
+            for language, words in languages.items():
+                table = terms.setdefault(language, {})
+                for word in words:
+                    word = normalize_text(word)
+                    if word:
+                        table[word] = more_severe(level, table.get(word, "Green"))
+
+        english = terms.get("en", {})
+        self._matchers: Dict[str, Tuple[AhoCorasick, List[str], List[bool]]] = {}
+        for language, table in terms.items():
+            combined = {**english, **table} if language != "en" else dict(table)
+            for word in english.keys() & table.keys():
+                combined[word] = more_severe(english[word], table[word])
+            words = list(combined)
+            self._matchers[language] = (
+                AhoCorasick(words),
+                [combined[word] for word in words],
+                [word.isascii() for word in words],
+            )
+
+        counts = {language: len(words) for language, (_, words, _) in self._matchers.items()}
+        logger.info(f"Loaded triage rules version {self.version}: {counts}")
+
+    def analyze(self, text: str, language: str = "en") -> TriageResult:
+        """Triage level of text and the terms that matched"""
+        matcher = self._matchers.get(language) or self._matchers.get("en")
+        if matcher is None:
+            return TriageResult("Green", [])
+        automaton, levels, whole_word = matcher
+
+        text = normalize_text(text)
+        level = "Green"
+        found: Dict[str, str] = {}
+        for start, index in automaton.iter_matches(text):
+            term = automaton.patterns[index]
+            end = start + len(term)
+            if start > 0 and _is_word_char(text[start - 1]):
+                continue
+            if whole_word[index] and end < len(text) and _is_word_char(text[end]):
+                continue
+            found[term] = levels[index]
+            level = more_severe(levels[index], level)
+
+        matches = sorted((TriageMatch(term, term_level) for term, term_level in found.items()),
+                         key=lambda match: -TRIAGE_SEVERITY[match.level])
+        return TriageResult(level, matches)
+
+    def stats(self) -> Dict[str, Any]:
+        """Rule counts per language"""
+        return {
+            "version": self.version,
+            "terms": {language: len(levels) for language, (_, levels, _) in self._matchers.items()},
+        }
+
+class SemanticMatch(NamedTuple):
+    """The prototype description closest to the text"""
+    level: str
+    score: float
+    prototype: str
+
+class SemanticTriage:
+    """Triage by cosine similarity to embedded prototype symptom descriptions.
+
+    Prototypes of all levels form one matrix, embedded once per model, so
+    classifying a query embedding is a single matrix-vector product.
+    """
+
+    def __init__(self, prototypes: Dict[str, List[str]], threshold: Optional[float] = None):
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("SEMANTIC_TRIAGE_THRESHOLD", "0.6")
+        )
+        self.levels = [level for level in TRIAGE_LEVELS if prototypes.get(level)]
+        self.texts = [text for level in self.levels for text in prototypes[level]]
+        # Row offset of each level's block, for a per-level max with reduceat
+        self._starts = np.cumsum([0] + [len(prototypes[level]) for level in self.levels[:-1]])
+
+        self._matrix: Optional[np.ndarray] = None
+        self._model: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.texts)
+
+    async def prototype_matrix(self, embed_fn: Callable[[List[str]], Awaitable[np.ndarray]],
+                               model: str) -> np.ndarray:
+        """Normalized prototype embeddings, computed on first use for a model"""
+        if self._matrix is None or self._model != model:
+            matrix = np.ascontiguousarray(await embed_fn(self.texts), dtype="float32")
+            self._matrix, self._model = matrix, model
+        return self._matrix
+
+    def classify(self, query: np.ndarray, matrix: np.ndarray) -> Optional[SemanticMatch]:
+        """Closest level for a normalized query embedding, if similar enough"""
+        scores = matrix @ query
+        per_level = np.maximum.reduceat(scores, self._starts)
+        best = int(np.argmax(per_level))
+        if per_level[best] < self.threshold:
+            return None
+
+        start = self._starts[best]
+        end = self._starts[best + 1] if best + 1 < len(self.levels) else len(self.texts)
+        row = start + int(np.argmax(scores[start:end]))
+        return SemanticMatch(self.levels[best], float(scores[row]), self.texts[row])
@@ -5,14 +5,16 @@ AI-powered healthcare assistant with Hugging Face models
 """
 
 import os
+import hmac
+import json
 import asyncio
 import logging
 from pathlib import Path
 from typing import List, Dict, Any, Optional
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 import uvicorn
 from dotenv import load_dotenv
 
@@ -21,6 +23,13 @@ load_dotenv()
 
 # Import LUMEN modules
 from lumen_models import LumenModels
+from lumen_model_server import RemoteLumenModels
+from lumen_executors import InferenceExecutors, InferenceQueueFull
+from lumen_batching import EmbeddingBatcher
+from lumen_kvcache import SessionNotFound
+from lumen_streaming import format_sse
+from lumen_media import decode_pcm, OggOpusStreamDecoder, AUDIO_MEDIA_TYPES, OGG_OPUS_ENCODING, STREAM_ENCODINGS
+from lumen_emergency import SUPPORTED_LANGUAGES
 from lumen_services import (
     ChatbotService,
     VoiceService,
@@ -65,30 +74,56 @@ app.add_middleware(
 
 # Initialize services
 logger.info("Initializing LUMEN services...")
-models = LumenModels()
-chatbot_service = ChatbotService(models)
-voice_service = VoiceService(models)
-lab_service = LabAnalyzerService(models)
-dermatology_service = DermatologyService(models)
+# With MODEL_SERVER_ADDRESS set, models live in lumen_model_server.py and are shared by all workers
+models = RemoteLumenModels() if os.getenv("MODEL_SERVER_ADDRESS") else LumenModels()
+executors = InferenceExecutors()
+# Embedding requests from chat triage and scheme search are batched together
+embedder = EmbeddingBatcher(models, executors)
+chatbot_service = ChatbotService(models, executors, embedder)
+voice_service = VoiceService(models, executors)
+lab_service = LabAnalyzerService(models, executors)
+dermatology_service = DermatologyService(models, executors)
 emergency_service = EmergencyService(models)
-govt_service = GovernmentSchemesService(models)
+govt_service = GovernmentSchemesService(models, executors, embedder)
 logger.info("LUMEN services initialized successfully")
 
+@app.exception_handler(InferenceQueueFull)
+async def inference_queue_full_handler(request, exc: InferenceQueueFull):
+    """Tell clients to back off when a model's inference queue is full"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+@app.exception_handler(SessionNotFound)
+async def session_not_found_handler(request, exc: SessionNotFound):
+    """Unknown or expired chat sessions are a 404 so clients can start a new one"""
+    return JSONResponse(status_code=404, content={"detail": str(exc)})
+
 # Pydantic models for API requests/responses
 class ChatRequest(BaseModel):
     message: str
     language: str = "en"
     context: Optional[str] = None
+    session_id: Optional[str] = None  # from /api/chat/sessions; replaces context
+
+class ChatSessionRequest(BaseModel):
+    language: str = "en"
 
 class ChatResponse(BaseModel):
     response: str
     language: str
     confidence: float
     triage_level: str  # Green, Yellow, Red
+    triage_matches: List[str] = []
+    triage_semantic: Optional[Dict[str, Any]] = None
 
 class VoiceRequest(BaseModel):
     language: str = "en"
     text: str
+    format: str = Field("wav", pattern="^(wav|ogg)$")
+    stream: bool = True
 
 class LabAnalysisRequest(BaseModel):
     language: str = "en"
@@ -96,7 +131,7 @@ class LabAnalysisRequest(BaseModel):
     patient_gender: Optional[str] = None
 
 class EmergencyRequest(BaseModel):
-    emergency_type: str  # snakebite, drowning, burns, electric_shock
+    emergency_type: str  # see /api/emergency/types
     language: str = "en"
 
 class GovernmentSchemeRequest(BaseModel):
@@ -104,6 +139,27 @@ class GovernmentSchemeRequest(BaseModel):
     language: str = "en"
     state: Optional[str] = None
 
+class GovernmentSchemeBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=64)
+    language: str = "en"
+    state: Optional[str] = None
+
+class SchemeRecord(BaseModel):
+    id: Optional[int] = None  # replaces the scheme with this id, or else the one with this name
+    name: str
+    description: str
+    eligibility: str
+    coverage: Optional[str] = None
+    states: List[str] = ["all"]
+    helpline: Optional[str] = None
+    website: Optional[str] = None
+
+class SchemeUpsertRequest(BaseModel):
+    schemes: List[SchemeRecord] = Field(..., min_length=1)
+
+class SchemeDeleteRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1)
+
 # Health check endpoint
 @app.get("/api/health")
 async def health_check():
@@ -118,9 +174,12 @@ async def chat_symptoms(request: ChatRequest):
         response = await chatbot_service.process_symptoms(
             request.message, 
             request.language, 
-            request.context
+            request.context,
+            request.session_id
         )
         return response
+    except (InferenceQueueFull, SessionNotFound):
+        raise
     except Exception as e:
         logger.error(f"Error in symptoms chat: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -131,13 +190,83 @@ async def general_chat(request: ChatRequest):
     try:
         response = await chatbot_service.general_conversation(
             request.message, 
-            request.language
+            request.language,
+            request.session_id
         )
         return {"response": response, "language": request.language}
+    except (InferenceQueueFull, SessionNotFound):
+        raise
     except Exception as e:
         logger.error(f"Error in general chat: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _sse_response(events) -> StreamingResponse:
+    """Send service events as Server-Sent Events.
+    
+    The first event is awaited before responding so that a full inference
+    queue still turns into a 503 rather than a broken stream.
+    """
+    first = await events.__anext__()
+    
+    async def body():
+        yield format_sse(first["event"], first["data"])
+        async for event in events:
+            yield format_sse(event["event"], event["data"])
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/chat/symptoms/stream")
+async def chat_symptoms_stream(request: ChatRequest):
+    """Stream symptoms guidance as Server-Sent Events, ending with the triage level"""
+    try:
+        return await _sse_response(chatbot_service.stream_symptoms(
+            request.message,
+            request.language,
+            request.context,
+            request.session_id
+        ))
+    except (InferenceQueueFull, SessionNotFound):
+        raise
+    except Exception as e:
+        logger.error(f"Error in symptoms stream: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/chat/general/stream")
+async def general_chat_stream(request: ChatRequest):
+    """Stream a general healthcare conversation reply as Server-Sent Events"""
+    try:
+        return await _sse_response(chatbot_service.stream_conversation(
+            request.message,
+            request.language,
+            request.session_id
+        ))
+    except (InferenceQueueFull, SessionNotFound):
+        raise
+    except Exception as e:
+        logger.error(f"Error in general chat stream: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/chat/sessions")
+async def create_chat_session(request: ChatSessionRequest):
+    """Start a multi-turn chat session; pass its session_id with each chat request"""
+    return chatbot_service.create_session(request.language)
+
+@app.get("/api/chat/sessions")
+async def get_chat_session_stats():
+    """Get chat session counts and KV cache memory use, including the shared prompt prefixes"""
+    return {**chatbot_service.sessions.stats(), "prefix_cache": chatbot_service.prefix_cache.stats()}
+
+@app.delete("/api/chat/sessions/{session_id}")
+async def end_chat_session(session_id: str):
+    """End a chat session and free its memory"""
+    if not chatbot_service.end_session(session_id):
+        raise SessionNotFound(session_id)
+    return {"session_id": session_id, "ended": True}
+
 # Voice processing endpoints
 @app.post("/api/voice/speech-to-text")
 async def speech_to_text(
@@ -146,38 +275,151 @@ async def speech_to_text(
 ):
     """Convert speech to text using Whisper"""
     try:
-        if not audio.filename:
+        content = await audio.read()
+        if not content:
             raise HTTPException(status_code=400, detail="No audio file provided")
         
-        # Save audio temporarily
-        temp_path = f"/tmp/{audio.filename}"
-        with open(temp_path, "wb") as buffer:
-            content = await audio.read()
-            buffer.write(content)
+        # Decoded in memory, never written to disk
+        transcript = await voice_service.transcribe(content, language)
         
-        text = await voice_service.speech_to_text(temp_path, language)
-        
-        # Clean up
-        os.remove(temp_path)
-        
-        return {"text": text, "language": language}
+        return {**transcript, "language": language}
+    except (HTTPException, InferenceQueueFull):
+        raise
     except Exception as e:
         logger.error(f"Error in speech-to-text: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.websocket("/api/voice/stream")
+async def speech_to_text_stream(websocket: WebSocket):
+    """Transcribe live audio, sending partial transcripts while the user speaks.
+    
+    The client first sends a JSON config ({"language", "sample_rate", "encoding"}
+    with encoding "pcm_s16le", "pcm_f32le" or "ogg_opus"), then binary frames,
+    and finally {"type": "end"}. PCM frames are mono at sample_rate; an Ogg
+    Opus stream (e.g. from MediaRecorder) may be split anywhere and is
+    decoded to sample_rate. The server replies with {"type": "partial"} and
+    {"type": "final"} messages carrying the text and utterance start/end seconds.
+    """
+    await websocket.accept()
+    try:
+        config = await websocket.receive_json()
+        language = config.get("language", "en")
+        sample_rate = int(config.get("sample_rate", 16000))
+        encoding = config.get("encoding", "pcm_s16le")
+        if encoding not in STREAM_ENCODINGS or sample_rate <= 0:
+            await websocket.send_json({"type": "error", "detail": f"Unsupported audio format: {encoding}"})
+            await websocket.close(code=1003)
+            return
+    except WebSocketDisconnect:
+        return
+    except ValueError:
+        await websocket.close(code=1003)
+        return
+    
+    transcriber = voice_service.create_stream(sample_rate)
+    opus_decoder = OggOpusStreamDecoder(sample_rate) if encoding == OGG_OPUS_ENCODING else None
+    
+    async def send_transcripts():
+        # Decodes one utterance window at a time while frames keep arriving
+        while True:
+            job = await transcriber.next_job()
+            if job is None:
+                return
+            try:
+                transcript = await voice_service.transcribe_samples(job.samples, sample_rate, language)
+            except InferenceQueueFull:
+                if job.kind == "partial":
+                    continue
+                await websocket.send_json({"type": "error", "detail": "Speech recognition is busy"})
+                continue
+            except Exception as e:
+                logger.error(f"Error in streaming speech-to-text: {e}")
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            await websocket.send_json({
+                "type": job.kind,
+                "text": transcript["text"],
+                "start": round(job.start, 2),
+                "end": round(job.end, 2),
+                "language": language
+            })
+    
+    sender = asyncio.create_task(send_transcripts())
+    await websocket.send_json({"type": "ready"})
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                sender.cancel()
+                return
+            if message.get("bytes"):
+                if opus_decoder is not None:
+                    try:
+                        samples = opus_decoder.decode(message["bytes"])
+                    except (ValueError, RuntimeError) as e:
+                        sender.cancel()
+                        await websocket.send_json({"type": "error", "detail": f"Invalid Ogg Opus stream: {e}"})
+                        await websocket.close(code=1003)
+                        return
+                    transcriber.add_audio(samples)
+                else:
+                    transcriber.add_audio(decode_pcm(message["bytes"], encoding))
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if isinstance(control, dict) and control.get("type") == "end":
+                    break
+        
+        # Flush the last utterance and wait for its final transcript
+        transcriber.close()
+        await sender
+        await websocket.close()
+    except WebSocketDisconnect:
+        sender.cancel()
+    except Exception as e:
+        sender.cancel()
+        logger.error(f"Error in streaming speech-to-text: {e}")
+
 @app.post("/api/voice/text-to-speech")
 async def text_to_speech(request: VoiceRequest):
-    """Convert text to speech using XTTS"""
+    """Convert text to speech, returning encoded audio.
+    
+    WAV is streamed sentence by sentence unless stream is false; Ogg Opus
+    is returned as a single file.
+    """
+    headers = {"Content-Language": request.language}
     try:
-        audio_data = await voice_service.text_to_speech(
-            request.text, 
-            request.language
-        )
-        return {"audio": audio_data, "language": request.language}
+        if request.stream and request.format == "wav":
+            chunks = voice_service.stream_speech(request.text, request.language)
+            # Synthesize the first sentence before responding so errors still get a status code
+            first = await chunks.__anext__()
+            
+            async def body():
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+            
+            return StreamingResponse(body(), media_type=AUDIO_MEDIA_TYPES["wav"], headers=headers)
+        
+        audio = await voice_service.synthesize(request.text, request.language, request.format)
+        return Response(audio, media_type=AUDIO_MEDIA_TYPES[request.format], headers=headers)
+    except InferenceQueueFull:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in text-to-speech: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/voice/text-to-speech/cache")
+async def get_tts_cache_stats():
+    """Get size and hit/miss counters of the TTS audio cache"""
+    return voice_service.audio_cache.stats()
+
 # Lab analysis endpoints
 @app.post("/api/lab/analyze")
 async def analyze_lab_report(
@@ -186,26 +428,21 @@ async def analyze_lab_report(
 ):
     """Analyze lab report using Donut OCR and AI analysis"""
     try:
-        if not report.filename:
+        content = await report.read()
+        if not content:
             raise HTTPException(status_code=400, detail="No report file provided")
         
-        # Save report temporarily
-        temp_path = f"/tmp/{report.filename}"
-        with open(temp_path, "wb") as buffer:
-            content = await report.read()
-            buffer.write(content)
-        
+        # Decoded in memory, never written to disk
         analysis = await lab_service.analyze_report(
-            temp_path, 
+            content, 
             request.language,
             request.patient_age,
             request.patient_gender
         )
         
-        # Clean up
-        os.remove(temp_path)
-        
         return analysis
+    except (HTTPException, InferenceQueueFull):
+        raise
     except Exception as e:
         logger.error(f"Error in lab analysis: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -219,52 +456,58 @@ async def analyze_skin_condition(
 ):
     """Analyze skin condition using BLIP image captioning"""
     try:
-        if not image.filename:
+        content = await image.read()
+        if not content:
             raise HTTPException(status_code=400, detail="No image file provided")
         
-        # Save image temporarily
-        temp_path = f"/tmp/{image.filename}"
-        with open(temp_path, "wb") as buffer:
-            content = await image.read()
-            buffer.write(content)
-        
+        # Decoded in memory, never written to disk
         analysis = await dermatology_service.analyze_skin_condition(
-            temp_path, 
+            content, 
             language, 
             symptoms
         )
         
-        # Clean up
-        os.remove(temp_path)
-        
         return analysis
+    except (HTTPException, InferenceQueueFull):
+        raise
     except Exception as e:
         logger.error(f"Error in dermatology analysis: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Emergency education endpoints
+EMERGENCY_CACHE_CONTROL = f"public, max-age={int(os.getenv('EMERGENCY_GUIDE_MAX_AGE_S', '3600'))}"
+
+def _guide_response(guide, if_none_match: Optional[str] = None) -> Response:
+    """Send a precompiled guide, or 304 if the client already has it"""
+    headers = {"ETag": guide.etag, "Cache-Control": EMERGENCY_CACHE_CONTROL}
+    if if_none_match and guide.etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(guide.body, media_type="application/json", headers=headers)
+
 @app.post("/api/emergency/guide")
 async def get_emergency_guide(request: EmergencyRequest):
     """Get emergency first aid guide"""
-    try:
-        guide = await emergency_service.get_emergency_guide(
-            request.emergency_type, 
-            request.language
-        )
-        return guide
-    except Exception as e:
-        logger.error(f"Error in emergency guide: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    guide = emergency_service.get_guide(request.emergency_type, request.language)
+    if guide is None:
+        return {"error": f"Emergency type '{request.emergency_type}' not supported"}
+    return _guide_response(guide)
+
+@app.get("/api/emergency/guide/{emergency_type}")
+async def get_emergency_guide_cached(
+    emergency_type: str,
+    language: str = "en",
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get emergency first aid guide with HTTP caching headers"""
+    guide = emergency_service.get_guide(emergency_type, language)
+    if guide is None:
+        raise HTTPException(status_code=404, detail=f"Emergency type '{emergency_type}' not supported")
+    return _guide_response(guide, if_none_match)
 
 @app.get("/api/emergency/types")
-async def get_emergency_types():
+async def get_emergency_types(if_none_match: Optional[str] = Header(None)):
     """Get list of supported emergency types"""
-    return {
-        "emergency_types": [
-            "snakebite", "drowning", "burns", "electric_shock",
-            "choking", "bleeding", "fracture", "heart_attack"
-        ]
-    }
+    return _guide_response(emergency_service.guides.types_response, if_none_match)
 
 # Government schemes endpoints
 @app.post("/api/government/schemes")
@@ -277,10 +520,69 @@ async def search_government_schemes(request: GovernmentSchemeRequest):
             request.state
         )
         return schemes
+    except InferenceQueueFull:
+        raise
     except Exception as e:
         logger.error(f"Error in government schemes search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/government/schemes/batch")
+async def search_government_schemes_batch(request: GovernmentSchemeBatchRequest):
+    """Search government health schemes for many queries at once"""
+    try:
+        schemes = await govt_service.search_schemes_batch(
+            request.queries,
+            request.language,
+            request.state
+        )
+        return schemes
+    except InferenceQueueFull:
+        raise
+    except Exception as e:
+        logger.error(f"Error in batch government schemes search: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _require_scheme_admin(authorization: Optional[str]):
+    """Check the bearer token for scheme updates"""
+    token = os.getenv("SCHEME_ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Scheme updates are disabled; set SCHEME_ADMIN_TOKEN")
+    if not hmac.compare_digest((authorization or "").encode(), f"Bearer {token}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid scheme admin token")
+
+@app.put("/api/government/schemes")
+async def upsert_government_schemes(request: SchemeUpsertRequest, authorization: Optional[str] = Header(None)):
+    """Add or replace schemes; all workers switch to the updated index"""
+    _require_scheme_admin(authorization)
+    try:
+        return await govt_service.upsert_schemes(
+            [scheme.model_dump(exclude_none=True) for scheme in request.schemes]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceQueueFull:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating government schemes: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/government/schemes/delete")
+async def delete_government_schemes(request: SchemeDeleteRequest, authorization: Optional[str] = Header(None)):
+    """Remove schemes by id"""
+    _require_scheme_admin(authorization)
+    try:
+        return await govt_service.delete_schemes(request.ids)
+    except InferenceQueueFull:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting government schemes: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/government/schemes/cache")
+async def get_scheme_cache_stats():
+    """Get hit/miss counters of the scheme query embedding cache"""
+    return govt_service.embedding_cache.stats()
+
 @app.get("/api/government/states")
 async def get_supported_states():
     """Get list of supported Indian states"""
@@ -310,9 +612,8 @@ async def get_model_info():
             "embeddings": "sentence-transformers/all-mpnet-base-v2",
             "multilingual_embeddings": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
         },
-        "supported_languages": [
-            "en", "hi", "ta", "bn", "te", "mr", "gu", "kn", "ml", "pa", "or", "as"
-        ]
+        "backends": dict(models.model_backends),
+        "supported_languages": list(SUPPORTED_LANGUAGES)
     }
 
 if __name__ == "__main__":
@@ -323,7 +624,12 @@ if __name__ == "__main__":
     # Get configuration from environment
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
-    debug = os.getenv("DEBUG", "true").lower() == "true"
+    debug = os.getenv("DEBUG", "false").lower() == "true"
+    workers = int(os.getenv("WORKERS", "1"))
+    if debug and workers > 1:
+        # uvicorn ignores workers when reloading
+        logger.warning(f"DEBUG auto-reload runs a single worker; disabling it to start {workers} workers")
+        debug = False
     
     logger.info(f"Starting LUMEN Backend on {host}:{port}")
     
@@ -333,5 +639,6 @@ if __name__ == "__main__":
         host=host,
         port=port,
         reload=debug,
+        workers=workers,
         log_level="info"
     )
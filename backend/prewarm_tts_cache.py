@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+LUMEN TTS Cache Prewarmer
+Synthesizes emergency guide steps and fallback messages ahead of time so
+they are served from the TTS audio cache
+"""
+
+import sys
+import time
+import asyncio
+import logging
+import argparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from lumen_models import LumenModels
+from lumen_executors import InferenceExecutors
+from lumen_services import ChatbotService, EmergencyService, VoiceService
+
+logger = logging.getLogger(__name__)
+
+def collect_phrases(languages=None):
+    """(language, text) pairs for every emergency guide step and fallback message"""
+    phrases = []
+    # Every supported language, including those that fall back to English text
+    for (_, language), guide in EmergencyService(None).guides.items():
+        for text in guide.data["steps"] + guide.data["do_not"]:
+            phrases.append((language, text))
+
+    for language, text in ChatbotService.FALLBACK_RESPONSES.items():
+        phrases.append((language, text))
+
+    if languages:
+        phrases = [(language, text) for language, text in phrases if language in languages]
+    return list(dict.fromkeys(phrases))
+
+async def prewarm(voice_service, phrases):
+    """Synthesize each phrase, skipping those already cached"""
+    failed = 0
+    for i, (language, text) in enumerate(phrases, start=1):
+        try:
+            await voice_service.synthesize(text, language)
+        except Exception as e:
+            failed += 1
+            logger.error(f"Failed to synthesize [{language}] {text!r}: {e}")
+        if i % 10 == 0 or i == len(phrases):
+            print(f"🔄 {i}/{len(phrases)} phrases")
+    return failed
+
+def main():
+    """Prewarm the TTS cache"""
+    parser = argparse.ArgumentParser(description="Prewarm the LUMEN text-to-speech audio cache")
+    parser.add_argument("--languages", help="Comma-separated language codes (defaults to all)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s:%(name)s:%(message)s')
+
+    voice_service = VoiceService(LumenModels(), InferenceExecutors())
+    if not voice_service.audio_cache.enabled:
+        print("❌ TTS audio cache is disabled (TTS_CACHE_MAX_MB=0 or directory not writable)")
+        sys.exit(1)
+
+    phrases = collect_phrases(args.languages.split(",") if args.languages else None)
+    print(f"🔄 Prewarming {len(phrases)} phrases into {voice_service.audio_cache.path}...")
+
+    start = time.perf_counter()
+    failed = asyncio.run(prewarm(voice_service, phrases))
+    stats = voice_service.audio_cache.stats()
+    print(f"✅ Done in {time.perf_counter() - start:.1f}s: {stats['hits']} sentences already cached, "
+          f"{stats['size_bytes'] / 1024 / 1024:.1f} MB in cache")
+    if failed:
+        print(f"❌ {failed} phrases could not be synthesized")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -46,6 +46,75 @@ def test_chat_endpoint():
         print(f"❌ Chat endpoint error: {e}")
         return False
 
+def test_chat_stream_endpoint():
+    """Test the streaming chat endpoint (Server-Sent Events)"""
+    print("\n📡 Testing Chat Stream Endpoint...")
+    try:
+        data = {"message": "I have a mild fever.", "language": "en"}
+        with requests.post(f"{BASE_URL}/api/chat/symptoms/stream", json=data, stream=True) as response:
+            if response.status_code != 200:
+                print(f"❌ Chat stream failed: {response.status_code} - {response.text}")
+                return False
+            if not response.headers.get("content-type", "").startswith("text/event-stream"):
+                print(f"❌ Chat stream has content type {response.headers.get('content-type')}")
+                return False
+            
+            events = []
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    events.append((event, json.loads(line[len("data: "):])))
+        
+        if not events or events[-1][0] != "done" or "triage_level" not in events[-1][1]:
+            print(f"❌ Chat stream did not end with a done event carrying the triage level: {events[-1:]}")
+            return False
+        tokens = [payload["text"] for name, payload in events if name == "token"]
+        print(f"✅ Chat stream working: {len(tokens)} token events, triage {events[-1][1]['triage_level']}")
+        return True
+    except Exception as e:
+        print(f"❌ Chat stream error: {e}")
+        return False
+
+def test_chat_session_endpoint():
+    """Test a multi-turn chat session"""
+    print("\n🧵 Testing Chat Session Endpoint...")
+    try:
+        response = requests.post(f"{BASE_URL}/api/chat/sessions", json={"language": "en"})
+        if response.status_code != 200:
+            print(f"❌ Session creation failed: {response.status_code} - {response.text}")
+            return False
+        session_id = response.json()["session_id"]
+        
+        for message in ["I have a headache since yesterday.", "It gets worse in the evening."]:
+            data = {"message": message, "language": "en", "session_id": session_id}
+            response = requests.post(f"{BASE_URL}/api/chat/general", json=data)
+            if response.status_code != 200:
+                print(f"❌ Session turn failed: {response.status_code} - {response.text}")
+                return False
+            # Replies have the same shape with or without a session: no echoed prompt
+            if message in response.json()["response"]:
+                print(f"❌ Session reply repeats the prompt: {response.json()}")
+                return False
+        
+        response = requests.delete(f"{BASE_URL}/api/chat/sessions/{session_id}")
+        if response.status_code != 200:
+            print(f"❌ Session delete failed: {response.status_code} - {response.text}")
+            return False
+        
+        data = {"message": "Are you still there?", "language": "en", "session_id": session_id}
+        response = requests.post(f"{BASE_URL}/api/chat/general", json=data)
+        if response.status_code != 404:
+            print(f"❌ Ended session should return 404, got {response.status_code}")
+            return False
+        
+        print("✅ Chat session endpoint working")
+        return True
+    except Exception as e:
+        print(f"❌ Chat session endpoint error: {e}")
+        return False
+
 def test_voice_endpoint():
     """Test the voice endpoint"""
     print("\n🎤 Testing Voice Endpoint...")
@@ -65,6 +134,34 @@ def test_voice_endpoint():
         print(f"❌ Voice endpoint error: {e}")
         return False
 
+def test_tts_format_endpoint():
+    """Test text-to-speech output formats and content types"""
+    print("\n🔊 Testing Text-to-Speech Formats...")
+    expected = {"wav": ("audio/wav", b"RIFF"), "ogg": ("audio/ogg", b"OggS")}
+    try:
+        for audio_format, (media_type, magic) in expected.items():
+            data = {"language": "en", "text": "Drink plenty of water.", "format": audio_format}
+            response = requests.post(f"{BASE_URL}/api/voice/text-to-speech", json=data)
+            if response.status_code != 200:
+                print(f"❌ TTS {audio_format} failed: {response.status_code} - {response.text}")
+                return False
+            content_type = response.headers.get("content-type", "")
+            if not content_type.startswith(media_type) or not response.content.startswith(magic):
+                print(f"❌ TTS {audio_format} returned {content_type} starting with {response.content[:4]!r}")
+                return False
+        
+        data = {"language": "en", "text": "Drink plenty of water.", "format": "mp3"}
+        response = requests.post(f"{BASE_URL}/api/voice/text-to-speech", json=data)
+        if response.status_code != 422:
+            print(f"❌ Unsupported TTS format should return 422, got {response.status_code}")
+            return False
+        
+        print("✅ Text-to-speech formats working")
+        return True
+    except Exception as e:
+        print(f"❌ Text-to-speech format error: {e}")
+        return False
+
 def test_lab_analysis_endpoint():
     """Test the lab analysis endpoint"""
     print("\n🔬 Testing Lab Analysis Endpoint...")
@@ -104,6 +201,38 @@ def test_emergency_endpoint():
         print(f"❌ Emergency endpoint error: {e}")
         return False
 
+def test_emergency_etag_endpoint():
+    """Test HTTP caching of emergency guides"""
+    print("\n🗂️ Testing Emergency Guide Caching...")
+    try:
+        url = f"{BASE_URL}/api/emergency/guide/snakebite"
+        response = requests.get(url, params={"language": "hi"})
+        etag = response.headers.get("etag")
+        if response.status_code != 200 or not etag or "max-age" not in response.headers.get("cache-control", ""):
+            print(f"❌ Emergency guide missing caching headers: {response.status_code} {dict(response.headers)}")
+            return False
+        
+        response = requests.get(url, params={"language": "hi"}, headers={"If-None-Match": etag})
+        if response.status_code != 304 or response.content:
+            print(f"❌ Matching ETag should return an empty 304, got {response.status_code}")
+            return False
+        
+        response = requests.get(url, params={"language": "en"}, headers={"If-None-Match": etag})
+        if response.status_code != 200:
+            print(f"❌ Other language should not match the ETag, got {response.status_code}")
+            return False
+        
+        response = requests.get(f"{BASE_URL}/api/emergency/guide/unknown")
+        if response.status_code != 404:
+            print(f"❌ Unknown emergency type should return 404, got {response.status_code}")
+            return False
+        
+        print(f"✅ Emergency guide caching working: ETag {etag}")
+        return True
+    except Exception as e:
+        print(f"❌ Emergency guide caching error: {e}")
+        return False
+
 def test_government_schemes_endpoint():
     """Test the government schemes endpoint"""
     print("\n🏛️ Testing Government Schemes Endpoint...")
@@ -124,6 +253,40 @@ def test_government_schemes_endpoint():
         print(f"❌ Government schemes endpoint error: {e}")
         return False
 
+def test_government_schemes_batch_endpoint():
+    """Test batch government scheme search against single searches"""
+    print("\n📚 Testing Government Schemes Batch Endpoint...")
+    try:
+        queries = ["healthcare benefits for senior citizens", "maternity support for pregnant women"]
+        data = {"queries": queries, "language": "en", "state": "Maharashtra"}
+        response = requests.post(f"{BASE_URL}/api/government/schemes/batch", json=data)
+        if response.status_code != 200 or "results" not in response.json():
+            print(f"❌ Batch search failed: {response.status_code} - {response.text}")
+            return False
+        batch = response.json()["results"]
+        if [entry["query"] for entry in batch] != queries:
+            print(f"❌ Batch results are not in query order: {[entry['query'] for entry in batch]}")
+            return False
+        
+        # Each query gets the same schemes as searching for it on its own
+        for query, entry in zip(queries, batch):
+            single = requests.post(f"{BASE_URL}/api/government/schemes",
+                                   json={"query": query, "language": "en", "state": "Maharashtra"}).json()
+            if [r.get("name") for r in single.get("results", [])] != [r.get("name") for r in entry["results"]]:
+                print(f"❌ Batch and single results differ for '{query}'")
+                return False
+        
+        response = requests.post(f"{BASE_URL}/api/government/schemes/batch", json={"queries": []})
+        if response.status_code != 422:
+            print(f"❌ Empty batch should return 422, got {response.status_code}")
+            return False
+        
+        print(f"✅ Government schemes batch endpoint working: {[len(entry['results']) for entry in batch]} results")
+        return True
+    except Exception as e:
+        print(f"❌ Government schemes batch endpoint error: {e}")
+        return False
+
 def main():
     """Main test function"""
     print("🚀 LUMEN Backend API Testing")
@@ -137,10 +300,15 @@ def main():
     tests = [
         test_health_endpoint,
         test_chat_endpoint,
+        test_chat_stream_endpoint,
+        test_chat_session_endpoint,
         test_voice_endpoint,
+        test_tts_format_endpoint,
         test_lab_analysis_endpoint,
         test_emergency_endpoint,
-        test_government_schemes_endpoint
+        test_emergency_etag_endpoint,
+        test_government_schemes_endpoint,
+        test_government_schemes_batch_endpoint
     ]
     
     passed = 0
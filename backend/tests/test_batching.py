@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("faiss")
+
+from lumen_batching import EmbeddingBatcher, MicroBatcher
+from lumen_executors import InferenceExecutors
+
+
+class FakeEncoder:
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def encode(self, texts, normalize_embeddings=True, batch_size=32):
+        with self.lock:
+            self.calls.append(list(texts))
+        # The text length and which model encoded it
+        return np.array([[len(text), len(self.name)] for text in texts], dtype="float32")
+
+
+class FakeModels:
+    def __init__(self):
+        self.encoders = {name: FakeEncoder(name) for name in ("embedding", "multilingual_embedding")}
+
+    @contextmanager
+    def use_model(self, model_type):
+        yield self.encoders.get(model_type)
+
+
+def test_micro_batcher_is_abstract():
+    with pytest.raises(TypeError):
+        MicroBatcher()
+
+
+def test_batch_errors_reach_every_caller():
+    class Failing(MicroBatcher):
+        async def _run_batch(self, items):
+            raise RuntimeError("boom")
+
+    async def main():
+        batcher = Failing(max_batch_size=4, max_wait_ms=20)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    assert [str(result) for result in asyncio.run(main())] == ["boom"] * 3
+
+
+def test_concurrent_requests_share_one_encode_of_distinct_texts():
+    models = FakeModels()
+
+    async def main():
+        batcher = EmbeddingBatcher(models, InferenceExecutors(), max_batch_size=8, max_wait_ms=50)
+        return await asyncio.gather(
+            batcher.embed(["fever", "cough"]),
+            batcher.embed(["cough", "rash", "fever"]),
+            batcher.embed(["fever"]),
+        )
+
+    first, second, third = asyncio.run(main())
+    encoder = models.encoders["multilingual_embedding"]
+    assert encoder.calls == [["fever", "cough", "rash"]]
+    # Each caller gets its own rows, in its own order
+    assert first[:, 0].tolist() == [5, 5]
+    assert second[:, 0].tolist() == [5, 4, 5]
+    assert np.array_equal(second[2], first[0])
+    assert third.shape == (1, 2)
+
+
+def test_requests_for_different_models_are_encoded_separately():
+    models = FakeModels()
+
+    async def main():
+        batcher = EmbeddingBatcher(models, InferenceExecutors(), max_batch_size=8, max_wait_ms=50)
+        return await asyncio.gather(batcher.embed(["fever"], "embedding"), batcher.embed(["fever"]))
+
+    english, multilingual = asyncio.run(main())
+    assert models.encoders["embedding"].calls == [["fever"]]
+    assert models.encoders["multilingual_embedding"].calls == [["fever"]]
+    assert not np.array_equal(english, multilingual)
+
+
+def test_embed_rejects_other_models_and_handles_no_texts():
+    async def main():
+        batcher = EmbeddingBatcher(FakeModels(), InferenceExecutors())
+        with pytest.raises(ValueError):
+            await batcher.embed(["fever"], "chatbot")
+        return await batcher.embed([])
+
+    assert asyncio.run(main()).shape == (0, 0)
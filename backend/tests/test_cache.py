@@ -0,0 +1,62 @@
+import os
+
+from lumen_cache import AudioCache
+
+
+def age(cache, key, mtime):
+    os.utime(cache._file(key), (mtime, mtime))
+
+
+def test_key_ignores_whitespace_but_not_format():
+    assert AudioCache.key("Drink  water.\n", "en", "xtts") == AudioCache.key("Drink water.", "en", "xtts")
+    assert AudioCache.key("Drink water.", "en", "xtts") != AudioCache.key("Drink water.", "hi", "xtts")
+    assert AudioCache.key("Drink water.", "en", "xtts") != AudioCache.key("Drink water.", "en", "xtts", "ogg")
+
+
+def test_get_and_put(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    assert cache.get("ab12") is None
+    cache.put("ab12", b"audio")
+    assert cache.get("ab12") == b"audio"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert cache.stats()["size_bytes"] == 5
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=350)
+    for mtime, key in enumerate(["aa01", "bb02", "cc03"], start=1):
+        cache.put(key, bytes(100))
+        age(cache, key, 1000 * mtime)
+
+    # Reading refreshes the oldest entry, so the next one goes first
+    assert cache.get("aa01") is not None
+    cache.put("dd04", bytes(100))
+
+    assert cache.get("bb02") is None
+    assert all(cache.get(key) is not None for key in ["aa01", "cc03", "dd04"])
+    assert cache.stats()["size_bytes"] == 300
+
+
+def test_eviction_trims_below_budget(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    for i in range(10):
+        cache.put(f"k{i:03d}", bytes(100))
+        age(cache, f"k{i:03d}", 1000 + i)
+    cache.put("k010", bytes(100))
+
+    # Down to 90% of the budget, so the next write does not evict again
+    assert cache.stats()["size_bytes"] == 900
+    assert cache.get("k000") is None and cache.get("k001") is None
+    assert cache.get("k010") is not None
+
+
+def test_size_is_shared_through_the_directory(tmp_path):
+    AudioCache(str(tmp_path), max_bytes=1000).put("ab12", bytes(300))
+    assert AudioCache(str(tmp_path), max_bytes=1000).stats()["size_bytes"] == 300
+
+
+def test_disabled_cache(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=0)
+    cache.put("ab12", b"audio")
+    assert cache.get("ab12") is None
+    assert not (tmp_path / "cache").exists()
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from lumen_emergency import EmergencyGuideStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "guides.json"
+    path.write_text(json.dumps({
+        "version": 4,
+        "fallback_language": "en",
+        "guides": {
+            "burns": {
+                "en": {"steps": ["Cool with running water"], "do_not": ["Apply ice"], "urgent": True},
+                "hi": {"steps": ["बहते पानी से ठंडा करें"]},
+            },
+        },
+    }, ensure_ascii=False), encoding="utf-8")
+    return EmergencyGuideStore(str(path))
+
+
+def test_guide_body_is_serialized_once(store):
+    guide = store.get("burns", "hi")
+    assert json.loads(guide.body) == dict(guide.data)
+    assert guide.data["steps"] == ["बहते पानी से ठंडा करें"]
+    assert store.get("burns", "hi") is guide
+
+
+def test_missing_translation_falls_back(store):
+    guide = store.get("burns", "ta")
+    assert guide.data["language"] == "ta"
+    assert guide.data["steps"] == ["Cool with running water"]
+    assert store.get("burns", "xx").data["language"] == "en"
+    assert store.get("drowning", "en") is None
+
+
+def test_etag_changes_with_content_and_version(store, tmp_path):
+    english, hindi = store.get("burns", "en"), store.get("burns", "hi")
+    assert english.etag.startswith('"4-') and english.etag != hindi.etag
+
+    document = json.loads((tmp_path / "guides.json").read_text(encoding="utf-8"))
+    document["version"] = 5
+    (tmp_path / "guides.json").write_text(json.dumps(document), encoding="utf-8")
+    assert EmergencyGuideStore(str(tmp_path / "guides.json")).get("burns", "en").etag.startswith('"5-')
+
+
+def test_types_response(store):
+    assert json.loads(store.types_response.body) == {"emergency_types": ["burns"], "version": 4}
+
+
+def test_guides_are_read_only(store):
+    with pytest.raises(TypeError):
+        store.get("burns").data["urgent"] = False
+
+
+def test_bundled_guides_load():
+    store = EmergencyGuideStore()
+    assert "snakebite" in store.types
+    assert store.get("snakebite", "hi") is not None
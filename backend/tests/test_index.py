@@ -0,0 +1,206 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from lumen_index import (
+    INDEX_TYPES, SchemeIndexBuilder, SchemeIndexStore, assign_scheme_ids, build_scheme_index, encode_normalized,
+    plan_scheme_update, scheme_text, token_budget_batches, update_index,
+)
+
+DIMENSION = 16
+
+
+class FakeEncoder:
+    """Deterministic embeddings derived from each text's hash"""
+
+    def __init__(self, fail_after=None):
+        self.calls = []
+        self.fail_after = fail_after
+
+    def encode(self, texts, normalize_embeddings=True, batch_size=32):
+        if self.fail_after is not None and len(self.calls) >= self.fail_after:
+            raise KeyboardInterrupt
+        self.calls.append(list(texts))
+        vectors = np.stack([self.vector(text) for text in texts])
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    @staticmethod
+    def vector(text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(DIMENSION).astype("float32")
+
+
+def corpus(count=40):
+    return [f"scheme {i} " + "benefit " * (i % 7) for i in range(count)]
+
+
+def test_token_budget_batches_fit_budget():
+    lengths = np.array([10, 40, 20, 5])
+    order = np.argsort(-lengths, kind="stable")
+    batches = list(token_budget_batches(order, lengths, max_batch_tokens=40))
+    assert [(start, batch.tolist()) for start, batch in batches] == [(0, [1]), (1, [2, 0]), (3, [3])]
+
+
+def test_builder_returns_embeddings_in_corpus_order():
+    texts = corpus()
+    encoder = FakeEncoder()
+    embeddings = SchemeIndexBuilder(encoder, max_batch_tokens=30).encode(texts)
+    assert len(encoder.calls) > 1
+    assert np.allclose(embeddings, encode_normalized(FakeEncoder(), texts))
+
+
+def test_builder_index_returns_given_ids():
+    texts = corpus()
+    ids = [100 + i for i in range(len(texts))]
+    index = SchemeIndexBuilder(FakeEncoder(), add_chunk_size=7).build(texts, index_type="flat", ids=ids)
+    assert index.ntotal == len(texts)
+    _, labels = index.search(encode_normalized(FakeEncoder(), [texts[5]]), 1)
+    assert labels[0][0] == 105
+
+
+def test_interrupted_build_resumes(tmp_path):
+    texts = corpus()
+    interrupted = FakeEncoder(fail_after=3)
+    with pytest.raises(KeyboardInterrupt):
+        SchemeIndexBuilder(interrupted, work_dir=tmp_path, max_batch_tokens=30).encode(texts, "model")
+    encoded = sum(len(batch) for batch in interrupted.calls)
+
+    encoder = FakeEncoder()
+    embeddings = SchemeIndexBuilder(encoder, work_dir=tmp_path, max_batch_tokens=30).encode(texts, "model")
+    # Only the texts not encoded before the interruption are encoded again
+    assert sum(len(batch) for batch in encoder.calls) == len(texts) - encoded
+    assert np.allclose(embeddings, encode_normalized(FakeEncoder(), texts))
+
+
+def test_changed_corpus_starts_over(tmp_path):
+    texts = corpus()
+    with pytest.raises(KeyboardInterrupt):
+        SchemeIndexBuilder(FakeEncoder(fail_after=3), work_dir=tmp_path, max_batch_tokens=30).encode(texts, "model")
+
+    encoder = FakeEncoder()
+    SchemeIndexBuilder(encoder, work_dir=tmp_path, max_batch_tokens=30).encode(texts, "other-model")
+    assert sum(len(batch) for batch in encoder.calls) == len(texts)
+
+
+def test_cleanup_removes_work_dir(tmp_path):
+    work_dir = tmp_path / "build"
+    builder = SchemeIndexBuilder(FakeEncoder(), work_dir=work_dir)
+    builder.encode(corpus(5))
+    assert work_dir.exists()
+    builder.cleanup()
+    assert not work_dir.exists()
+
+
+def schemes(count=300):
+    return assign_scheme_ids([
+        {"name": f"Scheme {i}", "description": f"Support programme {i}", "eligibility": "All residents",
+         "coverage": "Rs 1000", "states": ["All"]}
+        for i in range(count)
+    ])
+
+
+def search_ids(index, texts, k=1):
+    _, labels = index.search(encode_normalized(FakeEncoder(), texts), k)
+    return labels[:, 0].tolist()
+
+
+def test_assign_scheme_ids_numbers_after_highest():
+    numbered = assign_scheme_ids([{"id": 5}, {}, {"id": "2"}, {}])
+    assert [scheme["id"] for scheme in numbered] == [5, 6, 2, 7]
+
+
+def test_plan_metadata_change_keeps_vector():
+    catalog = schemes(3)
+    plan = plan_scheme_update(catalog, [dict(catalog[1], coverage="Rs 5000")])
+    assert plan.upserted == [2]
+    assert plan.embed == [] and plan.remove_ids.tolist() == []
+    assert plan.schemes[1]["coverage"] == "Rs 5000"
+
+
+def test_plan_text_change_matches_by_name_and_reembeds():
+    catalog = schemes(3)
+    plan = plan_scheme_update(catalog, [{"name": " scheme 1 ", "description": "New text", "eligibility": "BPL"}])
+    assert plan.upserted == [2]
+    assert plan.embed_ids.tolist() == [2]
+    assert plan.remove_ids.tolist() == [2]
+    assert len(plan.schemes) == 3
+
+
+def test_plan_new_scheme_and_delete():
+    catalog = schemes(3)
+    plan = plan_scheme_update(catalog, [{"name": "Fresh", "description": "d", "eligibility": "e"}], [1, 1, 99])
+    assert plan.deleted == [1]
+    assert plan.upserted == [4]
+    assert plan.embed_ids.tolist() == [4]
+    # The new scheme has no vector yet, the deleted one does
+    assert plan.remove_ids.tolist() == [1]
+    assert [scheme["id"] for scheme in plan.schemes] == [2, 3, 4]
+
+
+def test_plan_rejects_incomplete_scheme():
+    with pytest.raises(ValueError):
+        plan_scheme_update(schemes(1), [{"name": "No description"}])
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivfpq"])
+def test_update_index_removes_and_adds_by_id(index_type):
+    catalog = schemes()
+    index = build_scheme_index(FakeEncoder(), catalog, index_type=index_type)
+    before = index.ntotal
+
+    upsert = dict(catalog[10], description="Rewritten description")
+    plan = plan_scheme_update(catalog, [upsert, {"name": "New", "description": "d", "eligibility": "e"}], [catalog[20]["id"]])
+    updated = update_index(index, plan.remove_ids, plan.embed_ids,
+                           encode_normalized(FakeEncoder(), [scheme_text(s) for s in plan.embed]))
+
+    assert updated.ntotal == before
+    assert index.ntotal == before  # the served index is untouched
+    assert search_ids(updated, [scheme_text(s) for s in plan.embed]) == plan.embed_ids.tolist()
+    if index_type != "ivfpq":  # PQ codes are approximate
+        assert search_ids(updated, [scheme_text(catalog[30])]) == [catalog[30]["id"]]
+    _, labels = updated.search(encode_normalized(FakeEncoder(), [scheme_text(catalog[20])]), updated.ntotal)
+    assert catalog[20]["id"] not in labels[0].tolist()
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_update_index_loaded_from_store(index_type, tmp_path, monkeypatch):
+    # Stored indexes are memory-mapped, which in-memory indexes do not cover
+    monkeypatch.setenv("SCHEME_INDEX_TYPE", index_type)
+    store = SchemeIndexStore(str(tmp_path))
+    catalog = schemes()
+    store.save(build_scheme_index(FakeEncoder(), catalog), catalog, "model")
+    snapshot = store.load("model")
+
+    plan = plan_scheme_update(catalog, [{"name": "New", "description": "d", "eligibility": "e"}], [catalog[20]["id"]])
+    updated = update_index(snapshot.index, plan.remove_ids, plan.embed_ids,
+                           encode_normalized(FakeEncoder(), [scheme_text(s) for s in plan.embed]))
+    assert snapshot.index.ntotal == len(catalog)
+
+    store.save(updated, plan.schemes, "model")
+    reloaded = store.load("model")
+    assert reloaded.generation == 2
+    assert search_ids(reloaded.index, [scheme_text(plan.embed[0])]) == plan.embed_ids.tolist()
+    _, labels = reloaded.index.search(encode_normalized(FakeEncoder(), [scheme_text(catalog[20])]), reloaded.index.ntotal)
+    assert catalog[20]["id"] not in labels[0].tolist()
+
+
+def test_store_generations(tmp_path):
+    store = SchemeIndexStore(str(tmp_path))
+    catalog = schemes(20)
+    index = build_scheme_index(FakeEncoder(), catalog, index_type="flat")
+    for _ in range(3):
+        generation = store.save(index, catalog, "model")
+
+    assert generation == 3
+    assert sorted(path.name for path in tmp_path.glob("schemes-*.faiss")) == \
+        ["schemes-000002.faiss", "schemes-000003.faiss"]
+    assert store.load("other-model") is None
+
+    snapshot = store.load("model")
+    assert snapshot.generation == 3
+    assert [snapshot.schemes[position]["id"] for position in snapshot.positions.values()] == snapshot.ids.tolist()
+    distances, labels = snapshot.index.search(encode_normalized(FakeEncoder(), [scheme_text(catalog[4])]), 3)
+    assert snapshot.vector_hits(distances, labels)[0][0] == (4, pytest.approx(1.0, abs=1e-5))
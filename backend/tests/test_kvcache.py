@@ -0,0 +1,106 @@
+import pytest
+
+pytest.importorskip("torch")
+
+import lumen_kvcache
+from lumen_kvcache import ConversationSession, SessionNotFound, SessionStore
+
+
+def session_with_history(prefix_length, turn_lengths):
+    session = ConversationSession("s", "en", "system")
+    session.token_ids = list(range(prefix_length))
+    session.prefix_length = prefix_length
+    for length in turn_lengths:
+        session.turn_starts.append(len(session.token_ids))
+        session.token_ids += list(range(1000 + len(session.token_ids), 1000 + len(session.token_ids) + length))
+    session.past_key_values, session.kv_bytes = object(), 1
+    return session
+
+
+def test_truncate_within_limit_keeps_cache():
+    session = session_with_history(10, [20, 20])
+    session._truncate(100)
+    assert len(session.token_ids) == 50
+    assert session.kv_bytes == 1
+
+
+def test_truncate_drops_oldest_turns_to_half_the_limit():
+    session = session_with_history(10, [20, 20, 20, 20])
+    newest = session.token_ids[-20:]
+    session._truncate(80)
+    # System prompt plus as many recent turns as fit in 40 tokens
+    assert session.token_ids == list(range(10)) + newest
+    assert session.turn_starts == [10]
+    assert session.past_key_values is None and session.kv_bytes == 0
+
+
+def test_truncate_keeps_newest_turn_when_half_is_too_small():
+    session = session_with_history(10, [20, 50])
+    newest = session.token_ids[-50:]
+    session._truncate(70)
+    assert session.token_ids == list(range(10)) + newest
+    assert session.turn_starts == [10]
+
+
+def test_truncate_keeps_tail_of_oversized_turn():
+    session = session_with_history(10, [100])
+    tail = session.token_ids[-30:]
+    session._truncate(40)
+    assert session.token_ids == list(range(10)) + tail
+    assert session.turn_starts == [10]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lumen_kvcache.time, "time", lambda: now[0])
+    return now
+
+
+def test_idle_sessions_expire(clock):
+    store = SessionStore(memory_budget_mb=1, idle_timeout_s=60, max_sessions=10)
+    old = store.create("en", "system")
+    clock[0] += 30
+    active = store.create("hi", "system")
+    clock[0] += 40
+
+    with pytest.raises(SessionNotFound):
+        store.get(old.session_id)
+    assert store.get(active.session_id) is active
+    assert store.stats()["sessions"] == 1
+
+
+def test_using_a_session_keeps_it_alive(clock):
+    store = SessionStore(memory_budget_mb=1, idle_timeout_s=60, max_sessions=10)
+    session = store.create("en", "system")
+    for _ in range(5):
+        clock[0] += 50
+        assert store.get(session.session_id) is session
+
+
+def test_oldest_session_is_dropped_at_capacity(clock):
+    store = SessionStore(memory_budget_mb=1, idle_timeout_s=0, max_sessions=2)
+    first, second = store.create("en", "system"), store.create("en", "system")
+    store.get(first.session_id)
+    store.create("en", "system")
+    with pytest.raises(SessionNotFound):
+        store.get(second.session_id)
+    assert store.get(first.session_id) is first
+
+
+def test_record_drops_least_recent_caches_over_budget(clock):
+    store = SessionStore(memory_budget_mb=1, idle_timeout_s=0, max_sessions=10)
+    sessions = [store.create("en", "system") for _ in range(3)]
+    for session in sessions:
+        session.past_key_values, session.kv_bytes = object(), 400 * 1024
+        store.record(session)
+
+    assert [bool(session.kv_bytes) for session in sessions] == [False, True, True]
+    assert store.evicted_caches == 1
+
+
+def test_delete():
+    store = SessionStore(memory_budget_mb=1, idle_timeout_s=0, max_sessions=10)
+    session = store.create("en", "system")
+    assert store.delete(session.session_id)
+    assert not store.delete(session.session_id)
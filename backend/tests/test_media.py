@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pytest
+
+pytest.importorskip("librosa")
+sf = pytest.importorskip("soundfile")
+
+from lumen_media import AUDIO_MEDIA_TYPES, OggOpusStreamDecoder, decode_pcm, decode_wav, encode_audio
+
+RATE = 48000
+
+
+def ogg_opus(seconds=2.0):
+    t = np.arange(int(RATE * seconds)) / RATE
+    buffer = io.BytesIO()
+    sf.write(buffer, (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32), RATE, format="OGG", subtype="OPUS")
+    return buffer.getvalue()
+
+
+def test_decode_pcm():
+    assert decode_pcm(np.array([0, 16384, -32768], dtype="<i2").tobytes()).tolist() == [0.0, 0.5, -1.0]
+    assert decode_pcm(np.array([0.25], dtype="<f4").tobytes(), "pcm_f32le").tolist() == [0.25]
+
+
+def test_encode_wav_round_trip():
+    samples = np.linspace(-0.5, 0.5, 1000, dtype=np.float32)
+    decoded, rate = decode_wav(encode_audio(samples, 22050, "wav"))
+    assert rate == 22050
+    assert np.abs(decoded - samples).max() < 1e-3
+
+
+@pytest.mark.parametrize("source_rate, opus_rate", [(16000, 16000), (22050, 24000), (44100, 48000), (96000, 48000)])
+def test_encode_ogg_uses_an_opus_rate(source_rate, opus_rate):
+    samples = np.zeros(source_rate, dtype=np.float32)
+    data = encode_audio(samples, source_rate, "ogg")
+    info = sf.info(io.BytesIO(data))
+    assert (info.format, info.subtype) == ("OGG", "OPUS")
+    assert info.samplerate == opus_rate
+    assert info.duration == pytest.approx(1.0, abs=0.05)
+
+
+def test_audio_media_types():
+    assert AUDIO_MEDIA_TYPES == {"wav": "audio/wav", "ogg": "audio/ogg"}
+
+
+@pytest.mark.parametrize("chunk_size", [97, 1000, 4096])
+def test_ogg_opus_stream_matches_whole_file(chunk_size):
+    data = ogg_opus()
+    expected, _ = sf.read(io.BytesIO(data), dtype="float32")
+
+    decoder = OggOpusStreamDecoder(RATE)
+    pieces = [decoder.decode(data[offset:offset + chunk_size]) for offset in range(0, len(data), chunk_size)]
+    decoded = np.concatenate(pieces)
+
+    # Audio comes out as pages complete, not all at the end
+    assert sum(len(piece) > 0 for piece in pieces) > 1
+    assert len(decoded) == len(expected)
+    assert np.abs(decoded - expected).max() < 0.05
+
+
+def test_ogg_opus_rejects_other_data():
+    with pytest.raises(ValueError):
+        OggOpusStreamDecoder(RATE).decode(b"RIFF" + bytes(64))
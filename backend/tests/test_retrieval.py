@@ -0,0 +1,68 @@
+import numpy as np
+
+from lumen_retrieval import BM25Index, reciprocal_rank_fusion, scheme_tokens, tokenize
+
+
+def test_tokenize_casefolds_and_drops_stopwords():
+    assert tokenize("Health Insurance for the Elderly") == ["health", "insurance", "elderly"]
+
+
+def test_tokenize_keeps_helplines_as_one_token():
+    assert tokenize("Call 1800-180-5145 now") == ["call", "18001805145", "now"]
+
+
+def test_tokenize_keeps_indic_words_whole():
+    # \w alone would split at the vowel sign and the virama
+    assert tokenize("स्वास्थ्य बीमा") == ["स्वास्थ्य", "बीमा"]
+    assert tokenize("आयुष्मान\u200cभारत") == ["आयुष्मानभारत"]
+
+
+def test_scheme_tokens_weights_fields():
+    tokens = scheme_tokens({"name": "Janani Suraksha", "description": "maternity cash", "states": ["Bihar"]})
+    assert tokens.count("janani") == 3
+    assert tokens.count("maternity") == 1
+    assert "bihar" in tokens
+
+
+def test_bm25_ranks_by_term_weight():
+    index = BM25Index([
+        tokenize("maternity benefit for pregnant women"),
+        tokenize("health insurance for senior citizens"),
+        tokenize("senior citizen pension senior care"),
+    ])
+    hits = index.search("senior citizens insurance", k=3)
+    assert [doc for doc, _ in hits] == [1, 2]
+    assert hits[0][1] > hits[1][1] > 0
+
+
+def test_bm25_rare_terms_outweigh_common_ones():
+    index = BM25Index([tokenize("health card"), tokenize("health scheme"), tokenize("health dialysis")])
+    assert index.search("health dialysis", k=1)[0][0] == 2
+
+
+def test_bm25_top_k_and_allowed_filter():
+    index = BM25Index([tokenize(f"scheme {i}") for i in range(10)])
+    assert len(index.search("scheme", k=4)) == 4
+    hits = index.search("scheme", k=10, allowed=np.array([2, 5]))
+    assert sorted(doc for doc, _ in hits) == [2, 5]
+
+
+def test_bm25_no_match_and_empty_index():
+    assert BM25Index([tokenize("pension")]).search("vaccination", k=5) == []
+    assert BM25Index([]).search("pension", k=5) == []
+
+
+def test_rrf_prefers_documents_ranked_high_in_both_lists():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 1, 4]])
+    assert {doc for doc, _ in fused[:2]} == {1, 2}
+    assert fused[-1][0] in (3, 4)
+
+
+def test_rrf_scales_scores_to_one():
+    fused = dict(reciprocal_rank_fusion([[7, 8], [7, 9]]))
+    assert fused[7] == 1.0
+    assert 0 < fused[9] < fused[7]
+
+
+def test_rrf_empty():
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,88 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from lumen_streaming import EnergyVAD, StreamingTranscriber, format_sse
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def noise(seconds, amplitude=0.001, seed=0):
+    return (amplitude * np.random.default_rng(seed).standard_normal(int(RATE * seconds))).astype(np.float32)
+
+
+def drain(transcriber):
+    jobs = []
+    while transcriber._jobs:
+        jobs.append(asyncio.run(transcriber.next_job()))
+    return jobs
+
+
+def test_format_sse():
+    assert format_sse("token", {"text": "नमस्ते"}) == 'event: token\ndata: {"text": "नमस्ते"}\n\n'
+
+
+def test_vad_separates_speech_from_noise():
+    vad = EnergyVAD()
+    assert not vad.is_speech(noise(0.03))
+    assert vad.is_speech(tone(0.03))
+    assert not vad.is_speech(np.zeros(0, dtype=np.float32))
+
+
+def test_vad_noise_floor_adapts():
+    vad = EnergyVAD()
+    loud_noise = noise(0.03, amplitude=0.02)
+    for _ in range(200):
+        vad.is_speech(loud_noise)
+    # A quiet tone that beat the initial floor is now below the learned one
+    assert not vad.is_speech(tone(0.03, amplitude=0.02))
+    assert vad.is_speech(tone(0.03, amplitude=0.3))
+
+
+def test_utterance_ends_after_silence():
+    transcriber = StreamingTranscriber(RATE, partial_interval_s=10.0, end_silence_s=0.3)
+    transcriber.add_audio(np.concatenate([noise(1.0), tone(0.6), noise(0.5), tone(0.6), noise(0.5)]))
+    jobs = drain(transcriber)
+    assert [(job.kind, job.utterance) for job in jobs] == [("final", 0), ("final", 1)]
+    # Each utterance keeps a little audio from before the onset
+    assert jobs[0].start == pytest.approx(1.0 - StreamingTranscriber.PREROLL_S, abs=0.05)
+    assert len(jobs[0].samples) / RATE == pytest.approx(jobs[0].end - jobs[0].start, abs=0.01)
+
+
+def test_partials_while_speaking_and_close_flushes():
+    transcriber = StreamingTranscriber(RATE, partial_interval_s=0.5, end_silence_s=0.7)
+    transcriber.add_audio(noise(0.2))
+    # Chunks that do not line up with frames are carried over
+    for chunk in np.array_split(tone(1.2), 7):
+        transcriber.add_audio(chunk)
+    transcriber.close()
+    jobs = drain(transcriber)
+    # The final supersedes the queued partials of the same utterance
+    assert [job.kind for job in jobs[:-1]] == ["final"]
+    assert jobs[-1] is None
+
+
+def test_only_newest_partial_is_kept():
+    transcriber = StreamingTranscriber(RATE, partial_interval_s=0.3, end_silence_s=5.0)
+    transcriber.add_audio(tone(2.0))
+    jobs = drain(transcriber)
+    assert len(jobs) == 1
+    assert jobs[0].kind == "partial"
+    assert len(jobs[0].samples) / RATE == pytest.approx(1.8, abs=0.1)
+
+
+def test_long_utterance_is_split():
+    transcriber = StreamingTranscriber(RATE, partial_interval_s=100.0, max_utterance_s=1.0)
+    transcriber.add_audio(tone(2.5))
+    jobs = drain(transcriber)
+    assert [(job.kind, job.utterance) for job in jobs] == [("final", 0), ("final", 1)]
+    assert all(len(job.samples) / RATE == pytest.approx(1.0, abs=0.05) for job in jobs)
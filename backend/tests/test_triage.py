@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from lumen_triage import AhoCorasick, TriageRules, more_severe, normalize_text
+
+
+@pytest.fixture
+def rules(tmp_path):
+    path = tmp_path / "triage_rules.json"
+    path.write_text(json.dumps({
+        "version": 7,
+        "levels": {
+            "Red": {
+                "en": ["chest pain", "unconscious"],
+                "hi": ["सीने में दर्द", "बेहोश"],
+            },
+            "Yellow": {
+                "en": ["pain", "fever"],
+                "hi": ["बुखार", "दर्द"],
+            },
+        },
+    }), encoding="utf-8")
+    return TriageRules(str(path))
+
+
+def test_aho_corasick_finds_overlapping_matches():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    matches = sorted((start, automaton.patterns[index]) for start, index in automaton.iter_matches("ushers"))
+    assert matches == [(1, "she"), (2, "he"), (2, "hers")]
+
+
+def test_aho_corasick_no_patterns():
+    assert list(AhoCorasick([]).iter_matches("anything")) == []
+
+
+def test_normalize_text():
+    assert normalize_text("  Chest\tPAIN \n") == "chest pain"
+    assert normalize_text("बु‍खार") == "बुखार"
+
+
+def test_more_severe():
+    assert more_severe("Yellow", "Red") == "Red"
+    assert more_severe("Yellow", "Green") == "Yellow"
+
+
+def test_most_severe_match_wins(rules):
+    result = rules.analyze("I have fever and Chest Pain since morning")
+    assert result.level == "Red"
+    assert result.matches[0] == ("chest pain", "Red")
+    assert {match.term for match in result.matches[1:]} == {"fever", "pain"}
+
+
+def test_english_terms_match_whole_words_only(rules):
+    assert rules.analyze("painful knee").level == "Green"
+    assert rules.analyze("feverish").level == "Green"
+    assert rules.analyze("spain trip").level == "Green"
+    assert rules.analyze("pain, mostly").level == "Yellow"
+
+
+def test_indic_terms_allow_joined_suffixes(rules):
+    # Postpositions are often written joined to the word
+    assert rules.analyze("मुझे बुखारसे परेशानी है", "hi").level == "Yellow"
+    # ...but a term must still start at a word boundary
+    assert rules.analyze("अबुखार", "hi").level == "Green"
+
+
+def test_request_language_includes_english_terms(rules):
+    result = rules.analyze("मुझे chest pain और बुखार है", "hi")
+    assert result.level == "Red"
+    assert {match.term for match in result.matches} == {"chest pain", "pain", "बुखार"}
+
+
+def test_unknown_language_falls_back_to_english(rules):
+    assert rules.analyze("unconscious", "xx").level == "Red"
+    assert rules.analyze("बेहोश", "xx").level == "Green"
+
+
+def test_no_match_is_green(rules):
+    assert rules.analyze("just a routine checkup") == ("Green", [])
+
+
+def test_unknown_level_is_rejected(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"levels": {"Purple": {"en": ["x"]}}}))
+    with pytest.raises(ValueError):
+        TriageRules(str(path))
+
+
+def test_bundled_rules_load():
+    rules = TriageRules()
+    assert rules.analyze("difficulty breathing").level == "Red"
+    assert rules.analyze("सांस लेने में तकलीफ", "hi").level == "Red"
+    assert rules.stats()["terms"]["en"] > 0